@@ -9,7 +9,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "."))
 import streamlit as st
 
 # Project modules
-from models.llm import get_legal_response
+from config.config import STREAM_RESPONSES, PREWARM_ON_START
+from models.llm import get_legal_response, start_prewarm, stream_legal_response
+from utils.retrieval_engine import get_retrieval_engine
+from utils.tracing import stage_percentiles, trace_request
+from utils.working_set import RetrievalWorkingSet
 
 try:
     from utils.web_search import search_web
@@ -21,6 +25,9 @@ UPLOADED_SCREENSHOT_PATH = "/mnt/data/Screenshot 2025-11-24 031110.png"
 
 st.set_page_config(page_title="Personalized Legal Assistant", page_icon="⚖️", layout="wide")
 
+# Model and index load in the background while the page renders (once per process)
+prewarm_thread = start_prewarm() if PREWARM_ON_START else None
+
 
 def render_sidebar():
     st.sidebar.title("Settings")
@@ -31,21 +38,129 @@ def render_sidebar():
         format_func=lambda x: x.capitalize()
     )
     use_web = st.sidebar.checkbox("Enable live web search", value=False)
-    return response_mode, use_web
+    show_debug = st.sidebar.checkbox("Show timing debug panel", value=False)
+    filters = render_filters()
+    return response_mode, use_web, show_debug, filters
+
+
+def render_filters():
+    """Judgment metadata filters applied during retrieval; None when nothing is restricted."""
+    if prewarm_thread is not None and prewarm_thread.is_alive():
+        st.sidebar.caption("Loading the index… judgment filters appear once it is ready.")
+        return None
+    try:
+        metadata = get_retrieval_engine().get_metadata_index()
+    except Exception:
+        metadata = None
+    if metadata is None:
+        return None
+
+    filters = {}
+    with st.sidebar.expander("Filter judgments"):
+        first, last = metadata.year_range()
+        if first is not None and first < last:
+            year_from, year_to = st.slider("Judgment year", first, last, (first, last))
+            if year_from > first:
+                filters["year_from"] = year_from
+            if year_to < last:
+                filters["year_to"] = year_to
+        collections = st.multiselect("Collections", [c for c in metadata.collections if c])
+        if collections:
+            filters["collections"] = collections
+        case_number = st.text_input("Case number").strip()
+        if case_number.isdigit():
+            filters["case_number"] = int(case_number)
+    return filters or None
+
+
+def render_debug_panel(last_trace):
+    """Per-request waterfall of the last traced question plus rolling p50/p95 per stage."""
+    st.sidebar.subheader("Timings")
+    if last_trace:
+        total = last_trace.get("total_ms") or 1.0
+        width = 30
+        lines = []
+        for s in last_trace.get("spans", []):
+            offset = int(s["start_ms"] / total * width)
+            length = max(1, int(s["duration_ms"] / total * width))
+            lines.append(f"{s['name'][:13]:<13} {s['duration_ms']:8.1f}ms |{' ' * offset}{'█' * length}")
+        lines.append(f"{'total':<13} {total:8.1f}ms")
+        st.sidebar.code("\n".join(lines))
+        attrs = last_trace.get("attrs", {})
+        sizes = {k: attrs[k] for k in ("n_docs", "context_chars", "context_tokens_est", "context_tokens_saved",
+                                        "prompt_tokens_est", "prompt_tokens", "completion_tokens", "ttft_ms") if attrs.get(k) is not None}
+        if sizes:
+            st.sidebar.json(sizes)
+    else:
+        st.sidebar.caption("Ask a question with this panel enabled to record a trace.")
+
+    stats = stage_percentiles()
+    if stats:
+        st.sidebar.table([
+            {"stage": name, "n": v["count"], "p50 ms": round(v["p50_ms"], 1), "p95 ms": round(v["p95_ms"], 1)}
+            for name, v in sorted(stats.items())
+        ])
+
+
+def render_stream(stream) -> str:
+    """Render text deltas progressively in the current chat message and return the full text."""
+    if hasattr(st, "write_stream"):
+        return st.write_stream(stream)
+    placeholder = st.empty()
+    text = ""
+    for delta in stream:
+        text += delta
+        placeholder.markdown(text + "▌")
+    placeholder.markdown(text)
+    return text
+
+
+def format_sources(sources) -> str:
+    if not sources:
+        return ""
+    block = "\n\n**Sources:**\n"
+    seen = set()
+    for doc in sources[:6]:
+        src = getattr(doc, "metadata", {}).get("source", str(getattr(doc, "uri", "Unknown")))
+        src = src.replace(".txt", "")
+        if src not in seen:
+            seen.add(src)
+            block += f"- {src}\n"
+    return block
+
+
+def format_web_results(web_task) -> str:
+    # live web search augmentation, started alongside retrieval; waits at most until its timeout
+    try:
+        web_results = web_task.results()
+        block = ""
+        if web_results and "error" not in web_results[0]:
+            block += "\n\n**Recent web results:**\n"
+            for r in web_results[:2]:
+                title = r.get("title") or "Result"
+                url = r.get("url") or r.get("href") or ""
+                block += f"- {title} — {url}\n"
+        return block
+    except Exception as e:
+        return f"\n\n_Web search failed: {e}_"
 
 
 def main():
     st.title("⚖️ Personalized Legal Assistant")
     st.caption("Ask about Supreme Court cases. Retrieval + LLM powered answers.")
     header_left, header_right = st.columns([0.85, 0.15])
+    # chunks retrieved earlier in this chat, re-ranked first for follow-up questions
+    if "working_set" not in st.session_state:
+        st.session_state.working_set = RetrievalWorkingSet()
     with header_right:
         if st.button("Clear Chat",key="clear_chat_button"):
             st.session_state.messages = []
+            st.session_state.working_set.clear()
             st.rerun()
 
 
 
-    response_mode, use_web = render_sidebar()
+    response_mode, use_web, show_debug, filters = render_sidebar()
 
     # Show uploaded screenshot
     if os.path.exists(UPLOADED_SCREENSHOT_PATH):
@@ -70,45 +185,58 @@ def main():
             with st.chat_message("user"):
                 st.markdown(query)
 
-            # generate via get_legal_response (
-            with st.chat_message("assistant"):
-                with st.spinner("Generating answer..."):
+            # generate via stream_legal_response / get_legal_response
+            with trace_request("ask", enabled=show_debug or None, response_mode=response_mode,
+                               use_web=use_web, filters=filters, query_chars=len(query)) as trace:
+                with st.chat_message("assistant"):
                     try:
-                        result = get_legal_response(query, response_mode=response_mode)
-                        answer = result.get("result", "No answer returned.")
-                        sources = result.get("source_documents", []) or []
-
-                        # attach source list if available
-                        if sources:
-                            answer += "\n\n**Sources:**\n"
-                            seen = set()
-                            for doc in sources[:6]:
-                                src = getattr(doc, "metadata", {}).get("source", str(getattr(doc, "uri", "Unknown")))
-                                src = src.replace(".txt", "")
-                                if src not in seen:
-                                    seen.add(src)
-                                    answer += f"- {src}\n"
-
-                        # live web search augmentation
-                        if use_web and search_web is not None:
-                            try:
-                                web_results = search_web(query, max_results=2)
-                                if web_results and "error" not in web_results[0]:
-                                    answer += "\n\n**Recent web results:**\n"
-                                    for r in web_results[:2]:
-                                        title = r.get("title") or "Result"
-                                        url = r.get("url") or r.get("href") or ""
-                                        answer += f"- {title} — {url}\n"
-                            except Exception as e:
-                                answer += f"\n\n_Web search failed: {e}_"
-
-                        st.markdown(answer)
-                        st.session_state.messages.append({"role": "assistant", "content": answer})
+                        metrics = None
+                        if STREAM_RESPONSES:
+                            with st.spinner("Retrieving relevant judgments..."):
+                                result = stream_legal_response(query, response_mode=response_mode, filters=filters,
+                                                               use_web=use_web and search_web is not None,
+                                                               working_set=st.session_state.working_set)
+                            answer = render_stream(result["stream"]) or "No answer returned."
+                            sources = result.get("source_documents", []) or []
+                            metrics = result.get("metrics")
+                        else:
+                            with st.spinner("Generating answer..."):
+                                result = get_legal_response(query, response_mode=response_mode, filters=filters,
+                                                            use_web=use_web and search_web is not None,
+                                                            working_set=st.session_state.working_set)
+                            answer = result.get("result", "No answer returned.")
+                            sources = result.get("source_documents", []) or []
+
+                        # sources and web results are attached once the answer is complete
+                        extras = format_sources(sources)
+                        if result.get("web") is not None:
+                            extras += format_web_results(result["web"])
+
+                        if STREAM_RESPONSES:
+                            if extras:
+                                st.markdown(extras)
+                        else:
+                            st.markdown(answer + extras)
+                        if result.get("cache"):
+                            st.caption(f"Answered from the answer cache ({result['cache']} match)")
+                        elif result.get("working_set") or (metrics and metrics.get("working_set")):
+                            st.caption("Answered from passages retrieved earlier in this conversation")
+                        elif metrics and metrics.get("ttft_s") is not None:
+                            st.caption(
+                                f"First token after {metrics['ttft_s']:.2f}s "
+                                f"(retrieval {metrics['retrieval_s']:.2f}s), complete after {metrics['total_s']:.2f}s"
+                            )
+                        st.session_state.messages.append({"role": "assistant", "content": answer + extras})
                     except Exception as e:
                         err = f"Error generating response: {e}"
                         st.error(err)
                         st.session_state.messages.append({"role": "assistant", "content": err})
 
+            if trace is not None:
+                st.session_state.last_trace = trace.to_dict()
+
+    if show_debug:
+        render_debug_panel(st.session_state.get("last_trace"))
 
 
 if __name__ == "__main__":
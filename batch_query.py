@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config.config import BATCH_CONCURRENCY, BATCH_MAX_RETRIES, BATCH_MAX_RPM, BATCH_RETRIEVAL_SIZE, TOP_K_RESULTS
+from utils.batch_runner import run_batch
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Answer a JSONL file of questions without the UI. "
+                    "Results are appended to the output JSONL as they complete; rerun to resume."
+    )
+    parser.add_argument("input", help='JSONL with one {"id": ..., "query": ..., "response_mode": ...} per line.')
+    parser.add_argument("output", help="JSONL file results are appended to.")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Parallel LLM calls.")
+    parser.add_argument("--retries", type=int, default=BATCH_MAX_RETRIES, help="Retries per query on retryable errors.")
+    parser.add_argument("--rpm", type=int, default=BATCH_MAX_RPM, help="Max LLM requests per minute (0 = unlimited).")
+    parser.add_argument("--retrieval-batch", type=int, default=BATCH_RETRIEVAL_SIZE, help="Queries embedded per retrieval batch.")
+    parser.add_argument("--k", type=int, default=TOP_K_RESULTS, help="Chunks retrieved per query.")
+    parser.add_argument("--mode", default="detailed", choices=["detailed", "concise"], help="Default response mode.")
+    parser.add_argument("--retrieval-mode", choices=["dense", "hybrid"], help="Override RETRIEVAL_MODE.")
+    args = parser.parse_args()
+
+    stats = run_batch(
+        args.input,
+        args.output,
+        concurrency=args.concurrency,
+        max_retries=args.retries,
+        max_rpm=args.rpm,
+        retrieval_batch_size=args.retrieval_batch,
+        top_k=args.k,
+        response_mode=args.mode,
+        retrieval_mode=args.retrieval_mode,
+    )
+    print(f"Done: {stats['ok']} answered, {stats['error']} failed, {stats['skipped']} already done, "
+          f"{stats['elapsed_s']}s")
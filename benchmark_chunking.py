@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config.config import TEXT_DIR, CHUNK_SIZE, CHUNK_OVERLAP
+from utils.legal_splitter import LegalTextSplitter
+
+_SENTENCE_END_RE = re.compile(r"[.?!][\"')\]]?$")
+# A chunk ending in "... costs. 12." has cut paragraph 12 off from its text
+_DANGLING_NUMBER_RE = re.compile(r"\s\d{1,3}\.$")
+
+
+def _recursive_splitter(chunk_size: int, chunk_overlap: int):
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except Exception:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def measure(splitter, texts, dim: int) -> dict:
+    """Throughput of split_text over the corpus and the size/shape of the chunks it makes."""
+    started = time.perf_counter()
+    chunks = [chunk for text in texts for chunk in splitter.split_text(text)]
+    elapsed = time.perf_counter() - started
+    corpus_mb = sum(len(text.encode("utf-8")) for text in texts) / (1024 * 1024)
+    chunk_chars = sum(len(chunk) for chunk in chunks)
+    text_mb = sum(len(chunk.encode("utf-8")) for chunk in chunks) / (1024 * 1024)
+    return {
+        "seconds": elapsed,
+        "mb_per_sec": corpus_mb / elapsed if elapsed else float("inf"),
+        "chunks": len(chunks),
+        "mean_chunk_chars": chunk_chars / max(1, len(chunks)),
+        "chunk_text_mb": text_mb,
+        # Flat float32 vectors plus the chunk store texts
+        "index_mb": len(chunks) * dim * 4 / (1024 * 1024) + text_mb,
+        "sentence_end_ratio": sum(1 for c in chunks if _SENTENCE_END_RE.search(c)) / max(1, len(chunks)),
+        "dangling_paragraph_numbers": sum(1 for c in chunks if _DANGLING_NUMBER_RE.search(c)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the legal-structure splitter with RecursiveCharacterTextSplitter on TEXT_DIR."
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension used for the index size estimate.")
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N files (0 = all).")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    names = sorted(f for f in os.listdir(TEXT_DIR) if f.lower().endswith(".txt"))
+    if args.limit:
+        names = names[:args.limit]
+    texts = []
+    for name in names:
+        with open(os.path.join(TEXT_DIR, name), "r", encoding="utf-8", errors="replace") as fh:
+            texts.append(fh.read().strip())
+    print(f"{len(texts)} files from {TEXT_DIR}, chunk size {args.chunk_size}, overlap {args.chunk_overlap}")
+
+    results = {
+        "recursive": measure(_recursive_splitter(args.chunk_size, args.chunk_overlap), texts, args.dim),
+        "legal": measure(LegalTextSplitter(args.chunk_size, args.chunk_overlap), texts, args.dim),
+    }
+
+    print(f"\n{'splitter':<10} {'sec':>7} {'MB/s':>7} {'chunks':>8} {'chars':>7} {'text MB':>8} {'index MB':>9} "
+          f"{'sent.end':>9} {'dangling':>9}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['seconds']:>7.2f} {r['mb_per_sec']:>7.2f} {r['chunks']:>8} {r['mean_chunk_chars']:>7.0f} "
+              f"{r['chunk_text_mb']:>8.2f} {r['index_mb']:>9.2f} {r['sentence_end_ratio']:>9.1%} "
+              f"{r['dangling_paragraph_numbers']:>9}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
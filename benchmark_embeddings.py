@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config.config import TEXT_DIR, VECTOR_DB_DIR, CHUNK_SIZE, EMBEDDING_MIN_AGREEMENT, EMBEDDING_ENCODE_BATCH_SIZE
+from models.embeddings import EMBEDDING_BACKENDS, load_embedding_backend
+from utils.chunk_store import ChunkStore, chunk_store_exists
+
+
+def _sample_texts(n_texts: int, seed: int = 7):
+    """Chunks of the current index when there is one, else CHUNK_SIZE slices of the text files."""
+    rng = np.random.default_rng(seed)
+    if chunk_store_exists(VECTOR_DB_DIR):
+        chunks = ChunkStore(VECTOR_DB_DIR)
+        rows = rng.choice(len(chunks), size=min(n_texts, len(chunks)), replace=False)
+        return [chunks.text(int(row)) for row in sorted(rows)]
+    texts = []
+    for name in sorted(os.listdir(TEXT_DIR)):
+        if name.lower().endswith(".txt"):
+            with open(os.path.join(TEXT_DIR, name), "r", encoding="utf-8", errors="ignore") as fh:
+                content = fh.read()
+            texts.extend(content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE))
+        if len(texts) >= n_texts:
+            break
+    return texts[:n_texts]
+
+
+def _percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000.0) if samples else float("nan")
+
+
+def measure(embeddings, texts, queries):
+    """Document throughput (one embed_documents call) and single-query latency."""
+    embeddings.embed_documents(texts[:8])  # warm-up: lazy initialisation, first-call allocations
+    started = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    elapsed = time.perf_counter() - started
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append(time.perf_counter() - started)
+    return vectors, {
+        "docs_per_sec": len(texts) / elapsed if elapsed else float("inf"),
+        "query_p50_ms": _percentile_ms(latencies, 50),
+        "query_p99_ms": _percentile_ms(latencies, 99),
+    }
+
+
+def agreement(vectors: np.ndarray, reference: np.ndarray, n_queries: int, k: int) -> dict:
+    """
+    Cosine agreement with the reference backend, and top-k overlap when the first
+    n_queries vectors are used as queries against the reference vectors (i.e. a query
+    embedded with this backend searching an index built with the reference one).
+    """
+    cosine = np.sum(vectors * reference, axis=1) / (
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1) + 1e-12
+    )
+    k = min(k, len(reference))
+    overlap = 0
+    for i in range(min(n_queries, len(vectors))):
+        truth = np.argsort(-(reference @ reference[i]))[:k]
+        found = np.argsort(-(reference @ vectors[i]))[:k]
+        overlap += len(set(truth.tolist()) & set(found.tolist()))
+    return {
+        "cosine_mean": float(np.mean(cosine)),
+        "cosine_min": float(np.min(cosine)),
+        "topk_overlap": overlap / float(max(1, min(n_queries, len(vectors))) * k),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare embedding backends: docs/sec, query latency and agreement with the reference backend."
+    )
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS),
+                        help="Comma-separated backends; the first one is the reference.")
+    parser.add_argument("--texts", type=int, default=1000, help="Number of chunks to embed.")
+    parser.add_argument("--queries", type=int, default=50, help="Number of single-query latency samples.")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threads", default="0", help="Comma-separated intra-op thread counts to sweep (0 = default).")
+    parser.add_argument("--batch-sizes", default=str(EMBEDDING_ENCODE_BATCH_SIZE), help="Comma-separated encode batch sizes.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    texts = _sample_texts(args.texts)
+    if not texts:
+        sys.exit("No texts to embed: build the vector store or add .txt files to TEXT_DIR.")
+    queries = [text[:200] for text in texts[:args.queries]]
+    print(f"Embedding {len(texts)} texts, {len(queries)} queries")
+
+    reference = None
+    results = []
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        for threads in [int(t) for t in args.threads.split(",")]:
+            for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+                try:
+                    started = time.perf_counter()
+                    embeddings = load_embedding_backend(backend, threads=threads, batch_size=batch_size)
+                    load_s = time.perf_counter() - started
+                    vectors, row = measure(embeddings, texts, queries)
+                except Exception as e:
+                    print(f"{backend}: skipped ({e})")
+                    continue
+                if reference is None:
+                    reference = vectors
+                row = dict(backend=backend, threads=threads, batch_size=batch_size, load_s=load_s, **row,
+                           **agreement(vectors, reference, args.queries, args.k))
+                row["index_compatible"] = row["cosine_min"] >= EMBEDDING_MIN_AGREEMENT
+                results.append(row)
+
+    print(f"\n{'backend':<11} {'threads':>7} {'batch':>6} {'docs/s':>9} {'q p50 ms':>9} {'q p99 ms':>9} "
+          f"{'cos mean':>9} {'cos min':>8} {'top-k':>6}  index")
+    for r in results:
+        print(f"{r['backend']:<11} {r['threads']:>7} {r['batch_size']:>6} {r['docs_per_sec']:>9.1f} "
+              f"{r['query_p50_ms']:>9.2f} {r['query_p99_ms']:>9.2f} {r['cosine_mean']:>9.4f} "
+              f"{r['cosine_min']:>8.4f} {r['topk_overlap']:>6.3f}  "
+              f"{'compatible' if r['index_compatible'] else 'needs reindex'}")
+    print(f"\n'needs reindex': lowest cosine below EMBEDDING_MIN_AGREEMENT={EMBEDDING_MIN_AGREEMENT}; "
+          f"switching to it makes build_vector_store.py rebuild the index.")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
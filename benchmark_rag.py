@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from utils.synthetic_corpus import generate_corpus, synthetic_queries
+
+# Printed before the JSON result of a stage, so it can be told apart from the pipeline's own output
+_RESULT_MARKER = "BENCHMARK_RESULT "
+STAGES = ("build", "load", "query", "llm")
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+
+
+def _dir_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / (1024 * 1024)
+
+
+def _latency_stats(samples) -> dict:
+    return {
+        "p50_ms": float(np.percentile(samples, 50) * 1000.0),
+        "p99_ms": float(np.percentile(samples, 99) * 1000.0),
+    }
+
+
+def _timed_calls(fn, queries, concurrency: int) -> dict:
+    """p50/p99 of sequential calls, then queries/sec with `concurrency` callers."""
+    fn(queries[0])  # warm-up
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        latencies.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fn, queries))
+    elapsed = time.perf_counter() - started
+    return dict(_latency_stats(latencies), qps=len(queries) / elapsed if elapsed else float("inf"), concurrency=concurrency)
+
+
+def stage_build(args) -> dict:
+    from config.config import TEXT_DIR, VECTOR_DB_DIR
+    from utils.vector_store import create_vector_store
+
+    started = time.perf_counter()
+    vectorstore = create_vector_store(full=True)
+    elapsed = time.perf_counter() - started
+    return {
+        "build_seconds": elapsed,
+        "vectors": int(vectorstore.index.ntotal),
+        "corpus_mb": _dir_mb(TEXT_DIR),
+        "index_mb": _dir_mb(VECTOR_DB_DIR),
+    }
+
+
+def stage_load(args) -> dict:
+    from utils.retrieval_engine import get_retrieval_engine
+    from utils.vector_store import load_vector_store
+
+    started = time.perf_counter()
+    load_vector_store()
+    load_seconds = time.perf_counter() - started
+    # What the app pays before its first answer: index, lexical and metadata sidecars
+    started = time.perf_counter()
+    get_retrieval_engine().warm_up()
+    return {"load_seconds": load_seconds, "engine_warm_up_seconds": time.perf_counter() - started}
+
+
+def stage_query(args) -> dict:
+    from utils.retrieval_engine import get_retrieval_engine
+    from utils.vector_store import query_vector_store
+
+    get_retrieval_engine().warm_up()
+    queries = synthetic_queries(args.queries, seed=args.seed + 1)
+    return _timed_calls(lambda q: query_vector_store(q, mode=args.retrieval_mode), queries, args.concurrency)
+
+
+def stage_llm(args) -> dict:
+    from utils.stub_llm_server import start_stub_server
+
+    server = start_stub_server(latency=args.llm_latency)
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["GROQ_API_KEY"] = "stub"
+    from models.llm import get_legal_response
+    from utils.retrieval_engine import get_retrieval_engine
+
+    get_retrieval_engine().warm_up()
+    queries = synthetic_queries(args.llm_queries, seed=args.seed + 2)
+    result = _timed_calls(lambda q: get_legal_response(q, "concise", args.retrieval_mode), queries, args.concurrency)
+    result["stub_latency_seconds"] = args.llm_latency
+    return result
+
+
+def run_stage(args) -> None:
+    """Child process: run one stage against the configured store and print its JSON result."""
+    result = {"build": stage_build, "load": stage_load, "query": stage_query, "llm": stage_llm}[args.stage](args)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    print(_RESULT_MARKER + json.dumps(result), flush=True)
+
+
+def _stage_env(args, corpus_dir: str, store_dir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "TEXT_DIR": corpus_dir,
+        "VECTOR_DB_DIR": store_dir,
+        "EMBEDDING_BACKEND": args.embedding_backend,
+        "RETRIEVAL_MODE": args.retrieval_mode,
+        # Every query must exercise the full path
+        "ANSWER_CACHE_ENABLED": "0",
+        "EMBED_CACHE_ENABLED": "0",
+        "TRACING_ENABLED": "0",
+    })
+    return env
+
+
+def _spawn_stage(args, stage: str, env: dict) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), "--stage", stage, "--seed", str(args.seed),
+               "--queries", str(args.queries), "--llm-queries", str(args.llm_queries),
+               "--llm-latency", str(args.llm_latency), "--concurrency", str(args.concurrency),
+               "--retrieval-mode", args.retrieval_mode]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith(_RESULT_MARKER):
+            return json.loads(line[len(_RESULT_MARKER):])
+    return {"error": (completed.stderr or completed.stdout).strip().splitlines()[-1:] or [f"exit {completed.returncode}"]}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _flatten(results: dict) -> dict:
+    """{"<size>.<stage>.<metric>": value} for numeric metrics."""
+    flat = {}
+    for size, stages in results.items():
+        for stage, metrics in stages.items():
+            for name, value in metrics.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    flat[f"{size}.{stage}.{name}"] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict) -> None:
+    old, new = _flatten(baseline["results"]), _flatten(current["results"])
+    print(f"\nChange against {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp', '')}):")
+    for key in sorted(new):
+        if key in old and old[key]:
+            print(f"  {key:<45} {old[key]:>12.3f} -> {new[key]:>12.3f}  ({(new[key] - old[key]) / old[key]:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="End-to-end RAG benchmark on synthetic corpora: build, load, retrieval and answer latency, "
+                    "throughput and peak memory, with a model-free embedding backend and the stub LLM server."
+    )
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated corpus sizes (documents).")
+    parser.add_argument("--work-dir", default=os.path.join("data", "benchmark"),
+                        help="Corpora and stores are kept here; corpora are reused between runs.")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--queries", type=int, default=200, help="Retrieval queries per measurement.")
+    parser.add_argument("--llm-queries", type=int, default=50, help="get_legal_response calls per measurement.")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Stub LLM seconds per completion.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retrieval-mode", default="hybrid", choices=("dense", "hybrid"))
+    parser.add_argument("--embedding-backend", default="hash",
+                        help="EMBEDDING_BACKEND for the run (hash needs no model download).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Print the change of every metric against an earlier --json file.")
+    parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        run_stage(args)
+        return
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("json", "compare", "stage")},
+        "results": {},
+    }
+    stages = [s for s in args.stages.split(",") if s]
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        corpus_dir = os.path.abspath(os.path.join(args.work_dir, f"corpus_{size}"))
+        store_dir = os.path.abspath(os.path.join(args.work_dir, f"store_{size}_{args.embedding_backend}"))
+        started = time.perf_counter()
+        generate_corpus(corpus_dir, size, seed=args.seed)
+        print(f"\n{size} documents in {corpus_dir} ({time.perf_counter() - started:.1f}s to generate)")
+        env = _stage_env(args, corpus_dir, store_dir)
+        report["results"][str(size)] = {}
+        for stage in stages:
+            result = _spawn_stage(args, stage, env)
+            report["results"][str(size)][stage] = result
+            print(f"  {stage:<6} " + ", ".join(
+                f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()
+            ))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Wrote {args.json}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            compare(report, json.load(fh))
+
+
+if __name__ == "__main__":
+    main()
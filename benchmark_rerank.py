@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config.config import TOP_K_RESULTS, RERANK_BACKEND, RERANK_BATCH_SIZE, RERANK_BUDGET_MS, RERANK_TOP_K
+
+
+def _percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000.0) if samples else float("nan")
+
+
+class _TimedScorer:
+    """Adds pair_cost seconds per scored pair to a scorer (the overlap scorer standing in for a cross-encoder)."""
+
+    def __init__(self, scorer, pair_cost: float):
+        self.scorer = scorer
+        self.pair_cost = pair_cost
+
+    def predict(self, pairs, **kwargs):
+        time.sleep(self.pair_cost * len(pairs))
+        return self.scorer.predict(pairs, **kwargs)
+
+
+def _load_queries(args):
+    if args.query_file:
+        with open(args.query_file, "r", encoding="utf-8") as fh:
+            return [line.strip() for line in fh if line.strip()][:args.queries]
+    from utils.synthetic_corpus import synthetic_queries
+
+    return synthetic_queries(args.queries, seed=args.seed)
+
+
+def run_pipeline(queries, candidates: int, reranker, args, client, baseline_ids=None) -> dict:
+    """
+    Retrieve, (rerank,) build the prompt and call the LLM for every query. candidates=0
+    is today's pipeline: the first TOP_K_RESULTS chunks straight into the prompt.
+    """
+    from models.llm import build_prompt_with_stats, request_completion
+    from utils.retrieval_engine import get_retrieval_engine
+    from utils.tokens import estimate_tokens
+
+    engine = get_retrieval_engine()
+    retrieval, rerank, total, prompt_tokens, context_tokens = [], [], [], [], []
+    fallbacks = cached = scored = 0
+    kept_from_baseline = []
+    ids = []
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        docs = engine.search(query, k=candidates or TOP_K_RESULTS, mode=args.retrieval_mode)
+        retrieval.append(time.perf_counter() - started)
+        if candidates:
+            rerank_started = time.perf_counter()
+            docs, stats = reranker.rerank(query, docs, args.top_k, budget_ms=args.budget_ms, fallback_k=TOP_K_RESULTS)
+            rerank.append(time.perf_counter() - rerank_started)
+            fallbacks += stats["fallback"]
+            cached += stats["cached"]
+            scored += stats["scored"]
+        ids.append([d.metadata.get("chunk_id") for d in docs])
+        if baseline_ids is not None:
+            kept_from_baseline.append(len(set(ids[-1]) & set(baseline_ids[i])) / float(len(ids[-1]) or 1))
+        prompt, context_stats = build_prompt_with_stats(query, docs, args.response_mode)
+        if client is not None:
+            request_completion(client, prompt)
+        total.append(time.perf_counter() - started)
+        prompt_tokens.append(estimate_tokens(prompt))
+        context_tokens.append(context_stats["packed_tokens"])
+
+    row = {
+        "pipeline": f"rerank {candidates}->{args.top_k}" if candidates else f"fixed k={TOP_K_RESULTS}",
+        "retrieval_p50_ms": _percentile_ms(retrieval, 50),
+        "retrieval_p99_ms": _percentile_ms(retrieval, 99),
+        "end_to_end_p50_ms": _percentile_ms(total, 50),
+        "end_to_end_p99_ms": _percentile_ms(total, 99),
+        "prompt_tokens": float(np.mean(prompt_tokens)),
+        "context_tokens": float(np.mean(context_tokens)),
+    }
+    if candidates:
+        row.update({
+            "rerank_p50_ms": _percentile_ms(rerank, 50),
+            "rerank_p99_ms": _percentile_ms(rerank, 99),
+            "fallback_rate": fallbacks / float(len(queries)),
+            "cached_share": cached / float(cached + scored or 1),
+            "kept_from_fixed_k": float(np.mean(kept_from_baseline)) if kept_from_baseline else None,
+        })
+    return row, ids
+
+
+def _print_row(row: dict, label: str = "") -> None:
+    line = (f"{row['pipeline'] + label:<24} retrieval p50={row['retrieval_p50_ms']:.1f}ms  "
+            f"end-to-end p50={row['end_to_end_p50_ms']:.1f}ms p99={row['end_to_end_p99_ms']:.1f}ms  "
+            f"prompt={row['prompt_tokens']:.0f} tok (context {row['context_tokens']:.0f})")
+    if "rerank_p50_ms" in row:
+        line += (f"  rerank p50={row['rerank_p50_ms']:.1f}ms p99={row['rerank_p99_ms']:.1f}ms  "
+                 f"fallback={row['fallback_rate']:.0%}  cached={row['cached_share']:.0%}  "
+                 f"kept from k={TOP_K_RESULTS}={row['kept_from_fixed_k']:.0%}")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="End-to-end latency and prompt tokens of the fixed top-k pipeline against cross-encoder "
+                    "reranking of more candidates, on the configured vector store with the stub LLM server."
+    )
+    parser.add_argument("--candidates", default="10,20,40", help="Comma-separated first-stage candidate counts.")
+    parser.add_argument("--top-k", type=int, default=RERANK_TOP_K, help="Chunks kept after reranking.")
+    parser.add_argument("--budget-ms", type=float, default=RERANK_BUDGET_MS, help="Per-query rerank budget (0 = none).")
+    parser.add_argument("--batch-size", type=int, default=RERANK_BATCH_SIZE)
+    parser.add_argument("--backend", default=RERANK_BACKEND, help="cross_encoder (RERANK_MODEL) or overlap (no model).")
+    parser.add_argument("--pair-cost-ms", type=float, default=0.0,
+                        help="Simulated scoring cost per pair, e.g. to stand in for the cross-encoder with --backend overlap.")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--query-file", help="Optional text file with one real question per line.")
+    parser.add_argument("--retrieval-mode", default=None, choices=("dense", "hybrid"))
+    parser.add_argument("--response-mode", default="detailed", choices=("concise", "detailed"))
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Stub LLM seconds per completion.")
+    parser.add_argument("--prompt-delay", type=float, default=0.2, help="Stub LLM seconds per 1000 prompt tokens.")
+    parser.add_argument("--no-llm", action="store_true", help="Stop after building the prompt.")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    client = None
+    if not args.no_llm:
+        from models.llm import Groq
+        from utils.stub_llm_server import start_stub_server
+
+        server = start_stub_server(latency=args.llm_latency, prompt_delay=args.prompt_delay)
+        client = Groq(api_key="stub", base_url=f"http://127.0.0.1:{server.server_port}")
+
+    from models.reranker import Reranker, load_reranker_backend
+    from utils.retrieval_engine import get_retrieval_engine
+
+    get_retrieval_engine().warm_up()
+    scorer = load_reranker_backend(args.backend)
+    if args.pair_cost_ms:
+        scorer = _TimedScorer(scorer, args.pair_cost_ms / 1000.0)
+    queries = _load_queries(args)
+    print(f"{len(queries)} queries, reranker {args.backend}, budget {args.budget_ms:.0f}ms, "
+          f"stub LLM {args.llm_latency}s + {args.prompt_delay}s per 1k prompt tokens")
+
+    baseline, baseline_ids = run_pipeline(queries, 0, None, args, client)
+    _print_row(baseline)
+    results = [baseline]
+    for candidates in [int(c) for c in args.candidates.split(",") if c.strip()]:
+        # A fresh score cache per setting: the first pass is cold, the repeat shows cached scores
+        reranker = Reranker(scorer, model_id=args.backend, batch_size=args.batch_size, budget_ms=args.budget_ms)
+        reranker.rerank(queries[0], get_retrieval_engine().search(queries[0], k=candidates), args.top_k, budget_ms=0)
+        reranker.clear()
+        for label in ("", " (cached)"):
+            row, _ = run_pipeline(queries, candidates, reranker, args, client, baseline_ids)
+            row["cache"] = "warm" if label else "cold"
+            _print_row(row, label)
+            results.append(row)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"queries": len(queries), "settings": vars(args), "results": results}, fh, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,48 @@
+import argparse
 import sys
 import os
 
 project_root = r"D:\Langchain\legal_assistant"
 sys.path.insert(0, project_root)
 
-from utils.vector_store import create_vector_store
+from config.config import SHARD_BY
+from utils.vector_store import create_vector_store, plan_vector_store_update, format_update_plan
+from utils.sharding import build_sharded_vector_store, plan_sharded_update, read_shard_layout
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or incrementally update the FAISS vector store.")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-embed every file.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be added, changed or removed.")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="Build the index as N shards (with --shard-by year, the number of decades decides).")
+    parser.add_argument("--shard-by", choices=["hash", "year"], default=SHARD_BY, help="How files are split into shards.")
+    parser.add_argument("--only", nargs="+", help="Rebuild only these shards (e.g. hash02 year1990s).")
+    args = parser.parse_args()
+
+    # An existing sharded store keeps being updated as shards unless --shards says otherwise
+    layout = read_shard_layout()
+    if not args.shards and layout:
+        args.shards, args.shard_by = layout["n_shards"], layout["shard_by"]
+
+    if args.dry_run:
+        if args.shards:
+            for name, plan in plan_sharded_update(full=args.full, shard_by=args.shard_by, n_shards=args.shards).items():
+                if not args.only or name in args.only:
+                    print(f"=== Shard {name} ===")
+                    print(format_update_plan(plan))
+        else:
+            print(format_update_plan(plan_vector_store_update(full=args.full)))
+        sys.exit(0)
+
     print("Building vector store from existing text files...")
     try:
-        vectorstore = create_vector_store()
-        print("Vector store created successfully!")
+        if args.shards:
+            counts = build_sharded_vector_store(full=args.full, shard_by=args.shard_by, n_shards=args.shards,
+                                                only=args.only)
+            print(f"Sharded vector store updated: {', '.join(f'{n}={c}' for n, c in sorted(counts.items()))}")
+        else:
+            vectorstore = create_vector_store(full=args.full)
+            print("Vector store created successfully!")
         print(f"Ready to use in app!")
     except Exception as e:
-        print(f"Error: {e}")
\ No newline at end of file
+        print(f"Error: {e}")
@@ -10,18 +10,160 @@ os.environ["TRANSFORMERS_CACHE"] = r"D:\Langchain\legal_assistant\hf_cache"
 # Groq
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")  # no default secret placeholder
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+# Optional alternative endpoint for the Groq client (e.g. the local stub server in utils/stub_llm_server.py)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+# Render answers token by token in the chat instead of waiting for the full completion
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "1").lower() in ("1", "true", "yes")
 
 # Embedding model (HF)
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 
+# Embedding backend: "torch" (fp32 PyTorch), "torch_int8" (dynamically int8-quantized linear layers),
+# "onnx" (ONNX Runtime, fp32), "onnx_int8" (ONNX Runtime, int8-quantized model file) or "hash"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")  # model file in the HF repo; "" = backend default
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))  # intra-op threads; 0 = library default
+EMBEDDING_ENCODE_BATCH_SIZE = int(os.getenv("EMBEDDING_ENCODE_BATCH_SIZE", 64))
+EMBEDDING_HASH_DIM = int(os.getenv("EMBEDDING_HASH_DIM", 384))  # EMBEDDING_BACKEND=hash (model-free, for benchmarks)
+# Backends whose probe vectors agree with the index's below this cosine need a reindex
+EMBEDDING_MIN_AGREEMENT = float(os.getenv("EMBEDDING_MIN_AGREEMENT", 0.99))
+
 # Paths 
 TEXT_DIR = os.getenv("TEXT_DIR", r"D:\Langchain\legal_assistant\text_files")
 VECTOR_DB_DIR = os.getenv("VECTOR_DB_DIR", r"D:\Langchain\legal_assistant\data\vector_store")
 
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 200))
+# "legal" (numbered paragraphs / headings of judgments, byte offsets into the source) or "recursive"
+CHUNKER = os.getenv("CHUNKER", "legal")
 TOP_K_RESULTS = int(os.getenv("TOP_K_RESULTS", 5))
 
+# Ingestion pipeline: splitter processes, chunks per embedding batch, progress report interval
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 256))
+INGEST_PROGRESS_SECONDS = float(os.getenv("INGEST_PROGRESS_SECONDS", 10))
+
+# Persistent embedding cache shared by indexing and querying (memory-mapped vectors + SQLite offset index)
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", r"D:\Langchain\legal_assistant\data\embedding_cache")
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", 1024))
+
+# Retrieval: "dense" (FAISS only) or "hybrid" (BM25 + FAISS fused with reciprocal rank fusion)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+RRF_K = int(os.getenv("RRF_K", 60))
+BM25_K1 = float(os.getenv("BM25_K1", 1.2))
+BM25_B = float(os.getenv("BM25_B", 0.75))
+
+# FAISS index type: "flat" (exact), "ivf_flat", "ivf_pq" or "hnsw". Approximate types are trained at
+# build time from the exact index; nprobe / efSearch are query-time knobs (IVF_NLIST=0 picks ~4*sqrt(n))
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+IVF_NLIST = int(os.getenv("IVF_NLIST", 0))
+PQ_M = int(os.getenv("PQ_M", 48))
+PQ_NBITS = int(os.getenv("PQ_NBITS", 8))
+HNSW_M = int(os.getenv("HNSW_M", 32))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 200))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", 16))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", 64))
+INDEX_TRAIN_SIZE = int(os.getenv("INDEX_TRAIN_SIZE", 100000))
+# Vector storage for exact ("flat") search: "float32" loads index.faiss into memory; "float16" / "int8"
+# scan scalar-quantized codes (2x / 4x smaller) memory-mapped from disk and re-rank the best
+# RESCORE_FACTOR * k candidates with the memory-mapped float32 vectors
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "float32")
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", 4))
+
+# Optional second retrieval stage: a CPU cross-encoder ("cross_encoder", RERANK_MODEL) or the model-free
+# "overlap" scorer re-scores the top RERANK_CANDIDATES chunks in batches and only the best RERANK_TOP_K
+# reach the prompt. A query whose scoring would exceed RERANK_BUDGET_MS keeps the first-stage order
+# (0 = no budget); (query, chunk) scores are cached in memory, up to RERANK_CACHE_MAX_ENTRIES.
+# The measured time per pair decays with RERANK_ESTIMATE_HALF_LIFE_SECONDS, so one slow batch cannot
+# keep every later query falling back
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0").lower() in ("1", "true", "yes")
+RERANK_BACKEND = os.getenv("RERANK_BACKEND", "cross_encoder")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 20))
+RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", 3))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 8))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 250))
+RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", 20000))
+RERANK_ESTIMATE_HALF_LIFE_SECONDS = float(os.getenv("RERANK_ESTIMATE_HALF_LIFE_SECONDS", 30))
+
+# Sharded index (build_vector_store.py --shards N): every shard is a complete store under
+# VECTOR_DB_DIR/shards/<name>; queries are searched on all shards in parallel and merged.
+# SHARD_BY "hash" spreads files over VECTOR_SHARDS shards, "year" makes one shard per decade.
+SHARD_BY = os.getenv("SHARD_BY", "hash")
+VECTOR_SHARDS = int(os.getenv("VECTOR_SHARDS", 4))
+SHARD_SEARCH_THREADS = int(os.getenv("SHARD_SEARCH_THREADS", 0))
+# Comma-separated shard worker URLs (python -m utils.shard_worker); when set, shards are searched remotely
+SHARD_ENDPOINTS = [url.strip() for url in os.getenv("SHARD_ENDPOINTS", "").split(",") if url.strip()]
+SHARD_TIMEOUT_SECONDS = float(os.getenv("SHARD_TIMEOUT_SECONDS", 10))
+
+# Headless batch runner (batch_query.py): concurrent LLM calls, retries and request rate limit
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", 5))
+BATCH_MAX_RPM = int(os.getenv("BATCH_MAX_RPM", 0))
+BATCH_RETRIEVAL_SIZE = int(os.getenv("BATCH_RETRIEVAL_SIZE", 64))
+
+# Per-stage latency tracing (append-only JSONL trace log + rolling p50/p95 in the debug panel)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0").lower() in ("1", "true", "yes")
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", r"D:\Langchain\legal_assistant\data\traces.jsonl")
+TRACE_STATS_WINDOW = int(os.getenv("TRACE_STATS_WINDOW", 200))
+
+# Prompt context packing: merge adjacent chunks of the same judgment, drop near-duplicate
+# passages (word 5-gram Jaccard >= CONTEXT_DEDUP_THRESHOLD) and fit a per-mode token budget
+CONTEXT_PACKING_ENABLED = os.getenv("CONTEXT_PACKING_ENABLED", "1").lower() in ("1", "true", "yes")
+CONTEXT_TOKEN_BUDGETS = {
+    "concise": int(os.getenv("CONTEXT_TOKENS_CONCISE", 600)),
+    "detailed": int(os.getenv("CONTEXT_TOKENS_DETAILED", 1600)),
+}
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", 0.8))
+
+# Answer cache in front of the LLM call: exact tier (normalized query + mode + model + index
+# version) and a semantic tier that reuses an answer when the query embeddings' cosine
+# similarity is >= ANSWER_CACHE_SEMANTIC_THRESHOLD (0 disables the semantic tier) and both
+# questions cite the same section / article / year / case numbers
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", r"D:\Langchain\legal_assistant\data\answer_cache.sqlite")
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 5000))
+ANSWER_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", 0.95))
+# Answers of other index versions (e.g. processes still on the old index during a rebuild) are
+# only garbage-collected once unused for this long
+ANSWER_CACHE_VERSION_GRACE_SECONDS = float(os.getenv("ANSWER_CACHE_VERSION_GRACE_SECONDS", 3600))
+
+# Per-session retrieval working set: chunks retrieved earlier in the chat (at most
+# WORKING_SET_MAX_CHUNKS) are re-ranked first for each new question; they answer it without a
+# global search when the best one has cosine similarity >= WORKING_SET_MIN_SCORE (0 disables reuse)
+WORKING_SET_MAX_CHUNKS = int(os.getenv("WORKING_SET_MAX_CHUNKS", 50))
+WORKING_SET_MIN_SCORE = float(os.getenv("WORKING_SET_MIN_SCORE", 0.55))
+
+# Request orchestration: web search runs concurrently with retrieval and generation. Snippets
+# that arrive within WEB_PROMPT_DEADLINE_SECONDS of the question go into the prompt; later
+# ones are only listed under the answer, and none are waited for beyond WEB_SEARCH_TIMEOUT_SECONDS
+WEB_SEARCH_MAX_RESULTS = int(os.getenv("WEB_SEARCH_MAX_RESULTS", 2))
+WEB_RESULTS_IN_PROMPT = os.getenv("WEB_RESULTS_IN_PROMPT", "1").lower() in ("1", "true", "yes")
+WEB_PROMPT_DEADLINE_SECONDS = float(os.getenv("WEB_PROMPT_DEADLINE_SECONDS", 1.5))
+WEB_SEARCH_TIMEOUT_SECONDS = float(os.getenv("WEB_SEARCH_TIMEOUT_SECONDS", 8))
+WEB_SEARCH_WORKERS = int(os.getenv("WEB_SEARCH_WORKERS", 4))
+# Search backend ("duckduckgo", or "http" for a JSON endpoint such as utils/fake_search_server.py at
+# WEB_SEARCH_URL) and its results cache: hits live WEB_SEARCH_CACHE_TTL_SECONDS, failures
+# WEB_SEARCH_NEGATIVE_TTL_SECONDS, least recently used entries are evicted beyond the max
+WEB_SEARCH_BACKEND = os.getenv("WEB_SEARCH_BACKEND", "duckduckgo")
+WEB_SEARCH_URL = os.getenv("WEB_SEARCH_URL", "")
+WEB_SEARCH_CACHE_TTL_SECONDS = float(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", 3600))
+WEB_SEARCH_NEGATIVE_TTL_SECONDS = float(os.getenv("WEB_SEARCH_NEGATIVE_TTL_SECONDS", 60))
+WEB_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("WEB_SEARCH_CACHE_MAX_ENTRIES", 512))
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_TIMEOUT_SECONDS", 15))
+# Concurrent retrieval searches per process; a question arriving while all are busy gets no documents
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", 8))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 60))
+
+# Load the embedding model, index and LLM client in a background thread as soon as the app starts
+PREWARM_ON_START = os.getenv("PREWARM_ON_START", "1").lower() in ("1", "true", "yes")
+
+# How often (seconds) the resident retrieval engine checks the on-disk index version marker
+INDEX_RELOAD_CHECK_SECONDS = float(os.getenv("INDEX_RELOAD_CHECK_SECONDS", 5))
+
 RESPONSE_MODES = {
     "concise": "Provide a brief, summarized answer in 2-3 sentences focusing only on key points.",
     "detailed": "Provide a comprehensive, detailed explanation with case references, legal reasoning, and relevant precedents."
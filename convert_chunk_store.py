@@ -0,0 +1,34 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config.config import VECTOR_DB_DIR
+from utils.chunk_store import PICKLE_DOCSTORE_FILE, CHUNK_STORE_FILE, chunk_store_exists, convert_pickle_docstore
+from utils.vector_store import write_index_version
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert the pickled docstore (index.pkl) of an existing vector store into the "
+                    "memory-mapped chunk store, without re-embedding anything."
+    )
+    parser.add_argument("--store-dir", default=VECTOR_DB_DIR, help="Vector store directory.")
+    parser.add_argument("--keep-pickle", action="store_true", help="Leave index.pkl in place after converting.")
+    args = parser.parse_args()
+
+    pickle_path = os.path.join(args.store_dir, PICKLE_DOCSTORE_FILE)
+    if not os.path.exists(pickle_path):
+        if chunk_store_exists(args.store_dir):
+            print(f"{args.store_dir} already uses a chunk store; nothing to convert.")
+        else:
+            print(f"No {PICKLE_DOCSTORE_FILE} found in {args.store_dir}.")
+        sys.exit(0)
+
+    pickle_size = os.path.getsize(pickle_path)
+    n_chunks = convert_pickle_docstore(args.store_dir, remove_pickle=not args.keep_pickle)
+    chunk_files = [name for name in os.listdir(args.store_dir) if name.startswith("chunks_") or name == CHUNK_STORE_FILE]
+    chunk_size = sum(os.path.getsize(os.path.join(args.store_dir, name)) for name in chunk_files)
+    # New version marker so running apps reload onto the chunk store
+    write_index_version(args.store_dir)
+    print(f"Converted {n_chunks} chunks: {pickle_size / 1e6:.1f} MB pickle -> {chunk_size / 1e6:.1f} MB chunk store")
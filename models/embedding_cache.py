@@ -0,0 +1,224 @@
+# models/embedding_cache.py — persistent, content-addressed embedding cache
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+try:
+    from langchain_core.embeddings import Embeddings
+except Exception:
+    try:
+        from langchain.embeddings.base import Embeddings
+    except Exception:
+        Embeddings = object
+
+from config.config import EMBED_CACHE_DIR, EMBED_CACHE_MAX_MB
+
+# Rows are allocated in the memory-mapped vector file in steps of this size
+_GROW_ROWS = 4096
+# Fraction of the capacity evicted at once when the cache is full
+_EVICT_FRACTION = 0.05
+
+
+def _namespace_dir(cache_dir: str, model_name: str, normalize: bool) -> str:
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name).strip("_")
+    return os.path.join(cache_dir, f"{slug}__{'norm' if normalize else 'raw'}")
+
+
+def text_key(text: str) -> bytes:
+    """16-byte content hash used as the cache key of a text within a namespace."""
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).digest()[:16]
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache for one (model name, normalization) namespace.
+
+    Vectors live in a memory-mapped float32 file (`vectors.f32`, one row per slot);
+    `index.sqlite` maps a text hash to its slot and tracks last use for LRU eviction.
+    The file grows in _GROW_ROWS steps up to `max_bytes`; beyond that the least
+    recently used slots are evicted and reused.
+    """
+
+    def __init__(self, model_name: str, normalize: bool = True, cache_dir: str = EMBED_CACHE_DIR,
+                 max_bytes: int = EMBED_CACHE_MAX_MB * 1024 * 1024):
+        self.dir = _namespace_dir(cache_dir, model_name, normalize)
+        os.makedirs(self.dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._vectors_path = os.path.join(self.dir, "vectors.f32")
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(self.dir, "index.sqlite"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self._mmap: Optional[np.memmap] = None
+        self.dim = self._meta("dim")
+
+    def _meta(self, name: str, default: Optional[int] = None) -> Optional[int]:
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, name: str, value: int) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    @property
+    def capacity(self) -> int:
+        return max(1, self.max_bytes // (4 * (self.dim or 1)))
+
+    def _rows_on_disk(self) -> int:
+        try:
+            return os.path.getsize(self._vectors_path) // (4 * self.dim)
+        except OSError:
+            return 0
+
+    def _open(self, min_rows: int = 0) -> np.memmap:
+        """Map the vector file, growing it first if fewer than min_rows rows exist."""
+        rows = self._rows_on_disk()
+        if rows < min_rows:
+            rows = min(self.capacity, max(min_rows, rows + _GROW_ROWS))
+            if self._mmap is not None:
+                self._mmap.flush()
+                self._mmap = None
+            with open(self._vectors_path, "ab") as fh:
+                fh.truncate(rows * 4 * self.dim)
+        if self._mmap is None or self._mmap.shape[0] != rows:
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+        return self._mmap
+
+    def _lookup_slots(self, keys: List[bytes]) -> Dict[bytes, int]:
+        slots: Dict[bytes, int] = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):
+            part = unique[start:start + 500]
+            marks = ",".join("?" * len(part))
+            for key, slot in self._db.execute(f"SELECT key, slot FROM entries WHERE key IN ({marks})", part):
+                slots[bytes(key)] = slot
+        return slots
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return {key: vector} for the keys that are cached, refreshing their LRU timestamp."""
+        if not keys or not self.dim:
+            return {}
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            slots = self._lookup_slots(keys)
+            if not slots:
+                return {}
+            vectors = self._open()
+            for key, slot in slots.items():
+                if slot < vectors.shape[0]:
+                    found[key] = np.array(vectors[slot])
+            now = time.time()
+            self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+        return found
+
+    def _allocate(self, n: int) -> List[int]:
+        """Reserve n slots (inside the caller's transaction), evicting LRU entries if full."""
+        slots = [row[0] for row in self._db.execute("SELECT slot FROM free_slots LIMIT ?", (n,))]
+        if slots:
+            self._db.executemany("DELETE FROM free_slots WHERE slot = ?", [(s,) for s in slots])
+        next_slot = self._meta("next_slot", 0)
+        take = min(n - len(slots), self.capacity - next_slot)
+        if take > 0:
+            slots.extend(range(next_slot, next_slot + take))
+            self._set_meta("next_slot", next_slot + take)
+        missing = n - len(slots)
+        if missing > 0:
+            evict = max(missing, int(self.capacity * _EVICT_FRACTION))
+            victims = self._db.execute(
+                "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (evict,)
+            ).fetchall()
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+            freed = [slot for _, slot in victims]
+            slots.extend(freed[:missing])
+            self._db.executemany("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)", [(s,) for s in freed[missing:]])
+        return slots
+
+    def put_many(self, keys: List[bytes], vectors) -> None:
+        """Store vectors for keys that are not cached yet."""
+        if not keys:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if not self.dim:
+                self.dim = int(matrix.shape[1])
+                self._set_meta("dim", self.dim)
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match cache dimension {self.dim}")
+
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = dict(zip(keys, matrix))
+                existing = self._lookup_slots(list(rows))
+                new_keys = [k for k in rows if k not in existing]
+                slots = self._allocate(len(new_keys))
+                mmap = self._open(min_rows=max(slots) + 1 if slots else 0)
+                for key, slot in zip(new_keys, slots):
+                    mmap[slot] = rows[key]
+                mmap.flush()
+                now = time.time()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(key, slot, now) for key, slot in zip(new_keys, slots)],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings wrapper that consults an EmbeddingCache before running the
+    underlying model. Documents and queries share entries: the sentence-transformer
+    models we use embed a query exactly like a one-document batch.
+    """
+
+    def __init__(self, base, cache: EmbeddingCache):
+        self.base = base
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(t) for t in texts]
+        found = self.cache.get_many(keys)
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key in found:
+                self.hits += 1
+            else:
+                missing.setdefault(key, text)
+        self.misses += len(missing)
+        if missing:
+            miss_keys = list(missing)
+            computed = self.base.embed_documents([missing[k] for k in miss_keys])
+            self.cache.put_many(miss_keys, computed)
+            for key, vector in zip(miss_keys, computed):
+                found[key] = np.asarray(vector, dtype=np.float32)
+        return [found[k].tolist() for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text_key(text)
+        found = self.cache.get_many([key])
+        if key in found:
+            self.hits += 1
+            return found[key].tolist()
+        self.misses += 1
+        vector = self.base.embed_query(text)
+        self.cache.put_many([key], [vector])
+        return list(vector)
@@ -1,36 +1,149 @@
-# models/embeddings.py — resilient HuggingFaceEmbeddings import
+# models/embeddings.py — resilient, lazy HuggingFaceEmbeddings import
 import sys
 import os
+import threading
+from typing import Any, Dict, List
+
+import numpy as np
+
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-# Try a couple of common ways the HuggingFace embeddings class is packaged
-HuggingFaceEmbeddings = None
-try:
-    # langchain-community packaged embeddings
-    from langchain_community.embeddings import HuggingFaceEmbeddings
-    HuggingFaceEmbeddings = HuggingFaceEmbeddings
-except Exception:
+from config.config import (
+    EMBEDDING_MODEL, EMBED_CACHE_ENABLED, EMBEDDING_BACKEND, EMBEDDING_ONNX_FILE, EMBEDDING_THREADS,
+    EMBEDDING_ENCODE_BATCH_SIZE, EMBEDDING_HASH_DIM,
+)
+from utils.lazy_import import LazyImport
+
+# The common ways the HuggingFace embeddings class is packaged, tried in order when a model
+# is first loaded (not at import: some of them import sentence-transformers and torch)
+HuggingFaceEmbeddings = LazyImport(
+    "langchain_community.embeddings:HuggingFaceEmbeddings",  # langchain-community packaged embeddings
+    "langchain.embeddings:HuggingFaceEmbeddings",  # older monolithic langchain
+    "langchain_huggingface:HuggingFaceEmbeddings",  # third-party connector name sometimes used
+    error="Could not import HuggingFaceEmbeddings. "
+          "Install langchain-community or langchain or langchain-huggingface. See requirements.",
+)
+
+EMBEDDING_BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+# Files shipped in the sentence-transformers model repos (onnx/ folder)
+_ONNX_DEFAULT_FILES = {"onnx": "onnx/model.onnx", "onnx_int8": "onnx/model_quint8_avx2.onnx"}
+
+# Fixed texts embedded at build time and stored in the manifest, so a later backend can be
+# checked against the vectors the index was actually built with
+PROBE_TEXTS = [
+    "The appellant was convicted under Section 302 of the Indian Penal Code.",
+    "Whether the High Court was justified in granting anticipatory bail to the accused.",
+    "The land acquisition officer awarded compensation at the market value prevailing in 1985.",
+    "Article 226 of the Constitution confers wide powers on the High Courts to issue writs.",
+    "The appeal is allowed and the judgment of the trial court is set aside.",
+    "Dying declaration recorded by the magistrate was found to be reliable.",
+    "The tenant failed to pay arrears of rent within the statutory period.",
+    "Service rules governing seniority and promotion of government employees.",
+]
+
+# The sentence-transformer is loaded once per process and shared by every caller
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def embedding_backend_id(backend: str = EMBEDDING_BACKEND) -> str:
+    """Identifier of a backend configuration, recorded in the manifest and used to key the embedding cache."""
+    if backend == "hash":
+        return f"hash:{EMBEDDING_HASH_DIM}"
+    if backend.startswith("onnx"):
+        return f"{backend}:{EMBEDDING_ONNX_FILE or _ONNX_DEFAULT_FILES[backend]}"
+    return backend
+
+
+def load_embedding_backend(backend: str = EMBEDDING_BACKEND, threads: int = EMBEDDING_THREADS,
+                           batch_size: int = EMBEDDING_ENCODE_BATCH_SIZE):
+    """
+    Load EMBEDDING_MODEL on CPU with the given backend (no embedding cache). All backends
+    return normalized vectors of the same model; int8 variants trade a little agreement
+    with the fp32 vectors for speed, see benchmark_embeddings.py. "hash" is the
+    model-free HashEmbeddings used by benchmark_rag.py.
+    """
+    if backend == "hash":
+        from models.hash_embeddings import HashEmbeddings
+
+        return HashEmbeddings(EMBEDDING_HASH_DIM)
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}; expected one of {', '.join(EMBEDDING_BACKENDS)} or hash")
+
+    model_kwargs: Dict[str, Any] = {'device': 'cpu'}
+    if backend.startswith("onnx"):
+        ort_kwargs: Dict[str, Any] = {
+            "file_name": EMBEDDING_ONNX_FILE or _ONNX_DEFAULT_FILES[backend],
+            "provider": "CPUExecutionProvider",
+        }
+        if threads:
+            import onnxruntime
+
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = threads
+            ort_kwargs["session_options"] = session_options
+        model_kwargs.update(backend="onnx", model_kwargs=ort_kwargs)
+    elif threads:
+        import torch
+
+        torch.set_num_threads(threads)
+
     try:
-        # older monolithic langchain
-        from langchain.embeddings import HuggingFaceEmbeddings
-        HuggingFaceEmbeddings = HuggingFaceEmbeddings
-    except Exception:
-        try:
-            # third-party connector name sometimes used
-            from langchain_huggingface import HuggingFaceEmbeddings
-            HuggingFaceEmbeddings = HuggingFaceEmbeddings
-        except Exception:
+        embeddings = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs=model_kwargs,
+            encode_kwargs={'normalize_embeddings': True, 'batch_size': batch_size}
+        )
+    except (ImportError, TypeError) as e:
+        if backend.startswith("onnx"):
             raise ImportError(
-                "Could not import HuggingFaceEmbeddings. "
-                "Install langchain-community or langchain or langchain-huggingface. "
-                "See requirements."
+                f"EMBEDDING_BACKEND={backend} needs sentence-transformers>=3.2 with ONNX support "
+                f"(pip install 'sentence-transformers[onnx]'): {e}"
             )
+        raise
+
+    if backend == "torch_int8":
+        import torch
+
+        model = getattr(embeddings, "_client", None) or getattr(embeddings, "client")
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return embeddings
 
-from config.config import EMBEDDING_MODEL
 
 def get_embeddings():
-    return HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL,
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
-    )
+    """
+    Return the process-wide embedding model, loading it on first use.
+    With EMBED_CACHE_ENABLED the model is wrapped in the persistent embedding cache,
+    so both index builds and query encoding skip texts embedded before.
+    """
+    global _embeddings
+    if _embeddings is not None:
+        return _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            embeddings = load_embedding_backend(EMBEDDING_BACKEND)
+            # Hashing is cheaper than a cache lookup
+            if EMBED_CACHE_ENABLED and EMBEDDING_BACKEND != "hash":
+                from models.embedding_cache import CachedEmbeddings, EmbeddingCache
+                # fp32 torch keeps the original namespace so existing caches stay valid
+                namespace = EMBEDDING_MODEL if EMBEDDING_BACKEND == "torch" else f"{EMBEDDING_MODEL}@{embedding_backend_id()}"
+                embeddings = CachedEmbeddings(embeddings, EmbeddingCache(namespace, normalize=True))
+            _embeddings = embeddings
+    return _embeddings
+
+
+def embedding_probe(embeddings=None) -> List[List[float]]:
+    """Vectors of PROBE_TEXTS (rounded to keep the manifest small)."""
+    vectors = (embeddings or get_embeddings()).embed_documents(PROBE_TEXTS)
+    return [[round(float(x), 6) for x in vector] for vector in vectors]
+
+
+def probe_agreement(probe: List[List[float]], embeddings=None) -> float:
+    """Lowest cosine similarity between stored probe vectors and the same texts embedded now."""
+    stored = np.asarray(probe, dtype=np.float32)
+    current = np.asarray((embeddings or get_embeddings()).embed_documents(PROBE_TEXTS[:len(stored)]), dtype=np.float32)
+    if stored.shape != current.shape:
+        return 0.0
+    stored /= np.linalg.norm(stored, axis=1, keepdims=True) + 1e-12
+    current /= np.linalg.norm(current, axis=1, keepdims=True) + 1e-12
+    return float(np.min(np.sum(stored * current, axis=1)))
@@ -0,0 +1,50 @@
+import os
+import re
+import sys
+import zlib
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+try:
+    from langchain_core.embeddings import Embeddings
+except Exception:
+    Embeddings = object
+
+from config.config import EMBEDDING_HASH_DIM
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1 << 16)
+def _hash_bucket(token: str, dim: int):
+    h = zlib.crc32(token.encode("utf-8"))
+    return h % dim, 1.0 if h & 0x80000000 else -1.0
+
+
+class HashEmbeddings(Embeddings):
+    """
+    EMBEDDING_BACKEND=hash: signed feature hashing of lower-cased words into `dim`
+    buckets, normalized. Deterministic and needs no model download, so benchmarks and
+    offline runs exercise the whole pipeline; the vectors only capture word overlap.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_HASH_DIM):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            bucket, sign = _hash_bucket(token, self.dim)
+            vector[bucket] += sign
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
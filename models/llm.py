@@ -1,20 +1,39 @@
+import contextvars
 import json
+import threading
 import traceback
 import os
-from typing import Any, Dict, List
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from config.config import GROQ_API_KEY, GROQ_MODEL, RESPONSE_MODES
-from utils.vector_store import load_vector_store
-
+from config.config import (
+    GROQ_API_KEY, GROQ_MODEL, GROQ_BASE_URL, RESPONSE_MODES, TOP_K_RESULTS, RETRIEVAL_MODE, ANSWER_CACHE_ENABLED,
+    CONTEXT_PACKING_ENABLED, CONTEXT_TOKEN_BUDGETS, WEB_RESULTS_IN_PROMPT, WEB_PROMPT_DEADLINE_SECONDS,
+    RETRIEVAL_TIMEOUT_SECONDS, RETRIEVAL_WORKERS, LLM_TIMEOUT_SECONDS, RERANK_ENABLED, RERANK_CANDIDATES, RERANK_TOP_K,
+)
+from models.embeddings import get_embeddings
+from models.reranker import get_reranker
+from utils.answer_cache import get_answer_cache
+from utils.context_packer import PASSAGE_SEPARATOR, pack_context
+from utils.lazy_import import LazyImport
+from utils.metadata_index import normalize_filters
+from utils.retrieval_engine import get_retrieval_engine
+from utils.tokens import estimate_tokens
+from utils.tracing import annotate, current_trace, span
+from utils.working_set import RetrievalWorkingSet
+
+
+Groq = LazyImport("groq:Groq", error="groq package not installed. Install with `pip install groq`.")
 
 try:
-    from groq import Groq
+    from utils.web_search import start_web_search
 except Exception:
-    Groq = None
+    start_web_search = None
 
 # Project-root debug paths 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -123,11 +142,16 @@ def _extract_text_from_groq_completion(completion: Any) -> str:
         return repr(completion)
 
 
+def _format_traceback(exc: Exception) -> str:
+    """exc's own traceback; format_exc() is empty once the except block has exited (e.g. in a generator)."""
+    return "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+
+
 def _write_debug_dump(completion: Any = None, exc: Exception = None) -> str:
     """Write debug dump to project root; return path written (JSON preferred)."""
     dump = {
         "error": repr(exc) if exc else None,
-        "traceback": traceback.format_exc() if exc else None,
+        "traceback": _format_traceback(exc) if exc else None,
         "completion_preview": None,
         "completion_repr": None,
     }
@@ -149,7 +173,7 @@ def _write_debug_dump(completion: Any = None, exc: Exception = None) -> str:
             with open(DEBUG_DUMP_TXT, "w", encoding="utf-8") as fh:
                 fh.write("Error: " + (repr(exc) if exc else "None") + "\n\n")
                 if exc:
-                    fh.write(traceback.format_exc() + "\n\n")
+                    fh.write(_format_traceback(exc) + "\n\n")
                 try:
                     fh.write("completion repr:\n" + repr(completion) + "\n\n")
                 except Exception:
@@ -191,87 +215,622 @@ def _protobuf_hint() -> str:
     return ""
 
 
-def get_legal_response(query: str, response_mode: str = "detailed") -> Dict[str, Any]:
-    """
-    Retrieve context from vector store, call Groq chat completions, and return:
-        {"result": <str>, "source_documents": <list>}
-    On failure, a safe fallback is returned and a debug dump is written.
-    """
-    # Pre-checks
-    if Groq is None:
-        raise ImportError("groq package not installed. Install with `pip install groq`.")
+def _check_llm_ready() -> None:
+    Groq.resolve()  # ImportError when groq is not installed
     if GROQ_API_KEY is None or GROQ_API_KEY.strip() == "":
         raise EnvironmentError("GROQ_API_KEY is not set. Please set it in your .env or environment.")
 
-    # Load vectorstore
+
+def create_groq_client(**kwargs) -> Any:
+    """Groq client for GROQ_API_KEY, pointed at GROQ_BASE_URL when that is set."""
+    _check_llm_ready()
+    if GROQ_BASE_URL:
+        kwargs.setdefault("base_url", GROQ_BASE_URL)
+    return Groq(api_key=GROQ_API_KEY, **kwargs)
+
+
+_groq_client = None
+_groq_client_lock = threading.Lock()
+# Runs the retrieval stage so it can be abandoned after RETRIEVAL_TIMEOUT_SECONDS. A slot is held
+# until the search really ends (also after its caller gave up on it), so searches never queue
+# behind abandoned ones: with every slot taken, new questions are answered without documents
+_retrieval_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+_retrieval_slots = threading.BoundedSemaphore(RETRIEVAL_WORKERS)
+# Best-effort work after an answer (working-set embeddings); dropped when this many are pending
+_background_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="background")
+_background_slots = threading.BoundedSemaphore(64)
+
+
+def _submit_bounded(pool: ThreadPoolExecutor, slots: threading.BoundedSemaphore, fn: Callable,
+                    *args) -> Optional[Future]:
+    """Run fn(*args) on pool if one of slots is free (released when fn returns); None when all are taken."""
+    if not slots.acquire(blocking=False):
+        return None
+
+    def run():
+        try:
+            return fn(*args)
+        finally:
+            slots.release()
+
     try:
-        vectorstore = load_vector_store()
+        return pool.submit(run)
+    except Exception:
+        slots.release()
+        raise
+
+
+def get_groq_client() -> Any:
+    """
+    Process-wide Groq client with an LLM_TIMEOUT_SECONDS request timeout. The client is
+    thread-safe, so every session and thread reuses its HTTP connection pool instead of
+    paying a new TLS handshake per question.
+    """
+    global _groq_client
+    if _groq_client is None:
+        with _groq_client_lock:
+            if _groq_client is None:
+                _groq_client = create_groq_client(timeout=LLM_TIMEOUT_SECONDS)
+    return _groq_client
+
+
+def prewarm() -> None:
+    """Load the embedding model, the index and its sidecars, the Groq client and the answer cache."""
+    started = time.perf_counter()
+    get_retrieval_engine().warm_up()
+    if RERANK_ENABLED:
+        try:
+            get_reranker()
+        except Exception as e:
+            print(f"Prewarm: reranker not ready ({e})")
+    if ANSWER_CACHE_ENABLED:
+        get_answer_cache()
+    try:
+        get_groq_client()
+    except Exception as e:
+        print(f"Prewarm: Groq client not ready ({e})")
+    print(f"Prewarmed model and index in {time.perf_counter() - started:.2f}s")
+
+
+_prewarm_thread: Optional[threading.Thread] = None
+_prewarm_lock = threading.Lock()
+
+
+def start_prewarm() -> threading.Thread:
+    """
+    Run prewarm() in a daemon thread, once per process, so the UI can render while the
+    model and index load; a question asked meanwhile waits on the same locks instead
+    of loading them twice. Returns the thread (is_alive() while still warming up).
+    """
+    global _prewarm_thread
+    if _prewarm_thread is None:
+        with _prewarm_lock:
+            if _prewarm_thread is None:
+                def run():
+                    try:
+                        prewarm()
+                    except Exception as e:
+                        print(f"Prewarm failed: {e}")
+
+                _prewarm_thread = threading.Thread(target=run, name="prewarm", daemon=True)
+                _prewarm_thread.start()
+    return _prewarm_thread
+
+
+def _usage_attrs(completion: Any) -> Dict[str, Any]:
+    """Token usage reported by Groq (completion.usage, or x_groq.usage on the last stream chunk)."""
+    usage = getattr(completion, "usage", None) or getattr(getattr(completion, "x_groq", None), "usage", None)
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+    }
+
+
+def request_completion(client: Any, prompt: str) -> str:
+    """
+    One blocking chat completion for prompt; raises on API errors (callers decide how to
+    recover). The raised exception carries the response received so far as .completion.
+    """
+    completion = None
+    try:
+        with span("llm", model=GROQ_MODEL) as llm_span:
+            completion = client.chat.completions.create(
+                model=GROQ_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=2048, 
+            )
+            llm_span.set(**_usage_attrs(completion))
+        text = _extract_text_from_groq_completion(completion)
+    except Exception as exc:
+        # Whatever the API returned goes into the caller's debug dump (see fallback_answer)
+        try:
+            exc.completion = completion
+        except Exception:
+            pass
+        raise
+    if current_trace() is not None:
+        annotate(answer_tokens_est=estimate_tokens(text), **_usage_attrs(completion))
+    return text
+
+
+def _retrieve_documents(query: str, retrieval_mode: str = None, vector: Optional[List[float]] = None,
+                        filters: Optional[Dict[str, Any]] = None) -> List[Any]:
+    # Resident vectorstore (loaded once per process, reloaded only when the index changes)
+    engine = get_retrieval_engine()
+    try:
+        engine.ensure_loaded()
     except Exception as e:
         raise RuntimeError(f"Failed to load vector store: {e}")
 
-    # Retrieve context documents 
+    # Retrieve context documents; a search slower than RETRIEVAL_TIMEOUT_SECONDS is abandoned
+    def search():
+        k = max(RERANK_CANDIDATES, TOP_K_RESULTS) if RERANK_ENABLED else TOP_K_RESULTS
+        with span("retrieve", k=k, mode=retrieval_mode, filters=filters):
+            docs = engine.search(query, k=k, mode=retrieval_mode, vector=vector, filters=filters)
+        return _rerank_documents(query, docs) if RERANK_ENABLED else docs
+
+    future = _submit_bounded(_retrieval_pool, _retrieval_slots, contextvars.copy_context().run, search)
+    if future is None:
+        print(f"All {RETRIEVAL_WORKERS} retrieval workers are busy with searches that overran "
+              f"RETRIEVAL_TIMEOUT_SECONDS; answering without documents")
+        annotate(retrieval_rejected=True)
+        return []
     try:
-        docs = vectorstore.similarity_search(query, k=5)
+        return future.result(timeout=RETRIEVAL_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        print(f"Retrieval took longer than {RETRIEVAL_TIMEOUT_SECONDS}s; answering without documents")
+        return []
     except Exception:
-        docs = []
         # Continue without docs if retrieval failed
+        return []
+
+
+def _rerank_documents(query: str, docs: List[Any]) -> List[Any]:
+    """
+    Second stage: the best RERANK_TOP_K candidates by cross-encoder score. When the model
+    cannot load or RERANK_BUDGET_MS runs out, the first TOP_K_RESULTS keep their search order.
+    """
+    if not docs:
+        return docs
+    try:
+        reranker = get_reranker()
+    except Exception as e:
+        print(f"Reranker unavailable, keeping search order: {e}")
+        return docs[:TOP_K_RESULTS]
+    with span("rerank", candidates=len(docs)) as rerank_span:
+        ranked, stats = reranker.rerank(query, docs, RERANK_TOP_K, fallback_k=TOP_K_RESULTS)
+        rerank_span.set(cached=stats["cached"], scored=stats["scored"], fallback=stats["fallback"])
+    if stats["fallback"]:
+        annotate(rerank_fallback=True)
+    return ranked
+
+
+def _remember_documents(working_set: RetrievalWorkingSet, docs: List[Any], filters: Optional[Dict[str, Any]],
+                        index_version: Optional[str]) -> None:
+    try:
+        working_set.add(docs, get_embeddings().embed_documents, filters, index_version)
+    except Exception as e:
+        print(f"Could not add retrieved chunks to the working set: {e}")
+
+
+def _working_set_documents(query: str, filters: Optional[Dict[str, Any]] = None,
+                           working_set: Optional[RetrievalWorkingSet] = None,
+                           ) -> Tuple[Optional[List[Any]], Optional[List[float]]]:
+    """
+    Re-rank the chunks already in the session's working_set for query. Returns (docs,
+    vector): docs when the best chunk scores at least the set's min_score (the question
+    is answered from this conversation, without the answer cache or a global search),
+    else None; vector is the query embedding if one was computed, for the later stages.
+    """
+    if working_set is None or working_set.min_score <= 0 or not len(working_set):
+        return None, None
+    vector = None
+    try:
+        engine = get_retrieval_engine()
+        engine.ensure_loaded()
+        with span("embed_query"):
+            vector = get_embeddings().embed_query(query)
+        with span("working_set", chunks=len(working_set)) as set_span:
+            docs = working_set.lookup(vector, TOP_K_RESULTS, filters, engine.version)
+            set_span.set(reused=docs is not None)
+    except Exception as e:
+        print(f"Working set lookup failed: {e}")
+        return None, vector
+    if docs is not None:
+        annotate(working_set=len(docs))
+    return docs, vector
+
+
+def _remember_in_working_set(working_set: Optional[RetrievalWorkingSet], docs: List[Any],
+                             filters: Optional[Dict[str, Any]] = None) -> None:
+    """Add docs to the working set in the background, off the answer's critical path."""
+    if working_set is None or working_set.min_score <= 0 or not docs:
+        return
+    _submit_bounded(_background_pool, _background_slots, _remember_documents, working_set, docs, filters,
+                    get_retrieval_engine().version)
+
+
+def _start_web_search(query: str, use_web: bool):
+    """Start the web search in the background so it overlaps retrieval and generation."""
+    if not use_web or start_web_search is None:
+        return None
+    try:
+        return start_web_search(query)
+    except Exception as e:
+        print(f"Could not start web search: {e}")
+        return None
+
+
+def _web_results_for_prompt(web_task) -> List[Dict[str, Any]]:
+    """Web results that arrived within WEB_PROMPT_DEADLINE_SECONDS of the question, else []."""
+    if web_task is None or not WEB_RESULTS_IN_PROMPT:
+        return []
+    with span("web_wait") as wait_span:
+        results = web_task.results(wait=WEB_PROMPT_DEADLINE_SECONDS - web_task.elapsed())
+        results = [r for r in results if "error" not in r]
+        wait_span.set(results=len(results))
+    return results
 
-    # Build prompt context
-    context = "\n\n".join([getattr(d, "page_content", str(d)) for d in docs])
+
+def _lookup_answer_cache(
+    query: str, response_mode: str, retrieval_mode: str = None, filters: Optional[Dict[str, Any]] = None,
+    use_web: bool = False, embedding: Optional[List[float]] = None,
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Check the answer cache before retrieval. Returns (hit, entry): hit is the cached
+    {"result", "source_documents", "cache"} or None, and entry holds what _store_answer
+    needs (cache key parts and the query embedding, which retrieval then reuses), or is
+    None when the cache is disabled or unavailable. embedding is the query embedding
+    when the caller already computed it. With use_web (and WEB_RESULTS_IN_PROMPT) the
+    question wants live web results, so the cache is not read; its answer is still
+    stored when no web snippet made it into the prompt (see _store_answer).
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None, None
+    engine = get_retrieval_engine()
+    try:
+        engine.ensure_loaded()
+    except Exception as e:
+        raise RuntimeError(f"Failed to load vector store: {e}")
+
+    entry = {
+        "query": query,
+        "response_mode": response_mode,
+        "model": GROQ_MODEL,
+        "index_version": engine.version or "unknown",
+        # Answers written from reranked chunks are kept apart from plain ones
+        "retrieval_mode": (retrieval_mode or RETRIEVAL_MODE) + ("+rerank" if RERANK_ENABLED else ""),
+        "filters": normalize_filters(filters),
+        "embedding": embedding,
+    }
+    try:
+        cache = get_answer_cache()
+        if cache.semantic_threshold > 0 and entry["embedding"] is None:
+            with span("embed_query"):
+                entry["embedding"] = get_embeddings().embed_query(query)
+        if use_web and WEB_RESULTS_IN_PROMPT:
+            return None, entry
+        with span("answer_cache") as cache_span:
+            hit = cache.lookup(**entry)
+            cache_span.set(hit=hit["cache"] if hit else None)
+    except Exception as e:
+        print(f"Answer cache lookup failed: {e}")
+        return None, None
+    if hit is not None:
+        annotate(answer_cache=hit["cache"])
+    return hit, entry
+
+
+def _store_answer(entry: Optional[Dict[str, Any]], answer: str, docs: List[Any],
+                  context_stats: Optional[Dict[str, Any]] = None) -> None:
+    # Answers written from live web snippets would outlive them by ANSWER_CACHE_TTL_SECONDS
+    if entry is None or not answer or (context_stats or {}).get("web_results"):
+        return
+    try:
+        get_answer_cache().store(answer=answer, source_documents=docs, **entry)
+    except Exception as e:
+        print(f"Could not store answer in cache: {e}")
+
+
+def build_prompt(query: str, docs: List[Any], response_mode: str,
+                 web_results: Optional[List[Dict[str, Any]]] = None) -> str:
+    return build_prompt_with_stats(query, docs, response_mode, web_results)[0]
+
+
+def build_prompt_with_stats(query: str, docs: List[Any], response_mode: str,
+                            web_results: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Prompt for query plus the context packing stats (raw vs packed context tokens, merged
+    chunks, dropped duplicates). With CONTEXT_PACKING_ENABLED the context is packed into the
+    CONTEXT_TOKEN_BUDGETS entry of response_mode; otherwise all chunks are concatenated.
+    web_results (title / snippet / url dicts) are added as a separate section.
+    """
+    with span("build_prompt"):
+        if CONTEXT_PACKING_ENABLED:
+            budget = CONTEXT_TOKEN_BUDGETS.get(response_mode, CONTEXT_TOKEN_BUDGETS.get("detailed"))
+            context, stats = pack_context(docs, budget)
+        else:
+            context = PASSAGE_SEPARATOR.join([getattr(d, "page_content", str(d)) for d in docs])
+            tokens = estimate_tokens(context)
+            stats = {"raw_tokens": tokens, "packed_tokens": tokens, "saved_tokens": 0, "chunks": len(docs)}
+        prompt = _build_prompt(query, context, response_mode, web_results)
+        stats["web_results"] = len(web_results or [])
+    if current_trace() is not None:
+        annotate(n_docs=len(docs), context_chars=len(context), context_tokens_est=stats["packed_tokens"],
+                 context_tokens_saved=stats["saved_tokens"], prompt_chars=len(prompt),
+                 prompt_tokens_est=estimate_tokens(prompt))
+    return prompt, stats
+
+
+def _format_web_context(web_results: Optional[List[Dict[str, Any]]]) -> str:
+    if not web_results:
+        return ""
+    lines = [f"- {r.get('title') or 'Result'}: {r.get('snippet') or ''} ({r.get('url') or ''})" for r in web_results]
+    return (
+        "Recent web results (may be newer than the case documents; mention the URL if you rely on one):\n"
+        + "\n".join(lines) + "\n\n"
+    )
+
+
+def _build_prompt(query: str, context: str, response_mode: str,
+                  web_results: Optional[List[Dict[str, Any]]] = None) -> str:
     mode_instruction = RESPONSE_MODES.get(response_mode, RESPONSE_MODES.get("detailed", "Provide a detailed answer."))
-    prompt = (
+    return (
         "You are an expert Indian legal assistant specializing in Supreme Court judgments.\n"
         f"{mode_instruction}\n\n"
         "Use the following Supreme Court case documents to answer the question.\n"
         "If you don't know the answer, say so clearly. Always cite case names when relevant.\n\n"
         f"Context:\n{context}\n\n"
+        f"{_format_web_context(web_results)}"
         f"Question: {query}\n\nAnswer:"
     )
 
-    client = Groq(api_key=GROQ_API_KEY)
+
+def fallback_answer(docs: List[Any], response_mode: str, completion: Any, exc: Exception) -> str:
+    """Write a debug dump and build the retrieved-excerpts answer used when the LLM call fails."""
+    dump_path = _write_debug_dump(completion, exc)
+    proto_hint = _protobuf_hint()
+    proto_hint_text = f"\n\n{proto_hint}" if proto_hint else ""
+
+    if docs:
+        try:
+            if response_mode == "concise":
+                fallback = " ".join([getattr(d, "page_content", "")[:800].split("\n", 1)[0] for d in docs[:2]])
+            else:
+                fallback = "\n\n---\n\n".join([getattr(d, "page_content", "")[:2000] for d in docs[:4]])
+            return (
+                "LLM call failed. Returning retrieved document excerpts as fallback.\n\n"
+                + fallback
+                + f"\n\n(Debug dump written to: {dump_path})"
+                + proto_hint_text
+            )
+        except Exception:
+            return f"LLM call failed and assembling fallback also failed. Debug: {dump_path}" + proto_hint_text
+    return f"LLM call failed and no documents available. Debug: {dump_path}" + proto_hint_text
+
+
+def get_legal_response(query: str, response_mode: str = "detailed", retrieval_mode: str = None,
+                       filters: Optional[Dict[str, Any]] = None, use_web: bool = False,
+                       working_set: Optional[RetrievalWorkingSet] = None) -> Dict[str, Any]:
+    """
+    Retrieve context from vector store, call Groq chat completions, and return:
+        {"result": <str>, "source_documents": <list>, "context_stats": <dict>, "web": <task or None>}
+    retrieval_mode is "dense" or "hybrid" (defaults to config RETRIEVAL_MODE).
+    filters restrict retrieval by judgment metadata, e.g. {"year_from": 2016,
+    "collections": ["supremecourt"]} (see utils.metadata_index.FILTER_KEYS).
+    context_stats reports the prompt tokens saved by context packing.
+    With use_web a web search starts before retrieval and runs alongside it; its snippets
+    go into the prompt if they arrive within WEB_PROMPT_DEADLINE_SECONDS, and "web" is the
+    utils.web_search.WebSearchTask whose results() the caller can list under the answer.
+    working_set is the chat session's utils.working_set.RetrievalWorkingSet: follow-ups are
+    answered from chunks retrieved earlier in the session when they match well enough, and
+    "working_set" is True on the result when that happened; such questions bypass the
+    shared answer cache, which is only consulted when the working set has no match.
+    Answers served from the answer cache also carry "cache": "exact" | "semantic"; questions
+    with use_web are not answered from it, and answers written with web snippets are not cached.
+    On failure, a safe fallback is returned and a debug dump is written.
+    """
+    _check_llm_ready()
+    web_task = _start_web_search(query, use_web)
+    # A follow-up answered from this conversation's chunks must not use (or fill) the shared answer cache
+    docs, vector = _working_set_documents(query, filters, working_set)
+    reused = docs is not None
+    cache_entry = None
+    if not reused:
+        hit, cache_entry = _lookup_answer_cache(query, response_mode, retrieval_mode, filters, use_web=use_web,
+                                                embedding=vector)
+        if hit is not None:
+            _remember_in_working_set(working_set, hit["source_documents"], filters)
+            return dict(hit, web=web_task)
+        docs = _retrieve_documents(query, retrieval_mode, vector=vector or (cache_entry and cache_entry["embedding"]),
+                                   filters=filters)
+        _remember_in_working_set(working_set, docs, filters)
+    prompt, context_stats = build_prompt_with_stats(query, docs, response_mode, _web_results_for_prompt(web_task))
+
+    client = get_groq_client()
 
    
     _maybe_remove_debug_files()
 
     try:
-        completion = client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=2048, 
-        )
-
-        text = _extract_text_from_groq_completion(completion)
+        text = request_completion(client, prompt)
 
         
         _maybe_remove_debug_files()
 
-        return {"result": text, "source_documents": docs}
+        _store_answer(cache_entry, text, docs, context_stats)
+        return {"result": text, "source_documents": docs, "context_stats": context_stats, "web": web_task,
+                "working_set": reused}
 
     except Exception as exc:
-        
-        dump_path = _write_debug_dump(locals().get("completion", None), exc)
-        proto_hint = _protobuf_hint()
-        proto_hint_text = f"\n\n{proto_hint}" if proto_hint else ""
+        return {
+            "result": fallback_answer(docs, response_mode, getattr(exc, "completion", None), exc),
+            "source_documents": docs,
+            "context_stats": context_stats,
+            "web": web_task,
+            "working_set": reused,
+        }
 
-        
-        if docs:
+
+def _extract_delta_from_groq_chunk(chunk: Any) -> str:
+    """Text of one streamed ChatCompletionChunk: choices[0].delta.content, or the dict shape."""
+    try:
+        c0 = chunk.choices[0]
+        content = getattr(getattr(c0, "delta", None), "content", None)
+        if content:
+            return content
+    except Exception:
+        pass
+    try:
+        chunk_dict = _safe_to_dict(chunk)
+        if isinstance(chunk_dict, dict):
+            choices = chunk_dict.get("choices") or []
+            if choices and isinstance(choices[0], dict):
+                delta = choices[0].get("delta") or {}
+                if isinstance(delta, dict) and delta.get("content"):
+                    return delta["content"]
+    except Exception:
+        pass
+    return ""
+
+
+def _stream_completion(client: Any, prompt: str, docs: List[Any], response_mode: str,
+                       metrics: Dict[str, Any], trace: Any = None) -> Iterator[str]:
+    """
+    Yield answer text as Groq streams it. If the stream fails before any text arrived,
+    the request is retried once without streaming so the usual completion extraction
+    applies; if it fails partway, the text shown so far is kept and the fallback answer
+    is appended. metrics["ttft_s"] / ["total_s"] are measured from metrics["started"].
+    The generator runs while the caller consumes it, so the "llm" span goes to the
+    trace captured when the request started rather than to whatever trace is current.
+    """
+    _maybe_remove_debug_files()
+    parts: List[str] = []
+    last_chunk = None
+    llm_started = time.perf_counter()
+    try:
+        try:
+            stream = client.chat.completions.create(
+                model=GROQ_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=2048,
+                stream=True,
+            )
+            for last_chunk in stream:
+                delta = _extract_delta_from_groq_chunk(last_chunk)
+                if not delta:
+                    continue
+                if metrics["ttft_s"] is None:
+                    metrics["ttft_s"] = time.perf_counter() - metrics["started"]
+                parts.append(delta)
+                yield delta
+            _maybe_remove_debug_files()
+            return
+        except Exception as exc:
+            stream_error = exc
+
+        completion = last_chunk
+        if not parts:
             try:
-                if response_mode == "concise":
-                    fallback = " ".join([getattr(d, "page_content", "")[:800].split("\n", 1)[0] for d in docs[:2]])
-                else:
-                    fallback = "\n\n---\n\n".join([getattr(d, "page_content", "")[:2000] for d in docs[:4]])
-                fallback_answer = (
-                    "LLM call failed. Returning retrieved document excerpts as fallback.\n\n"
-                    + fallback
-                    + f"\n\n(Debug dump written to: {dump_path})"
-                    + proto_hint_text
+                completion = client.chat.completions.create(
+                    model=GROQ_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.3,
+                    max_tokens=2048,
                 )
-            except Exception:
-                fallback_answer = (
-                    f"LLM call failed and assembling fallback also failed. Debug: {dump_path}" + proto_hint_text
-                )
-        else:
-            fallback_answer = f"LLM call failed and no documents available. Debug: {dump_path}" + proto_hint_text
-
-        return {"result": fallback_answer, "source_documents": docs}
+                text = _extract_text_from_groq_completion(completion)
+                metrics["ttft_s"] = time.perf_counter() - metrics["started"]
+                metrics["streamed"] = False
+                _maybe_remove_debug_files()
+                parts.append(text)
+                yield text
+                return
+            except Exception as exc:
+                stream_error = exc
+
+        metrics["fallback"] = True
+        fallback = fallback_answer(docs, response_mode, completion, stream_error)
+        if parts:
+            fallback = "\n\n_(The answer stream was interrupted.)_\n\n" + fallback
+        elif metrics["ttft_s"] is None:
+            metrics["ttft_s"] = time.perf_counter() - metrics["started"]
+        parts.append(fallback)
+        yield fallback
+    finally:
+        metrics["total_s"] = time.perf_counter() - metrics["started"]
+        metrics["result"] = "".join(parts)
+        if trace is not None:
+            usage = _usage_attrs(last_chunk)
+            ttft_ms = metrics["ttft_s"] * 1000.0 if metrics["ttft_s"] is not None else None
+            trace.add_span("llm", llm_started, time.perf_counter(), model=GROQ_MODEL, streamed=metrics["streamed"],
+                           ttft_ms=ttft_ms, **usage)
+            trace.set(ttft_ms=ttft_ms, fallback=metrics["fallback"],
+                      answer_tokens_est=estimate_tokens(metrics["result"]), **usage)
+
+
+def _cache_streamed_answer(stream: Iterator[str], entry: Optional[Dict[str, Any]], docs: List[Any],
+                           metrics: Dict[str, Any]) -> Iterator[str]:
+    """Pass the stream through and cache the answer once it completed without falling back."""
+    yield from stream
+    if not metrics["fallback"]:
+        _store_answer(entry, metrics["result"], docs, metrics["context_stats"])
+
+
+def stream_legal_response(query: str, response_mode: str = "detailed", retrieval_mode: str = None,
+                          filters: Optional[Dict[str, Any]] = None, use_web: bool = False,
+                          working_set: Optional[RetrievalWorkingSet] = None) -> Dict[str, Any]:
+    """
+    Streaming variant of get_legal_response. Retrieval runs immediately; returns
+        {"stream": <iterator of text deltas>, "source_documents": <list>, "metrics": <dict>, "web": <task or None>}
+    metrics is filled while the stream is consumed: retrieval_s, ttft_s (time to first
+    token, from the start of this call), total_s, result (full text), streamed, fallback,
+    cache, context_stats (see build_prompt_with_stats), working_set (True when the chunks came
+    from the session's working set, see get_legal_response). A cached answer is returned as a
+    single-chunk stream with "cache" set to "exact" or "semantic" (also on the returned dict).
+    """
+    _check_llm_ready()
+    metrics: Dict[str, Any] = {
+        "started": time.perf_counter(), "retrieval_s": None, "ttft_s": None, "total_s": None,
+        "result": "", "streamed": True, "fallback": False, "cache": None, "context_stats": None,
+        "working_set": False,
+    }
+    web_task = _start_web_search(query, use_web)
+    docs, vector = _working_set_documents(query, filters, working_set)
+    metrics["working_set"] = docs is not None
+    hit = cache_entry = None
+    if not metrics["working_set"]:
+        hit, cache_entry = _lookup_answer_cache(query, response_mode, retrieval_mode, filters, use_web=use_web,
+                                                embedding=vector)
+    if hit is not None:
+        _remember_in_working_set(working_set, hit["source_documents"], filters)
+        elapsed = time.perf_counter() - metrics["started"]
+        metrics.update(retrieval_s=0.0, ttft_s=elapsed, total_s=elapsed, result=hit["result"],
+                       streamed=False, cache=hit["cache"])
+        return {
+            "stream": iter([hit["result"]]),
+            "source_documents": hit["source_documents"],
+            "metrics": metrics,
+            "cache": hit["cache"],
+            "web": web_task,
+        }
+
+    if not metrics["working_set"]:
+        docs = _retrieve_documents(query, retrieval_mode, vector=vector or (cache_entry and cache_entry["embedding"]),
+                                   filters=filters)
+        _remember_in_working_set(working_set, docs, filters)
+    metrics["retrieval_s"] = time.perf_counter() - metrics["started"]
+    prompt, metrics["context_stats"] = build_prompt_with_stats(query, docs, response_mode,
+                                                               _web_results_for_prompt(web_task))
+
+    client = get_groq_client()
+    stream = _stream_completion(client, prompt, docs, response_mode, metrics, trace=current_trace())
+    return {
+        "stream": _cache_streamed_answer(stream, cache_entry, docs, metrics),
+        "source_documents": docs,
+        "metrics": metrics,
+        "web": web_task,
+    }
@@ -0,0 +1,189 @@
+# models/reranker.py — optional cross-encoder second stage over the retrieved candidates
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import (
+    RERANK_BACKEND, RERANK_MODEL, RERANK_BATCH_SIZE, RERANK_BUDGET_MS, RERANK_CACHE_MAX_ENTRIES,
+    RERANK_ESTIMATE_HALF_LIFE_SECONDS,
+)
+from utils.answer_cache import normalize_query
+from utils.lazy_import import LazyImport
+
+CrossEncoder = LazyImport(
+    "sentence_transformers:CrossEncoder",
+    error="RERANK_BACKEND=cross_encoder needs sentence-transformers. Install with `pip install sentence-transformers`.",
+)
+
+RERANK_BACKENDS = ("cross_encoder", "overlap")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class OverlapScorer:
+    """
+    RERANK_BACKEND=overlap: share of the query's words that occur in the passage. No
+    model download, so benchmarks and offline runs exercise the reranking stage (with
+    --pair-cost-ms in benchmark_rerank.py standing in for the cross-encoder's CPU time).
+    """
+
+    def predict(self, pairs: List[Tuple[str, str]], batch_size: int = RERANK_BATCH_SIZE, **kwargs) -> List[float]:
+        scores = []
+        for query, passage in pairs:
+            query_words = set(_TOKEN_RE.findall(query.lower()))
+            passage_words = set(_TOKEN_RE.findall(passage.lower()))
+            scores.append(len(query_words & passage_words) / float(len(query_words) or 1))
+        return scores
+
+
+def load_reranker_backend(backend: str = RERANK_BACKEND):
+    """A scorer with predict([(query, passage), ...], batch_size=...) -> relevance scores, on CPU."""
+    if backend == "overlap":
+        return OverlapScorer()
+    if backend != "cross_encoder":
+        raise ValueError(f"Unknown RERANK_BACKEND {backend!r}; expected one of {', '.join(RERANK_BACKENDS)}")
+    return CrossEncoder(RERANK_MODEL, device="cpu")
+
+
+def _chunk_key(doc: Any) -> str:
+    return getattr(doc, "metadata", {}).get("chunk_id") or getattr(doc, "page_content", str(doc))
+
+
+class Reranker:
+    """
+    Second retrieval stage: scores (query, chunk) pairs with a cross-encoder and keeps the
+    best top_k of the dense / hybrid candidates.
+
+    Pairs are scored in batches of `batch_size`, in candidate order, and every score is
+    kept in an LRU cache of `cache_max_entries` (keyed by model, normalized query and
+    chunk), so repeated questions and overlapping candidate lists only score new pairs.
+    Each query has `budget_ms` to finish: before every batch, including the first, the
+    measured time per pair must say all remaining pairs still fit, otherwise the
+    candidates are returned in their original order (scores computed so far stay
+    cached). The time per pair halves every `estimate_half_life` seconds without a new
+    measurement, so after a slow batch (a cold model, a busy CPU) a later query gets to
+    score again and re-measure it. The model is warmed up before use so its first, slow
+    call does not count.
+    """
+
+    def __init__(self, scorer=None, model_id: str = "", batch_size: int = RERANK_BATCH_SIZE,
+                 budget_ms: float = RERANK_BUDGET_MS, cache_max_entries: int = RERANK_CACHE_MAX_ENTRIES,
+                 estimate_half_life: float = RERANK_ESTIMATE_HALF_LIFE_SECONDS):
+        self.scorer = scorer if scorer is not None else load_reranker_backend()
+        self.model_id = model_id or (RERANK_MODEL if RERANK_BACKEND == "cross_encoder" else RERANK_BACKEND)
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache_max_entries = cache_max_entries
+        self.estimate_half_life = estimate_half_life
+        self._cache: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._seconds_per_pair: Optional[float] = None  # moving average over batches
+        self._measured_at = 0.0
+
+    def _cached(self, keys: List[Tuple[str, str, str]]) -> Dict[Tuple[str, str, str], float]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[key] = self._cache[key]
+        return found
+
+    def _store(self, scores: Dict[Tuple[str, str, str], float]) -> None:
+        with self._lock:
+            self._cache.update(scores)
+            for key in scores:
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+
+    def _estimate(self, now: float) -> float:
+        """Seconds per pair, decayed since it was last measured (0 before the first batch)."""
+        if self._seconds_per_pair is None:
+            return 0.0
+        if self.estimate_half_life <= 0:
+            return self._seconds_per_pair
+        return self._seconds_per_pair * 0.5 ** ((now - self._measured_at) / self.estimate_half_life)
+
+    def _record_batch(self, pairs: int, seconds: float) -> None:
+        per_pair = seconds / pairs
+        now = time.perf_counter()
+        with self._lock:
+            if self._seconds_per_pair is None:
+                self._seconds_per_pair = per_pair
+            else:
+                self._seconds_per_pair = 0.8 * self._estimate(now) + 0.2 * per_pair
+            self._measured_at = now
+
+    def rerank(self, query: str, docs: List[Any], top_k: int, budget_ms: Optional[float] = None,
+               fallback_k: Optional[int] = None) -> Tuple[List[Any], Dict[str, Any]]:
+        """
+        The top_k of docs by cross-encoder score (best first), or the first fallback_k
+        (default top_k) in their original order when the latency budget (budget_ms, default
+        self.budget_ms; 0 = none) runs out. Also returns stats: candidates, cached, scored,
+        fallback, elapsed_ms.
+        """
+        started = time.perf_counter()
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        deadline = started + budget_ms / 1000.0 if budget_ms > 0 else None
+        query_key = normalize_query(query)
+        keys = [(self.model_id, query_key, _chunk_key(doc)) for doc in docs]
+        scores = self._cached(keys)
+        stats = {"candidates": len(docs), "cached": len(scores), "scored": 0, "fallback": False}
+
+        pending = [i for i, key in enumerate(keys) if key not in scores]
+        for offset in range(0, len(pending), self.batch_size):
+            if deadline is not None:
+                now = time.perf_counter()
+                if now + self._estimate(now) * (len(pending) - offset) > deadline:
+                    stats["fallback"] = True
+                    break
+            batch = pending[offset:offset + self.batch_size]
+            batch_started = time.perf_counter()
+            batch_scores = self.scorer.predict(
+                [(query, getattr(docs[i], "page_content", str(docs[i]))) for i in batch],
+                batch_size=self.batch_size, show_progress_bar=False,
+            )
+            self._record_batch(len(batch), time.perf_counter() - batch_started)
+            new_scores = {keys[i]: float(score) for i, score in zip(batch, batch_scores)}
+            self._store(new_scores)
+            scores.update(new_scores)
+            stats["scored"] += len(batch)
+
+        if stats["fallback"]:
+            ranked = docs[:fallback_k or top_k]
+        else:
+            order = sorted(range(len(docs)), key=lambda i: -scores[keys[i]])
+            ranked = [docs[i] for i in order[:top_k]]
+        stats["elapsed_ms"] = (time.perf_counter() - started) * 1000.0
+        return ranked, stats
+
+    def warm_up(self) -> None:
+        """One untimed predict call: lazy initialisation and first-call allocations."""
+        self.scorer.predict([("warm up", "warm up")], batch_size=1, show_progress_bar=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Reranker:
+    """Process-wide reranker (RERANK_BACKEND), loading and warming up the model on first use."""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                reranker = Reranker()
+                reranker.warm_up()
+                _reranker = reranker
+    return _reranker
@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+DEFAULT_MODULES = ["models.llm", "utils.retrieval_engine", "utils.vector_store", "utils.ingestion", "utils.web_search"]
+# Dependencies that should only be imported on first use, never by importing the modules above
+HEAVY_MODULES = [
+    "torch", "transformers", "sentence_transformers", "onnxruntime", "faiss", "groq",
+    "langchain_community.vectorstores", "langchain_community.embeddings", "langchain_huggingface",
+    "langchain_text_splitters", "duckduckgo_search",
+]
+
+
+def profile_module(module: str) -> dict:
+    """Import `module` in a fresh interpreter under -X importtime and summarize the result."""
+    code = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - started)\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    )
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # header line
+        imports.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000.0,
+            "cumulative_ms": int(cumulative_us) / 1000.0,
+        })
+    if completed.returncode != 0:
+        return {"module": module, "error": (completed.stderr.strip().splitlines() or ["import failed"])[-1]}
+    out = completed.stdout.strip().splitlines()
+    return {
+        "module": module,
+        "import_seconds": float(out[-2]),
+        "interpreter_seconds": wall,
+        "modules_imported": len(imports),
+        "heavy_imported": json.loads(out[-1]),
+        "imports": imports,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import-time profile of the app's modules (python -X importtime in a fresh interpreter each)."
+    )
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list per module.")
+    parser.add_argument("--json", help="Also write the full profiles to this JSON file.")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if a module pulls in one of the heavy dependencies at import time.")
+    args = parser.parse_args()
+
+    profiles = [profile_module(module) for module in args.modules]
+    eager = False
+    for profile in profiles:
+        if "error" in profile:
+            print(f"\n{profile['module']}: {profile['error']}")
+            continue
+        print(f"\n{profile['module']}: {profile['import_seconds'] * 1000:.0f} ms import, "
+              f"{profile['interpreter_seconds'] * 1000:.0f} ms with interpreter start, "
+              f"{profile['modules_imported']} modules")
+        if profile["heavy_imported"]:
+            eager = True
+            print(f"  imported eagerly: {', '.join(profile['heavy_imported'])}")
+        # Self time summed per top-level package, then the single slowest modules
+        packages = {}
+        for entry in profile["imports"]:
+            package = entry["module"].split(".")[0]
+            packages[package] = packages.get(package, 0.0) + entry["self_ms"]
+        print("  by package: " + ", ".join(
+            f"{name} {ms:.0f}ms" for name, ms in sorted(packages.items(), key=lambda kv: -kv[1])[:8]
+        ))
+        for entry in sorted(profile["imports"], key=lambda e: -e["self_ms"])[:args.top]:
+            print(f"  {entry['self_ms']:8.1f} ms self {entry['cumulative_ms']:9.1f} ms cumulative  {entry['module']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+                       "profiles": profiles}, fh, indent=2)
+        print(f"\nWrote {args.json}")
+    if args.check and eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import json
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+
+import utils.ann_index as ann_index
+import utils.vector_store as vector_store
+
+
+def test_changed_build_parameters_rebuild_the_ann_index(monkeypatch, tmp_path):
+    store_dir = str(tmp_path)
+    for name in ("chunk_store_exists", "lexical_index_exists", "metadata_index_exists"):
+        monkeypatch.setattr(vector_store, name, lambda store_dir: True)
+    monkeypatch.setattr(vector_store, "read_compact_info", lambda store_dir: {"storage": vector_store.VECTOR_STORAGE})
+    monkeypatch.setattr(vector_store, "FAISS_INDEX_TYPE", "ivf_flat")
+    exact = faiss.IndexFlatL2(8)
+    exact.add(np.random.default_rng(3).standard_normal((800, 8)).astype(np.float32))
+    vectorstore = SimpleNamespace(index=exact)
+
+    monkeypatch.setattr(ann_index, "IVF_NLIST", 4)
+    assert vector_store._save_missing_sidecars(vectorstore, store_dir)
+    assert not vector_store._save_missing_sidecars(vectorstore, store_dir)
+
+    monkeypatch.setattr(ann_index, "IVF_NLIST", 8)
+    assert vector_store._save_missing_sidecars(vectorstore, store_dir)
+    with open(tmp_path / ann_index.ANN_INFO_FILE, encoding="utf-8") as fh:
+        assert json.load(fh)["params"]["nlist"] == 8
+    assert faiss.extract_index_ivf(faiss.read_index(str(tmp_path / ann_index.ANN_INDEX_FILE))).nlist == 8
@@ -0,0 +1,113 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from utils.answer_cache import AnswerCache
+
+DOCS = [SimpleNamespace(page_content="Bail may be granted.", metadata={"chunk_id": "a"})]
+ENTRY = {"response_mode": "concise", "model": "m", "retrieval_mode": "dense"}
+
+
+def _cache(tmp_path, **kwargs):
+    kwargs.setdefault("semantic_threshold", 0.9)
+    return AnswerCache(str(tmp_path / "answers.sqlite"), **kwargs)
+
+
+def test_versions_do_not_see_or_delete_each_other(tmp_path):
+    old, new = _cache(tmp_path), _cache(tmp_path)
+    old.store("what is bail", index_version="v1", answer="old answer", source_documents=DOCS, **ENTRY)
+    new.store("what is bail", index_version="v2", answer="new answer", source_documents=DOCS, **ENTRY)
+
+    # A process still on v1 keeps its answer after a v2 process wrote to the same file
+    assert old.lookup("what is bail", index_version="v1", **ENTRY)["result"] == "old answer"
+    assert new.lookup("what is bail", index_version="v2", **ENTRY)["result"] == "new answer"
+    assert new.lookup("what is bail", index_version="v3", **ENTRY) is None
+
+
+def test_old_versions_are_collected_after_grace(tmp_path):
+    cache = _cache(tmp_path, version_grace=60)
+    cache.store("what is bail", index_version="v1", answer="old", source_documents=DOCS, **ENTRY)
+    assert cache.collect_old_versions("v2") == 0
+    assert cache.collect_old_versions("v2", now=time.time() + 120) == 1
+    assert cache.lookup("what is bail", index_version="v1", **ENTRY) is None
+
+
+def test_semantic_hit_and_append(tmp_path):
+    cache = _cache(tmp_path)
+    cache.store("what is bail", index_version="v1", answer="bail", source_documents=DOCS,
+                embedding=[1.0, 0.0, 0.0], **ENTRY)
+    hit = cache.lookup("explain bail", index_version="v1", embedding=[0.99, 0.05, 0.0], **ENTRY)
+    assert hit["cache"] == "semantic" and hit["result"] == "bail"
+
+    keys, matrix, *_ = next(iter(cache._semantic.values()))
+    cache.store("what is a tax", index_version="v1", answer="tax", source_documents=DOCS,
+                embedding=[0.0, 1.0, 0.0], **ENTRY)
+    keys_after, matrix_after, *_ = next(iter(cache._semantic.values()))
+    assert len(keys_after) == 2 and matrix_after.shape == (2, 3)
+    assert np.allclose(matrix_after[0], matrix[0])
+    hit = cache.lookup("explain tax", index_version="v1", embedding=[0.0, 1.0, 0.01], **ENTRY)
+    assert hit["result"] == "tax"
+
+
+def test_expired_answers_leave_the_semantic_matrix(tmp_path):
+    cache = _cache(tmp_path, ttl=0.2)
+    cache.store("what is bail", index_version="v1", answer="bail", source_documents=DOCS,
+                embedding=[1.0, 0.0, 0.0], **ENTRY)
+    assert cache.lookup("explain bail", index_version="v1", embedding=[1.0, 0.0, 0.0], **ENTRY) is not None
+    time.sleep(0.3)
+    # Masked at lookup before any delete ran ...
+    assert cache.lookup("explain bail", index_version="v1", embedding=[1.0, 0.0, 0.0], **ENTRY) is None
+    # ... and dropped from the matrix when store() deletes the expired row
+    cache.store("what is a tax", index_version="v1", answer="tax", source_documents=DOCS,
+                embedding=[0.0, 1.0, 0.0], **ENTRY)
+    keys, matrix, *_ = next(iter(cache._semantic.values()))
+    assert len(keys) == 1 and matrix.shape == (1, 3)
+
+
+def test_semantic_tier_requires_the_same_citations(tmp_path):
+    cache = _cache(tmp_path)
+    cache.store("punishment under Section 302 IPC", index_version="v1", answer="death or life imprisonment",
+                source_documents=DOCS, embedding=[1.0, 0.0, 0.0], **ENTRY)
+    # Near-identical embeddings, but another provision
+    assert cache.lookup("punishment under Section 304 IPC", index_version="v1",
+                        embedding=[1.0, 0.0, 0.0], **ENTRY) is None
+    hit = cache.lookup("what is the punishment under section 302 IPC?", index_version="v1",
+                       embedding=[0.99, 0.05, 0.0], **ENTRY)
+    assert hit["cache"] == "semantic"
+
+
+class _WebTask:
+    def __init__(self, results):
+        self._results = results
+
+    def elapsed(self):
+        return 0.0
+
+    def results(self, wait=None):
+        return self._results
+
+
+@pytest.mark.parametrize("snippets, stored", [([{"title": "t", "snippet": "s", "url": "u"}], 0), ([], 1)])
+def test_web_questions_skip_the_cache_and_only_plain_answers_are_stored(monkeypatch, tmp_path, snippets, stored):
+    import models.llm as llm
+
+    cache = _cache(tmp_path, semantic_threshold=0)
+    cache.store("what is bail", index_version="v1", answer="cached", source_documents=DOCS, response_mode="detailed",
+                model=llm.GROQ_MODEL, retrieval_mode=llm.RETRIEVAL_MODE + ("+rerank" if llm.RERANK_ENABLED else ""))
+    engine = SimpleNamespace(version="v1", ensure_loaded=lambda: None)
+    monkeypatch.setattr(llm, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm, "WEB_RESULTS_IN_PROMPT", True)
+    monkeypatch.setattr(llm, "_check_llm_ready", lambda: None)
+    monkeypatch.setattr(llm, "get_retrieval_engine", lambda: engine)
+    monkeypatch.setattr(llm, "get_answer_cache", lambda: cache)
+    monkeypatch.setattr(llm, "_retrieve_documents", lambda *a, **k: DOCS)
+    monkeypatch.setattr(llm, "_start_web_search", lambda query, use_web: _WebTask(snippets))
+    monkeypatch.setattr(llm, "get_groq_client", lambda: None)
+    monkeypatch.setattr(llm, "request_completion", lambda client, prompt: "fresh")
+
+    assert llm.get_legal_response("what is bail", use_web=True)["result"] == "fresh"
+    assert llm.get_legal_response("what is habeas corpus", use_web=True)["context_stats"]["web_results"] == len(snippets)
+    answers = cache._db.execute("SELECT COUNT(*) FROM answers WHERE answer = 'fresh'").fetchone()[0]
+    assert answers == 2 * stored
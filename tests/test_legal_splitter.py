@@ -0,0 +1,70 @@
+import json
+import re
+
+import pytest
+
+import utils.vector_store as vector_store
+from utils.legal_splitter import LegalTextSplitter, read_source_span, split_file
+
+JUDGMENT = (
+    "J U D G M E N T\n"
+    "1. The appellant was convicted under Section 302 of the Indian Penal Code and sentenced to life "
+    "imprisonment. The High Court confirmed the conviction. "
+    "2. The appellant paid Rs. 5. The amount was deposited in the trial court on the same day. "
+    "Counsel relied on Section 28. The argument was rejected. "
+    "3. " + "The evidence of the eye witnesses is consistent and was rightly believed. " * 12 +
+    "4. In the result the appeal fails and is dismissed. No costs."
+)
+
+
+def _non_space(text):
+    return re.sub(r"\s+", "", text)
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(200, 0), (300, 60), (120, 40)])
+def test_chunks_fit_and_keep_all_text(chunk_size, chunk_overlap):
+    splitter = LegalTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    spans = splitter.split_spans(JUDGMENT)
+    assert all(end - start <= chunk_size for start, end in spans)
+
+    # Every non-space character is in some chunk (overlap may repeat text, never drop it)
+    covered = [False] * len(JUDGMENT)
+    for start, end in spans:
+        covered[start:end] = [True] * (end - start)
+    assert all(covered[i] for i, char in enumerate(JUDGMENT) if not char.isspace())
+    if not chunk_overlap:
+        assert _non_space("".join(splitter.split_text(JUDGMENT))) == _non_space(JUDGMENT)
+
+
+def test_out_of_sequence_numbers_are_not_paragraphs():
+    starts = [JUDGMENT[position:position + 3] for position in LegalTextSplitter.boundaries(JUDGMENT)]
+    assert starts == ["J U", "1. ", "2. ", "3. ", "4. "]
+
+
+def test_split_file_offsets_round_trip_on_non_ascii_text(tmp_path):
+    text = ("1. न्यायालय ने अपील स्वीकार की। The appellant’s plea — “not guilty” — was recorded. " * 6
+            + "2. अपील खारिज की जाती है। Costs of ₹ 10,000 are imposed. " * 6)
+    path = tmp_path / "judgment.txt"
+    path.write_bytes(text.encode("utf-8"))
+    chunks = split_file(str(path), LegalTextSplitter(chunk_size=150, chunk_overlap=30))
+    assert len(chunks) > 2
+    for chunk, byte_start, byte_end in chunks:
+        assert read_source_span("judgment.txt", byte_start, byte_end, text_dir=str(tmp_path)) == chunk
+
+
+def test_manifest_without_chunker_counts_as_recursive(monkeypatch, tmp_path):
+    text_dir, store_dir = tmp_path / "text", tmp_path / "store"
+    text_dir.mkdir()
+    store_dir.mkdir()
+    monkeypatch.setattr(vector_store, "TEXT_DIR", str(text_dir))
+    (store_dir / vector_store.EXACT_INDEX_FILE).write_bytes(b"")
+    settings = vector_store._manifest_settings()
+    old_settings = {key: value for key, value in settings.items() if key != "chunker"}
+    manifest = {"settings": old_settings, "files": {}, "embedding": {"backend": vector_store.embedding_backend_id()}}
+    (store_dir / vector_store.MANIFEST_FILE).write_text(json.dumps(manifest))
+
+    monkeypatch.setattr(vector_store, "CHUNKER", "recursive")
+    assert not vector_store.plan_vector_store_update(store_dir=str(store_dir))["full"]
+    monkeypatch.setattr(vector_store, "CHUNKER", "legal")
+    plan = vector_store.plan_vector_store_update(store_dir=str(store_dir))
+    assert plan["full"] and "chunking" in plan["reason"]
@@ -0,0 +1,56 @@
+import faiss
+import numpy as np
+import pytest
+
+from utils.ann_index import ann_params, build_ann_index, filtered_search_params, set_search_params
+from utils.metadata_index import MetadataIndex, build_metadata_index
+
+N = 2000
+DIM = 16
+SOURCES = [
+    "7737-2020___supremecourt__2020__7737__7737_2020_Judgement_30-Sep-2020.txt",
+    "76128-1990___jonew__judis__13988.txt",
+    "512-2016___supremecourt_vernacular__2016__512__512_2016_Order_02-Mar-2016.txt",
+    "901-2005___supremecourt__2005__901__901_2005_Judgement_11-Jan-2005.txt",
+]
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    store_dir = str(tmp_path_factory.mktemp("store"))
+    build_metadata_index([SOURCES[i % len(SOURCES)] for i in range(N)], store_dir)
+    vectors = np.random.default_rng(7).standard_normal((N, DIM)).astype(np.float32)
+    exact = faiss.IndexFlatL2(DIM)
+    exact.add(vectors)
+    return MetadataIndex(store_dir), exact, vectors
+
+
+def test_select_masks_rows_by_metadata(corpus):
+    metadata, _, _ = corpus
+    rows = np.arange(N)
+    assert np.array_equal(metadata.select({"year_from": 2016}), rows % 2 == 0)
+    assert np.array_equal(metadata.select({"collections": ["jonew"]}), rows % 4 == 1)
+    assert np.array_equal(metadata.select({"year_from": 2000, "year_to": 2010, "collections": ["supremecourt"]}),
+                          rows % 4 == 3)
+    assert not metadata.select({"year_to": 1980}).any()
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_filtered_search_returns_only_matching_rows(corpus, index_type):
+    metadata, exact, vectors = corpus
+    index = exact if index_type == "flat" else build_ann_index(exact, ann_params(index_type, N))
+    set_search_params(index, nprobe=1, ef_search=16)
+    mask = metadata.select({"collections": ["jonew"]})  # a quarter of the rows
+    k = 10
+
+    params, keepalive = filtered_search_params(index, mask)
+    _, positions = index.search(vectors[:5], k, params=params)
+    del keepalive
+
+    assert (positions >= 0).all(), "selective filters must still return k rows"
+    assert mask[positions].all()
+    if index_type == "flat":
+        # Exact search over the matching rows only
+        rows = np.flatnonzero(mask)
+        distances = ((vectors[rows][None, :, :] - vectors[:5, None, :]) ** 2).sum(-1)
+        assert np.array_equal(positions, rows[np.argsort(distances, axis=1)[:, :k]])
@@ -0,0 +1,75 @@
+import time
+from types import SimpleNamespace
+
+from models.reranker import Reranker
+
+
+def _docs(n):
+    return [SimpleNamespace(page_content=f"passage {i}", metadata={"chunk_id": f"c{i}"}) for i in range(n)]
+
+
+class _Scorer:
+    """Scores passage i as i (so reranking reverses the order); the first `slow_calls` calls take `slow_seconds`."""
+
+    def __init__(self, per_pair=0.0, slow_calls=0, slow_seconds=0.0):
+        self.per_pair = per_pair
+        self.slow_calls = slow_calls
+        self.slow_seconds = slow_seconds
+        self.calls = 0
+
+    def predict(self, pairs, **kwargs):
+        self.calls += 1
+        time.sleep(self.slow_seconds if self.calls <= self.slow_calls else self.per_pair * len(pairs))
+        return [float(passage.split()[-1]) if passage[-1].isdigit() else 0.0 for _, passage in pairs]
+
+
+def test_rerank_orders_by_score_and_caches_pairs():
+    scorer = _Scorer()
+    reranker = Reranker(scorer, model_id="test", batch_size=4, budget_ms=0)
+    ranked, stats = reranker.rerank("query", _docs(10), top_k=3)
+    assert [d.metadata["chunk_id"] for d in ranked] == ["c9", "c8", "c7"]
+    assert stats["scored"] == 10 and stats["cached"] == 0 and not stats["fallback"]
+
+    ranked_again, stats = reranker.rerank("  QUERY ", _docs(10), top_k=3)
+    assert [d.metadata["chunk_id"] for d in ranked_again] == ["c9", "c8", "c7"]
+    assert stats["scored"] == 0 and stats["cached"] == 10
+
+
+def test_score_cache_is_bounded():
+    reranker = Reranker(_Scorer(), model_id="test", batch_size=4, budget_ms=0, cache_max_entries=5)
+    reranker.rerank("query", _docs(10), top_k=3)
+    _, stats = reranker.rerank("query", _docs(10), top_k=3)
+    assert stats["cached"] == 5
+
+
+def test_budget_falls_back_to_candidate_order():
+    reranker = Reranker(_Scorer(per_pair=0.01), model_id="test", batch_size=4, budget_ms=50)
+    ranked, stats = reranker.rerank("query", _docs(20), top_k=3, fallback_k=5)
+    assert stats["fallback"]
+    assert [d.metadata["chunk_id"] for d in ranked] == ["c0", "c1", "c2", "c3", "c4"]
+    assert 0 < stats["scored"] < 20
+
+
+def test_slow_estimate_skips_scoring_then_recovers():
+    # A cold first call (0.4s for one batch of 4), then 2ms per pair
+    reranker = Reranker(_Scorer(per_pair=0.002, slow_calls=1, slow_seconds=0.4), model_id="test",
+                        batch_size=4, budget_ms=100, estimate_half_life=0.05)
+    _, first = reranker.rerank("query 0", _docs(16), top_k=3)
+    assert first["fallback"] and first["scored"] == 4
+
+    # The estimate says 16 pairs take ~1.6s: no batch starts, so the budget holds
+    _, stats = reranker.rerank("query 1", _docs(16), top_k=3)
+    assert stats["fallback"] and stats["scored"] == 0
+
+    # Five half-lives later the decayed estimate fits again and scoring re-measures it
+    time.sleep(0.25)
+    results = [reranker.rerank(f"query {i}", _docs(16), top_k=3)[1] for i in range(2, 7)]
+    assert all(not stats["fallback"] and stats["scored"] == 16 for stats in results)
+
+
+def test_warm_up_is_not_timed():
+    reranker = Reranker(_Scorer(per_pair=0.002, slow_calls=1, slow_seconds=0.4), model_id="test",
+                        batch_size=4, budget_ms=100)
+    reranker.warm_up()
+    _, stats = reranker.rerank("query", _docs(16), top_k=3)
+    assert not stats["fallback"] and stats["scored"] == 16
@@ -0,0 +1,38 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import models.llm as llm
+
+
+def test_abandoned_searches_do_not_delay_new_questions(monkeypatch):
+    release = threading.Event()
+    searched = []
+
+    def search(query, **kwargs):
+        searched.append(query)
+        if query == "slow":
+            release.wait(5)
+        return [query]
+
+    engine = SimpleNamespace(ensure_loaded=lambda: None, search=search)
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(llm, "get_retrieval_engine", lambda: engine)
+    monkeypatch.setattr(llm, "RERANK_ENABLED", False)
+    monkeypatch.setattr(llm, "RETRIEVAL_TIMEOUT_SECONDS", 0.1)
+    monkeypatch.setattr(llm, "_retrieval_pool", pool)
+    monkeypatch.setattr(llm, "_retrieval_slots", threading.BoundedSemaphore(2))
+    try:
+        # Two searches overrun the timeout and keep both workers busy
+        assert llm._retrieve_documents("slow") == []
+        assert llm._retrieve_documents("slow") == []
+        assert llm._retrieve_documents("fast") == []
+    finally:
+        release.set()
+    pool.shutdown(wait=True)
+    # Rejected at once rather than queued behind the abandoned searches
+    assert searched == ["slow", "slow"]
+
+    # The slots came back when the abandoned searches ended
+    monkeypatch.setattr(llm, "_retrieval_pool", ThreadPoolExecutor(max_workers=2))
+    assert llm._retrieve_documents("fast") == ["fast"]
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+import utils.web_search as web_search
+from utils.fake_search_server import start_fake_search_server
+from utils.web_search import WebSearchCache, search_web
+
+
+@pytest.fixture
+def fake_search(monkeypatch):
+    """Start the fake search server and point the http backend at it; yields a server factory."""
+    servers = []
+
+    def start(**kwargs):
+        server = start_fake_search_server(**kwargs)
+        servers.append(server)
+        monkeypatch.setattr(web_search, "WEB_SEARCH_URL", f"http://127.0.0.1:{server.server_port}/search")
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def _use_cache(monkeypatch, **kwargs) -> WebSearchCache:
+    cache = WebSearchCache(**kwargs)
+    monkeypatch.setattr(web_search, "_cache", cache)
+    return cache
+
+
+def _served(server) -> int:
+    return server.RequestHandlerClass.served
+
+
+def test_results_are_cached_until_ttl(monkeypatch, fake_search):
+    server = fake_search()
+    _use_cache(monkeypatch, ttl=0.3)
+    first = search_web("Anticipatory bail", max_results=2, backend="http")
+    assert [r["title"] for r in first] == ["Result 1 for Anticipatory bail", "Result 2 for Anticipatory bail"]
+    assert search_web("  anticipatory BAIL ", max_results=2, backend="http") == first
+    assert _served(server) == 1
+
+    time.sleep(0.4)
+    search_web("anticipatory bail", max_results=2, backend="http")
+    assert _served(server) == 2
+
+
+def test_least_recently_used_entries_are_evicted(monkeypatch, fake_search):
+    server = fake_search()
+    _use_cache(monkeypatch, max_entries=2)
+    for query in ("bail", "tax", "bail", "habeas corpus"):
+        search_web(query, backend="http")
+    assert _served(server) == 3  # "tax" was least recently used when "habeas corpus" came in
+
+    search_web("bail", backend="http")
+    assert _served(server) == 3
+    search_web("tax", backend="http")
+    assert _served(server) == 4
+
+
+def test_failures_are_cached_for_the_negative_ttl(monkeypatch, fake_search):
+    server = fake_search(fail_every=1)
+    cache = _use_cache(monkeypatch, negative_ttl=0.3)
+    results, status = cache.get_or_fetch(("http", "bail", 3), lambda: web_search._http_backend("bail", 3))
+    assert status == "error" and "error" in results[0]
+    assert search_web("bail", backend="http")[0].get("error")
+    assert _served(server) == 1
+
+    time.sleep(0.4)
+    search_web("bail", backend="http")
+    assert _served(server) == 2
+
+
+def test_concurrent_identical_queries_share_one_request(monkeypatch, fake_search):
+    server = fake_search(latency=0.2)
+    _use_cache(monkeypatch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(search_web("bail", backend="http")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert _served(server) == 1
+    assert len(results) == 8 and all(r == results[0] and "error" not in r[0] for r in results)
+
+
+def test_follower_gives_up_after_the_timeout(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def hung_backend(query, max_results):
+        calls.append(query)
+        release.wait(5)
+        return [{"title": "late", "snippet": "", "url": ""}]
+
+    monkeypatch.setitem(web_search.SEARCH_BACKENDS, "hung", hung_backend)
+    cache = _use_cache(monkeypatch, timeout=0.1)
+    leader = threading.Thread(target=search_web, args=("bail",), kwargs={"backend": "hung"})
+    leader.start()
+    while not calls:
+        time.sleep(0.01)
+
+    results, status = cache.get_or_fetch(("hung", "bail", 3), lambda: [])
+    assert status == "error" and "timed out" in results[0]["error"]
+    assert calls == ["bail"]  # the follower did not start a second search
+
+    release.set()
+    leader.join()
+    assert search_web("bail", backend="hung")[0]["title"] == "late"
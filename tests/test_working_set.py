@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+import models.llm as llm
+from models.hash_embeddings import HashEmbeddings
+from utils.working_set import RetrievalWorkingSet
+
+embeddings = HashEmbeddings(64)
+
+
+def _doc(chunk_id, text):
+    return SimpleNamespace(page_content=text, metadata={"chunk_id": chunk_id})
+
+
+BAIL = _doc("bail", "anticipatory bail granted to the appellant accused")
+TAX = _doc("tax", "income tax assessment of the company")
+
+
+def _working_set(**kwargs):
+    working_set = RetrievalWorkingSet(**dict(dict(max_chunks=10, min_score=0.3), **kwargs))
+    working_set.add([BAIL, TAX], embeddings.embed_documents, index_version="v1")
+    return working_set
+
+
+def test_lookup_returns_matching_chunks_above_threshold():
+    working_set = _working_set()
+    docs = working_set.lookup(embeddings.embed_query("was anticipatory bail granted"), k=5, index_version="v1")
+    assert [d.metadata["chunk_id"] for d in docs] == ["bail"]
+    assert working_set.lookup(embeddings.embed_query("dying declaration"), k=5, index_version="v1") is None
+
+
+def test_lookup_respects_filters():
+    working_set = _working_set()
+    vector = embeddings.embed_query("anticipatory bail granted")
+    assert working_set.lookup(vector, k=5, filters={"year_from": 2000}, index_version="v1") is None
+    working_set.add([BAIL], embeddings.embed_documents, filters={"year_from": 2000}, index_version="v1")
+    assert working_set.lookup(vector, k=5, filters={"year_from": 2000}, index_version="v1") == [BAIL]
+
+
+def test_index_version_change_empties_the_set():
+    working_set = _working_set()
+    assert working_set.lookup(embeddings.embed_query("anticipatory bail"), k=5, index_version="v2") is None
+    assert len(working_set) == 0
+
+
+def test_size_is_bounded_least_recently_used_first():
+    working_set = _working_set(max_chunks=2)
+    working_set.lookup(embeddings.embed_query("anticipatory bail granted"), k=5, index_version="v1")
+    working_set.add([_doc("new", "dying declaration recorded")], embeddings.embed_documents, index_version="v1")
+    assert len(working_set) == 2
+    assert working_set.lookup(embeddings.embed_query("income tax assessment"), k=5, index_version="v1") is None
+
+
+def test_clear_and_disabled_reuse():
+    working_set = _working_set()
+    working_set.clear()
+    assert len(working_set) == 0
+    assert _working_set(min_score=0).lookup(embeddings.embed_query("anticipatory bail"), k=5, index_version="v1") is None
+
+
+class _AnswerCache:
+    semantic_threshold = 0.9
+
+    def __init__(self):
+        self.lookups = self.stores = 0
+
+    def lookup(self, **entry):
+        self.lookups += 1
+        return {"result": "another session's answer", "source_documents": [], "cache": "exact"}
+
+    def store(self, **entry):
+        self.stores += 1
+
+
+def test_follow_up_answered_from_working_set_skips_answer_cache(monkeypatch):
+    cache = _AnswerCache()
+    engine = SimpleNamespace(version="v1", ensure_loaded=lambda: None,
+                             search=lambda *a, **k: [TAX])
+    monkeypatch.setattr(llm, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm, "_check_llm_ready", lambda: None)
+    monkeypatch.setattr(llm, "get_retrieval_engine", lambda: engine)
+    monkeypatch.setattr(llm, "get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(llm, "get_answer_cache", lambda: cache)
+    monkeypatch.setattr(llm, "get_groq_client", lambda: None)
+    monkeypatch.setattr(llm, "request_completion", lambda client, prompt: "answer from this conversation")
+
+    result = llm.get_legal_response("was anticipatory bail granted to the accused in that case", working_set=_working_set())
+    assert result["working_set"] and result["result"] == "answer from this conversation"
+    assert result["source_documents"] == [BAIL]
+    assert cache.lookups == 0 and cache.stores == 0
+
+    # No match in the working set: the shared cache is consulted as before
+    result = llm.get_legal_response("dying declaration", working_set=_working_set())
+    assert result["cache"] == "exact" and cache.lookups == 1
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from utils.ann_index import (
+    INDEX_TYPES, STORAGE_TYPES, RescoringIndex, ann_params, build_ann_index, build_compact_index, set_search_params,
+    faiss,
+)
+from utils.vector_store import load_vector_store
+
+
+def _percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000.0) if samples else float("nan")
+
+
+def _sample_queries(exact_index, n_queries: int, noise: float, seed: int = 7) -> np.ndarray:
+    """Perturbed copies of random stored vectors, re-normalised like real query embeddings."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(exact_index.ntotal, size=min(n_queries, exact_index.ntotal), replace=False)
+    queries = np.vstack([exact_index.reconstruct(int(i)) for i in rows]).astype(np.float32)
+    queries += rng.normal(scale=noise, size=queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+    return queries
+
+
+def _embed_queries(path: str) -> np.ndarray:
+    from models.embeddings import get_embeddings
+
+    with open(path, "r", encoding="utf-8") as fh:
+        texts = [line.strip() for line in fh if line.strip()]
+    return np.asarray(get_embeddings().embed_documents(texts), dtype=np.float32)
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, k: int, memory_index=None) -> dict:
+    """
+    recall@k against the exact neighbours, the share of queries whose top k come back in
+    exactly the same order, single-query latency percentiles and the index size.
+    """
+    latencies = []
+    hits = 0
+    same_order = 0
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - started)
+        hits += len(set(ids[0].tolist()) & set(truth[i].tolist()))
+        same_order += ids[0].tolist() == truth[i].tolist()
+    return {
+        "recall_at_k": hits / float(len(queries) * k),
+        "same_order": same_order / float(len(queries)),
+        "p50_ms": _percentile_ms(latencies, 50),
+        "p99_ms": _percentile_ms(latencies, 99),
+        "memory_mb": len(faiss.serialize_index(memory_index or index)) / (1024 * 1024),
+    }
+
+
+def measure_storage(exact, storage: str, factors, queries: np.ndarray, truth: np.ndarray, k: int) -> list:
+    """Compact (float16 / int8) codes alone and with float32 re-scoring of factor * k candidates."""
+    started = time.perf_counter()
+    compact = build_compact_index(exact, storage)
+    build_s = time.perf_counter() - started
+    vectors = faiss.rev_swig_ptr(exact.get_xb(), exact.ntotal * exact.d).reshape(exact.ntotal, exact.d)
+    rows = [dict(type=storage, knob="rescore", value=0, build_s=build_s, **measure(compact, queries, truth, k))]
+    for factor in factors:
+        index = RescoringIndex(compact, vectors, factor)
+        rows.append(dict(type=storage, knob="rescore", value=factor, build_s=build_s,
+                         **measure(index, queries, truth, k, memory_index=compact)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure recall@k, p50/p99 latency and memory of FAISS index types and compact vector "
+                    "storage against the exact index."
+    )
+    parser.add_argument("--types", default=",".join(INDEX_TYPES), help="Comma-separated index types to try.")
+    parser.add_argument("--nprobe", default="1,4,16,64", help="IVF nprobe values to sweep.")
+    parser.add_argument("--ef-search", default="16,32,64,128", help="HNSW efSearch values to sweep.")
+    parser.add_argument("--storage", default="float16,int8",
+                        help=f"Comma-separated compact vector storages to compare ({', '.join(STORAGE_TYPES[1:])}; '' to skip).")
+    parser.add_argument("--rescore", default="1,2,4,8", help="RESCORE_FACTOR values to sweep for compact storage.")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500, help="Number of sampled queries.")
+    parser.add_argument("--query-file", help="Optional text file with one real question per line (embedded with the app model).")
+    parser.add_argument("--noise", type=float, default=0.05, help="Gaussian noise added to sampled query vectors.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    if not faiss.available():
+        sys.exit("faiss is not installed.")
+
+    exact = load_vector_store(exact=True).index
+    print(f"Exact index: {exact.ntotal} vectors, dim {exact.d}")
+    queries = _embed_queries(args.query_file) if args.query_file else _sample_queries(exact, args.queries, args.noise)
+    _, truth = exact.search(queries, args.k)
+
+    results = []
+    for index_type in [t.strip() for t in args.types.split(",") if t.strip()]:
+        params = ann_params(index_type, exact.ntotal)
+        started = time.perf_counter()
+        index = exact if index_type == "flat" else build_ann_index(exact, params)
+        build_s = time.perf_counter() - started
+
+        if index_type in ("ivf_flat", "ivf_pq"):
+            sweep = [("nprobe", int(v)) for v in args.nprobe.split(",")]
+        elif index_type == "hnsw":
+            sweep = [("efSearch", int(v)) for v in args.ef_search.split(",")]
+        else:
+            sweep = [(None, None)]
+
+        for knob, value in sweep:
+            if knob == "nprobe":
+                set_search_params(index, nprobe=value)
+            elif knob == "efSearch":
+                set_search_params(index, ef_search=value)
+            row = dict(params, knob=knob, value=value, build_s=build_s, **measure(index, queries, truth, args.k))
+            results.append(row)
+            label = f"{knob}={value}" if knob else "-"
+            print(
+                f"{index_type:<9} {label:<13} recall@{args.k}={row['recall_at_k']:.3f}  "
+                f"p50={row['p50_ms']:.3f}ms  p99={row['p99_ms']:.3f}ms  "
+                f"mem={row['memory_mb']:.1f}MB  build={build_s:.1f}s"
+            )
+
+    exact_mb = len(faiss.serialize_index(exact)) / (1024 * 1024)
+    for storage in [t.strip() for t in args.storage.split(",") if t.strip()]:
+        for row in measure_storage(exact, storage, [int(v) for v in args.rescore.split(",")], queries, truth, args.k):
+            results.append(row)
+            label = f"rescore={row['value']}x" if row["value"] else "no rescore"
+            print(
+                f"{storage:<9} {label:<13} recall@{args.k}={row['recall_at_k']:.3f}  "
+                f"same order={row['same_order']:.3f}  p50={row['p50_ms']:.3f}ms  p99={row['p99_ms']:.3f}ms  "
+                f"mem={row['memory_mb']:.1f}MB ({1 - row['memory_mb'] / exact_mb:.0%} saved vs float32)"
+            )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"ntotal": exact.ntotal, "k": args.k, "queries": len(queries), "results": results}, fh, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+import json
+import math
+import mmap
+import os
+import sys
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import (
+    FAISS_INDEX_TYPE, IVF_NLIST, PQ_M, PQ_NBITS, HNSW_M, HNSW_EF_CONSTRUCTION,
+    FAISS_NPROBE, FAISS_EF_SEARCH, INDEX_TRAIN_SIZE, VECTOR_STORAGE, RESCORE_FACTOR,
+)
+from utils.lazy_import import LazyImport
+
+faiss = LazyImport("faiss", error="faiss is not installed. Install 'faiss-cpu' to use approximate index types.")
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Approximate index written next to the exact index.faiss, plus a description of how it was built
+ANN_INDEX_FILE = "index.ann.faiss"
+ANN_INFO_FILE = "ann_index.json"
+
+# Vectors are copied from the exact index in blocks of this many rows
+_COPY_BLOCK = 65536
+
+
+def _require_faiss():
+    faiss.resolve()
+
+
+def auto_nlist(n_vectors: int) -> int:
+    """Rule of thumb: ~4*sqrt(n) inverted lists, and at least ~39 training points per list."""
+    return max(1, min(int(4 * math.sqrt(max(n_vectors, 1))), n_vectors // 39 or 1))
+
+
+def ann_params(index_type: str, n_vectors: int) -> Dict[str, Any]:
+    """Resolve the build parameters of index_type for a corpus of n_vectors."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS_INDEX_TYPE {index_type!r}; expected one of {', '.join(INDEX_TYPES)}")
+    params: Dict[str, Any] = {"type": index_type}
+    if index_type in ("ivf_flat", "ivf_pq"):
+        params["nlist"] = IVF_NLIST or auto_nlist(n_vectors)
+    if index_type == "ivf_pq":
+        params["pq_m"] = PQ_M
+        params["pq_nbits"] = PQ_NBITS
+    if index_type == "hnsw":
+        params["hnsw_m"] = HNSW_M
+        params["ef_construction"] = HNSW_EF_CONSTRUCTION
+    return params
+
+
+def _factory_string(params: Dict[str, Any]) -> str:
+    index_type = params["type"]
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{params['nlist']},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{params['nlist']},PQ{params['pq_m']}x{params['pq_nbits']}"
+    return f"HNSW{params['hnsw_m']},Flat"
+
+
+def _training_sample(exact_index, n_train: int) -> np.ndarray:
+    n = exact_index.ntotal
+    if n <= n_train:
+        return exact_index.reconstruct_n(0, n)
+    rows = np.sort(np.random.default_rng(1234).choice(n, size=n_train, replace=False))
+    return np.vstack([exact_index.reconstruct(int(i)) for i in rows]).astype(np.float32)
+
+
+def build_ann_index(exact_index, params: Dict[str, Any], trained=None):
+    """
+    Build an approximate index holding the same vectors, in the same row order, as
+    `exact_index` (a flat index). IVF/PQ coarse quantizers are trained on up to
+    INDEX_TRAIN_SIZE sampled vectors; pass a previously trained index of the same
+    parameters as `trained` to reuse its centroids instead of retraining.
+    """
+    _require_faiss()
+    if trained is not None:
+        index = trained
+        index.reset()
+    else:
+        index = faiss.index_factory(exact_index.d, _factory_string(params), faiss.METRIC_L2)
+        if params["type"] == "hnsw":
+            index.hnsw.efConstruction = params["ef_construction"]
+        if not index.is_trained:
+            started = time.perf_counter()
+            sample = _training_sample(exact_index, INDEX_TRAIN_SIZE)
+            index.train(sample)
+            print(f"Trained {_factory_string(params)} on {len(sample)} vectors in {time.perf_counter() - started:.1f}s")
+
+    for start in range(0, exact_index.ntotal, _COPY_BLOCK):
+        index.add(exact_index.reconstruct_n(start, min(_COPY_BLOCK, exact_index.ntotal - start)))
+    return index
+
+
+def set_search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+    """Apply query-time knobs (IVF nprobe, HNSW efSearch); ignored by index types without them."""
+    if index is None or not faiss.available() or isinstance(index, RescoringIndex):
+        return
+    space = faiss.ParameterSpace()
+    if nprobe is not None:
+        try:
+            space.set_index_parameter(index, "nprobe", int(nprobe))
+        except RuntimeError:
+            pass
+    if ef_search is not None:
+        try:
+            space.set_index_parameter(index, "efSearch", int(ef_search))
+        except RuntimeError:
+            pass
+
+
+def filtered_search_params(index, mask: np.ndarray):
+    """
+    Return (params, keepalive) restricting index.search() to rows where mask is True,
+    so filters apply during the search instead of by over-fetching. The current nprobe /
+    efSearch are carried over and widened in proportion to how selective the filter is,
+    so an IVF or HNSW search still reaches k matching rows. keepalive holds the bitmap
+    the selector points into and must stay referenced until the search returns.
+    """
+    _require_faiss()
+    # A RescoringIndex passes the params on to its compact (flat-code) index
+    index = getattr(index, "compact_index", index)
+    bits = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bits))
+    selectivity = max(float(mask.mean()) if len(mask) else 1.0, 1e-6)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        nprobe = min(ivf.nlist, int(math.ceil(ivf.nprobe / selectivity)))
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    elif getattr(index, "hnsw", None) is not None:
+        ef_search = min(4096, int(math.ceil(index.hnsw.efSearch / selectivity)))
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return params, (bits, selector)
+
+
+def apply_default_search_params(index) -> None:
+    set_search_params(index, nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH)
+
+
+def read_ann_info(store_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(store_dir, ANN_INFO_FILE), "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def save_ann_index(exact_index, store_dir: str, index_type: str = FAISS_INDEX_TYPE) -> Optional[Dict[str, Any]]:
+    """
+    Write the approximate index for store_dir (or remove it when index_type is "flat").
+    Centroids of the previous build are reused while the parameters are unchanged and
+    the corpus has not grown or shrunk by more than 2x since they were trained.
+    """
+    ann_path = os.path.join(store_dir, ANN_INDEX_FILE)
+    info_path = os.path.join(store_dir, ANN_INFO_FILE)
+    if index_type == "flat":
+        for path in (ann_path, info_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+
+    _require_faiss()
+    params = ann_params(index_type, exact_index.ntotal)
+    previous = read_ann_info(store_dir)
+    trained = None
+    trained_on = exact_index.ntotal
+    if (
+        previous and previous.get("params") == params and index_type != "hnsw"
+        and os.path.exists(ann_path)
+        and 0.5 <= exact_index.ntotal / max(previous.get("trained_on", 1), 1) <= 2.0
+    ):
+        trained = faiss.read_index(ann_path)
+        trained_on = previous["trained_on"]
+
+    started = time.perf_counter()
+    index = build_ann_index(exact_index, params, trained=trained)
+    faiss.write_index(index, ann_path + ".tmp")
+    os.replace(ann_path + ".tmp", ann_path)
+    info = {"params": params, "ntotal": index.ntotal, "trained_on": trained_on}
+    with open(info_path + ".tmp", "w", encoding="utf-8") as fh:
+        json.dump(info, fh)
+    os.replace(info_path + ".tmp", info_path)
+    print(f"Saved {index_type} index ({index.ntotal} vectors) in {time.perf_counter() - started:.1f}s")
+    return info
+
+
+def load_ann_index(store_dir: str, index_type: str = FAISS_INDEX_TYPE):
+    """Return the approximate index of store_dir if it matches index_type, else None."""
+    if index_type == "flat":
+        return None
+    info = read_ann_info(store_dir)
+    ann_path = os.path.join(store_dir, ANN_INDEX_FILE)
+    if not info or info.get("params", {}).get("type") != index_type or not os.path.exists(ann_path):
+        print(f"No {index_type} index in {store_dir}; using the exact index. Rebuild the vector store to create it.")
+        return None
+    _require_faiss()
+    index = faiss.read_index(ann_path)
+    apply_default_search_params(index)
+    return index
+
+
+# Compact vector storage (VECTOR_STORAGE): searched in place of the exact index when FAISS_INDEX_TYPE is "flat"
+STORAGE_TYPES = ("float32", "float16", "int8")
+# Scalar-quantized copy of the exact index, plus a description of how it was built
+COMPACT_INDEX_FILE = "index.compact.faiss"
+COMPACT_INFO_FILE = "compact_index.json"
+# Header tag of a serialized IndexFlatL2 / IndexFlatIP, whose float32 rows end the file
+_FLAT_FOURCCS = (b"IxF2", b"IxFI")
+
+
+def _quantizer_type(storage: str):
+    return {"float16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}[storage]
+
+
+def build_compact_index(exact_index, storage: str):
+    """
+    IndexScalarQuantizer holding the rows of `exact_index` in the same order, as float16
+    (2 bytes per dimension) or int8 (1 byte; per-dimension ranges trained on up to
+    INDEX_TRAIN_SIZE sampled vectors).
+    """
+    _require_faiss()
+    index = faiss.IndexScalarQuantizer(exact_index.d, _quantizer_type(storage), faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(_training_sample(exact_index, INDEX_TRAIN_SIZE))
+    for start in range(0, exact_index.ntotal, _COPY_BLOCK):
+        index.add(exact_index.reconstruct_n(start, min(_COPY_BLOCK, exact_index.ntotal - start)))
+    return index
+
+
+def read_compact_info(store_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(store_dir, COMPACT_INFO_FILE), "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def save_compact_index(exact_index, store_dir: str, storage: str = VECTOR_STORAGE) -> Optional[Dict[str, Any]]:
+    """Write the compact index for store_dir (or remove it when storage is "float32")."""
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown VECTOR_STORAGE {storage!r}; expected one of {', '.join(STORAGE_TYPES)}")
+    index_path = os.path.join(store_dir, COMPACT_INDEX_FILE)
+    info_path = os.path.join(store_dir, COMPACT_INFO_FILE)
+    if storage == "float32":
+        for path in (index_path, info_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+
+    started = time.perf_counter()
+    index = build_compact_index(exact_index, storage)
+    faiss.write_index(index, index_path + ".tmp")
+    os.replace(index_path + ".tmp", index_path)
+    info = {"storage": storage, "ntotal": index.ntotal, "bytes": os.path.getsize(index_path)}
+    with open(info_path + ".tmp", "w", encoding="utf-8") as fh:
+        json.dump(info, fh)
+    os.replace(info_path + ".tmp", info_path)
+    print(f"Saved {storage} vectors ({index.ntotal} vectors, {info['bytes'] / (1024 * 1024):.1f} MB) "
+          f"in {time.perf_counter() - started:.1f}s")
+    return info
+
+
+def _read_index_mmap(path: str):
+    """faiss.read_index with the codes memory-mapped in place where this faiss build supports it."""
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if flag is not None:
+        try:
+            return faiss.read_index(path, flag)
+        except RuntimeError:
+            pass
+    return faiss.read_index(path)
+
+
+def mmap_flat_vectors(path: str, ntotal: int, d: int) -> Optional[np.ndarray]:
+    """
+    Read-only (ntotal, d) float32 view of the rows of a serialized flat index, memory-mapped
+    so only the rows that are read get paged in. None if the file is not such an index.
+    """
+    nbytes = ntotal * d * 4
+    offset = os.path.getsize(path) - nbytes
+    if offset < 12:
+        return None
+    with open(path, "rb") as fh:
+        fourcc = fh.read(4)
+        fh.seek(offset - 8)
+        stored = int.from_bytes(fh.read(8), "little")  # length prefix of the codes vector
+    if fourcc not in _FLAT_FOURCCS or stored not in (nbytes, ntotal * d):
+        return None
+    vectors = np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=(ntotal, d))
+    if hasattr(mmap, "MADV_RANDOM"):
+        try:
+            vectors._mmap.madvise(mmap.MADV_RANDOM)  # re-scoring reads scattered rows; skip readahead
+        except (AttributeError, OSError, ValueError):
+            pass
+    return vectors
+
+
+class RescoringIndex:
+    """
+    Stands in for the exact flat index: search() scans the compact (float16 / int8) codes
+    for the best RESCORE_FACTOR * k rows, then re-ranks those with their float32 vectors,
+    so results and distances match exact search unless a true neighbour falls outside
+    the candidates. Both files are memory-mapped, so the pages live in the OS page cache
+    (shared by every worker on the box) instead of each process's heap.
+    """
+
+    def __init__(self, compact_index, vectors: np.ndarray, factor: int = RESCORE_FACTOR):
+        self.compact_index = compact_index
+        self.vectors = vectors
+        self.factor = max(1, factor)
+        self.d = compact_index.d
+        self.ntotal = compact_index.ntotal
+        self.metric_type = compact_index.metric_type
+
+    def search(self, x, k: int, params=None):
+        x = np.ascontiguousarray(x, dtype=np.float32).reshape(-1, self.d)
+        fetch_k = min(self.ntotal, k * self.factor)
+        _, candidates = self.compact_index.search(x, max(fetch_k, 1), params=params)
+        distances = np.full((len(x), k), np.finfo(np.float32).max, dtype=np.float32)
+        labels = np.full((len(x), k), -1, dtype=np.int64)
+        for i, (query, row_ids) in enumerate(zip(x, candidates)):
+            row_ids = np.sort(row_ids[row_ids >= 0])  # ascending rows read the file in order
+            if not len(row_ids):
+                continue
+            diff = np.asarray(self.vectors[row_ids], dtype=np.float32) - query
+            exact = np.einsum("ij,ij->i", diff, diff)
+            best = np.argsort(exact, kind="stable")[:k]
+            distances[i, :len(best)] = exact[best]
+            labels[i, :len(best)] = row_ids[best]
+        return distances, labels
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        return np.array(self.vectors[int(key)], dtype=np.float32)
+
+    def reconstruct_n(self, start: int, n: int) -> np.ndarray:
+        return np.array(self.vectors[start:start + n], dtype=np.float32)
+
+
+def load_compact_index(store_dir: str, exact_path: str, storage: str = VECTOR_STORAGE) -> Optional[RescoringIndex]:
+    """RescoringIndex over store_dir's compact index and exact_path, or None to use the exact index."""
+    if storage == "float32":
+        return None
+    info = read_compact_info(store_dir)
+    index_path = os.path.join(store_dir, COMPACT_INDEX_FILE)
+    if not info or info.get("storage") != storage or not os.path.exists(index_path):
+        print(f"No {storage} vectors in {store_dir}; using the float32 index. Rebuild the vector store to create them.")
+        return None
+    _require_faiss()
+    compact = _read_index_mmap(index_path)
+    vectors = mmap_flat_vectors(exact_path, compact.ntotal, compact.d)
+    if vectors is None:
+        print(f"{exact_path} does not match the {storage} vectors ({compact.ntotal} rows); using the float32 index.")
+        return None
+    return RescoringIndex(compact, vectors)
@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import (
+    ANSWER_CACHE_PATH, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_SEMANTIC_THRESHOLD,
+    ANSWER_CACHE_VERSION_GRACE_SECONDS,
+)
+from utils.lazy_import import LazyImport
+
+Document = LazyImport("langchain_core.documents:Document", "langchain.docstore.document:Document")
+
+_SPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCT_RE = re.compile(r"^[\W_]+|[\W_]+$")
+# Section / article / year / case numbers, with suffixes such as "304a" or "21(1)"
+_CITATION_RE = re.compile(r"\d+[a-z]*(?:\(\w+\))*")
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and edge-punctuation-insensitive form used for exact matching."""
+    return _EDGE_PUNCT_RE.sub("", _SPACE_RE.sub(" ", query.strip().lower()))
+
+
+def citation_tokens(query: str) -> FrozenSet[str]:
+    """
+    Numeric and citation tokens of a query. Questions that differ only in these ("Section
+    302 IPC" vs "Section 304 IPC") embed almost identically but ask about different law.
+    """
+    return frozenset(_CITATION_RE.findall(normalize_query(query)))
+
+
+def _namespace(response_mode: str, model: str, index_version: str, retrieval_mode: str,
+               filters: Optional[Dict[str, Any]] = None) -> str:
+    return f"{response_mode}|{model}|{index_version}|{retrieval_mode}|{json.dumps(filters or {}, sort_keys=True)}"
+
+
+def _serialize_docs(docs: List[Any]) -> str:
+    return json.dumps([
+        {"page_content": getattr(d, "page_content", str(d)), "metadata": getattr(d, "metadata", {})}
+        for d in docs
+    ], ensure_ascii=False)
+
+
+def _deserialize_docs(payload: str) -> List[Any]:
+    items = json.loads(payload or "[]")
+    if not Document.available():
+        return items
+    return [Document(page_content=i["page_content"], metadata=i.get("metadata") or {}) for i in items]
+
+# How often store() looks for answers of old index versions to delete
+_GC_INTERVAL_SECONDS = 300.0
+
+
+class AnswerCache:
+    """
+    Two-tier answer cache persisted in SQLite.
+
+    Tier 1 is an exact match on (normalized query, response mode, model, index version,
+    retrieval mode, search filters). Tier 2 reuses an answer from the same namespace when
+    the cosine similarity of the query embeddings is at least `semantic_threshold` (0
+    disables it) and both queries cite the same numbers (sections, articles, years, case
+    numbers; see citation_tokens); the embeddings of each namespace are kept in an
+    in-memory matrix so the check is a single matrix-vector product. Entries expire after `ttl` seconds and the least recently
+    used entries are evicted beyond `max_entries`. The index version is part of every
+    namespace, so processes on different versions (a rolling rebuild, several workers on
+    one cache file) never see each other's answers; entries of other versions are only
+    deleted once unused for `version_grace` seconds.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, ttl: float = ANSWER_CACHE_TTL_SECONDS,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 semantic_threshold: float = ANSWER_CACHE_SEMANTIC_THRESHOLD,
+                 version_grace: float = ANSWER_CACHE_VERSION_GRACE_SECONDS):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self.version_grace = version_grace
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY, namespace TEXT NOT NULL, index_version TEXT NOT NULL, query TEXT NOT NULL,"
+            " embedding BLOB, answer TEXT NOT NULL, sources TEXT NOT NULL,"
+            " created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers(last_used)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_namespace ON answers(namespace)")
+        self._last_gc = 0.0
+        # namespace -> (keys, unit-norm embedding matrix, created times, citation tokens), loaded
+        # lazily and then kept in step with this process's writes
+        self._semantic: Dict[str, Tuple[List[str], np.ndarray, np.ndarray, List[FrozenSet[str]]]] = {}
+
+    @staticmethod
+    def make_key(query: str, namespace: str) -> str:
+        return hashlib.sha256(f"{namespace}\n{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def _semantic_matrix(self, namespace: str):
+        cached = self._semantic.get(namespace)
+        if cached is None:
+            keys, rows, created, citations = [], [], [], []
+            for key, query, blob, created_at in self._db.execute(
+                "SELECT key, query, embedding, created FROM answers WHERE namespace = ? AND embedding IS NOT NULL",
+                (namespace,),
+            ):
+                keys.append(key)
+                rows.append(np.frombuffer(blob, dtype=np.float32))
+                created.append(created_at)
+                citations.append(citation_tokens(query))
+            matrix = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+            cached = self._semantic[namespace] = (keys, matrix, np.asarray(created, dtype=np.float64), citations)
+        return cached
+
+    def _add_semantic(self, namespace: str, key: str, vector: np.ndarray, created: float,
+                      citations: FrozenSet[str]) -> None:
+        """Append (or replace) one row of a loaded namespace matrix instead of reloading it."""
+        if self._semantic.get(namespace) is None:
+            return  # loaded from SQLite, including this row, on its first semantic lookup
+        self._forget_semantic({key})
+        keys, matrix, created_times, row_citations = self._semantic[namespace]
+        matrix = np.vstack([matrix, vector[None, :]]) if len(keys) else vector[None, :].copy()
+        self._semantic[namespace] = (keys + [key], matrix, np.append(created_times, created),
+                                     row_citations + [citations])
+
+    def _forget_semantic(self, removed) -> None:
+        """Drop deleted keys from the loaded matrices."""
+        removed = set(removed)
+        if not removed:
+            return
+        for namespace, (keys, matrix, created, citations) in list(self._semantic.items()):
+            keep = [i for i, key in enumerate(keys) if key not in removed]
+            if len(keep) != len(keys):
+                self._semantic[namespace] = ([keys[i] for i in keep], matrix[keep], created[keep],
+                                             [citations[i] for i in keep])
+
+    def _delete_where(self, condition: str, params: tuple = ()) -> int:
+        keys = [row[0] for row in self._db.execute(f"SELECT key FROM answers WHERE {condition}", params)]
+        if keys:
+            self._db.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in keys])
+            self._forget_semantic(keys)
+        return len(keys)
+
+    def _fetch(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        row = self._db.execute("SELECT answer, sources, created FROM answers WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if now - row[2] > self.ttl:
+            self._delete_where("key = ?", (key,))
+            return None
+        self._db.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+        return {"result": row[0], "source_documents": _deserialize_docs(row[1])}
+
+    def lookup(self, query: str, response_mode: str, model: str, index_version: str, retrieval_mode: str,
+               embedding: Optional[List[float]] = None,
+               filters: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Return {"result", "source_documents", "cache": "exact" | "semantic"} or None."""
+        namespace = _namespace(response_mode, model, index_version, retrieval_mode, filters)
+        now = time.time()
+        with self._lock:
+            hit = self._fetch(self.make_key(query, namespace), now)
+            if hit is not None:
+                hit["cache"] = "exact"
+                return hit
+
+            if embedding is None or self.semantic_threshold <= 0:
+                return None
+            keys, matrix, created, citations = self._semantic_matrix(namespace)
+            if not keys:
+                return None
+            vector = np.asarray(embedding, dtype=np.float32)
+            vector = vector / (np.linalg.norm(vector) + 1e-12)
+            scores = matrix @ vector
+            # Expired rows (also ones another process has not deleted yet) never match, nor
+            # do questions about another section, article, year or case
+            scores[now - created > self.ttl] = -np.inf
+            wanted = citation_tokens(query)
+            scores[[tokens != wanted for tokens in citations]] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.semantic_threshold:
+                return None
+            hit = self._fetch(keys[best], now)
+            if hit is not None:
+                hit["cache"] = "semantic"
+                hit["similarity"] = float(scores[best])
+            return hit
+
+    def store(self, query: str, response_mode: str, model: str, index_version: str, retrieval_mode: str,
+              answer: str, source_documents: List[Any], embedding: Optional[List[float]] = None,
+              filters: Optional[Dict[str, Any]] = None) -> None:
+        namespace = _namespace(response_mode, model, index_version, retrieval_mode, filters)
+        vector = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            vector = (vector / (np.linalg.norm(vector) + 1e-12)).astype(np.float32)
+        now = time.time()
+        key = self.make_key(query, namespace)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers"
+                " (key, namespace, index_version, query, embedding, answer, sources, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, namespace, index_version, normalize_query(query),
+                 vector.tobytes() if vector is not None else None,
+                 answer, _serialize_docs(source_documents), now, now),
+            )
+            if vector is not None:
+                self._add_semantic(namespace, key, vector, now, citation_tokens(query))
+            else:
+                self._forget_semantic({key})
+            self._delete_where("created < ?", (now - self.ttl,))
+            overflow = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._delete_where("key IN (SELECT key FROM answers ORDER BY last_used LIMIT ?)", (overflow,))
+            if now - self._last_gc > _GC_INTERVAL_SECONDS:
+                self.collect_old_versions(index_version, now)
+
+    def collect_old_versions(self, index_version: str, now: Optional[float] = None) -> int:
+        """Delete answers of other index versions that have not been used for version_grace seconds."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._last_gc = now
+            deleted = self._delete_where("index_version != ? AND last_used < ?",
+                                         (index_version, now - self.version_grace))
+        if deleted:
+            print(f"Answer cache: dropped {deleted} answers from older index versions")
+        return deleted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+            self._semantic.clear()
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Process-wide answer cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache()
+    return _cache
@@ -0,0 +1,241 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, List, Optional
+
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import (
+    TOP_K_RESULTS, BATCH_CONCURRENCY, BATCH_MAX_RETRIES, BATCH_MAX_RPM, BATCH_RETRIEVAL_SIZE,
+)
+from models.llm import build_prompt_with_stats, create_groq_client, fallback_answer, request_completion
+from utils.retrieval_engine import get_retrieval_engine
+
+
+def read_queries(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield query records from a JSONL file. Each line is {"query": ...} with optional
+    "id" (defaults to the line number), "response_mode" and "filters" (metadata search
+    filters, e.g. {"year_from": 2016}); a bare JSON string is also accepted.
+    """
+    with open(path, "r", encoding="utf-8") as fh:
+        for line_no, line in enumerate(fh, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"query": record}
+            if not record.get("query"):
+                print(f"Skipping line {line_no}: no 'query' field")
+                continue
+            record.setdefault("id", str(line_no))
+            record["id"] = str(record["id"])
+            yield record
+
+
+def load_completed_ids(output_path: str) -> set:
+    """Ids already answered successfully in an earlier (possibly crashed) run of the same output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            if record.get("status") == "ok":
+                done.add(str(record.get("id")))
+    return done
+
+
+class RateLimiter:
+    """
+    Shared gate for all worker threads: spaces requests to at most max_rpm per minute
+    (0 = unlimited) and pauses everyone after the API reports a rate limit.
+    """
+
+    def __init__(self, max_rpm: int = 0):
+        self.interval = 60.0 / max_rpm if max_rpm > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot, self._paused_until)
+            self._next_slot = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(exc: Exception) -> bool:
+    code = _status_code(exc)
+    if code is None:
+        return True  # connection errors, timeouts
+    return code == 429 or code >= 500
+
+
+class BatchRunner:
+    """
+    Answers many queries headlessly: retrieval in batches of BATCH_RETRIEVAL_SIZE (one
+    embedding pass per batch), LLM calls on a thread pool limited to `concurrency`,
+    exponential backoff with jitter on retryable errors, and a shared pause honouring
+    Retry-After on HTTP 429. Each result is appended to the output JSONL as soon as it
+    completes; rerunning with the same output file skips ids already answered.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = BATCH_CONCURRENCY,
+        max_retries: int = BATCH_MAX_RETRIES,
+        max_rpm: int = BATCH_MAX_RPM,
+        retrieval_batch_size: int = BATCH_RETRIEVAL_SIZE,
+        top_k: int = TOP_K_RESULTS,
+        response_mode: str = "detailed",
+        retrieval_mode: Optional[str] = None,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.retrieval_batch_size = max(1, retrieval_batch_size)
+        self.top_k = top_k
+        self.response_mode = response_mode
+        self.retrieval_mode = retrieval_mode
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.limiter = RateLimiter(max_rpm)
+        # The SDK's own retries are disabled so backoff and rate limiting are handled here
+        self.client = create_groq_client(max_retries=0)
+        self._write_lock = threading.Lock()
+
+    def _complete_with_retries(self, prompt: str):
+        attempt = 0
+        while True:
+            attempt += 1
+            self.limiter.acquire()
+            try:
+                return request_completion(self.client, prompt), attempt
+            except Exception as exc:
+                if attempt > self.max_retries or not _is_retryable(exc):
+                    exc.attempts = attempt
+                    raise
+                delay = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+                delay = random.uniform(0, delay)
+                if _status_code(exc) == 429:
+                    delay = max(delay, _retry_after(exc) or 0.0)
+                    self.limiter.pause(delay)
+                time.sleep(delay)
+
+    def _answer(self, record: Dict[str, Any], docs: List[Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        response_mode = record.get("response_mode") or self.response_mode
+        prompt, context_stats = build_prompt_with_stats(record["query"], docs, response_mode)
+        result = {
+            "id": record["id"],
+            "query": record["query"],
+            "response_mode": response_mode,
+            "sources": [getattr(d, "metadata", {}).get("source") for d in docs],
+            "context_tokens": context_stats["packed_tokens"],
+            "context_tokens_saved": context_stats["saved_tokens"],
+        }
+        try:
+            answer, attempts = self._complete_with_retries(prompt)
+            result.update(status="ok", answer=answer, attempts=attempts)
+        except Exception as exc:
+            result.update(
+                status="error",
+                answer=fallback_answer(docs, response_mode, None, exc),
+                attempts=getattr(exc, "attempts", 1),
+                error=repr(exc),
+            )
+        result["latency_s"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def _write(self, fh, result: Dict[str, Any]) -> None:
+        with self._write_lock:
+            fh.write(json.dumps(result, ensure_ascii=False) + "\n")
+            fh.flush()
+
+    def run(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """Answer every query of input_path not yet done in output_path; return run counters."""
+        done = load_completed_ids(output_path)
+        pending_records = (r for r in read_queries(input_path) if r["id"] not in done)
+        engine = get_retrieval_engine()
+        stats = {"skipped": len(done), "ok": 0, "error": 0}
+        started = time.perf_counter()
+
+        out_dir = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(out_dir, exist_ok=True)
+        with open(output_path, "a", encoding="utf-8") as fh, ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            in_flight = set()
+
+            def drain(limit: int) -> None:
+                nonlocal in_flight
+                while len(in_flight) > limit:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        result = future.result()
+                        self._write(fh, result)
+                        stats[result["status"]] += 1
+                        total = stats["ok"] + stats["error"]
+                        if total % 10 == 0:
+                            rate = total / max(time.perf_counter() - started, 1e-9)
+                            print(f"[batch] {total} answered ({stats['error']} errors), {rate:.2f} queries/s")
+
+            while True:
+                window = [r for _, r in zip(range(self.retrieval_batch_size), pending_records)]
+                if not window:
+                    break
+                # records with the same metadata filters share one batched search
+                groups: Dict[str, List[Dict[str, Any]]] = {}
+                for record in window:
+                    groups.setdefault(json.dumps(record.get("filters") or {}, sort_keys=True), []).append(record)
+                for group in groups.values():
+                    try:
+                        doc_lists = engine.search_many([r["query"] for r in group], k=self.top_k,
+                                                       mode=self.retrieval_mode, filters=group[0].get("filters"))
+                    except Exception as e:
+                        print(f"Batch retrieval failed, continuing without context: {e}")
+                        doc_lists = [[] for _ in group]
+                    for record, docs in zip(group, doc_lists):
+                        in_flight.add(pool.submit(self._answer, record, docs))
+                # keep a bounded number of answered-but-unwritten tasks
+                drain(self.concurrency * 2)
+            drain(0)
+
+        stats["elapsed_s"] = round(time.perf_counter() - started, 2)
+        return stats
+
+
+def run_batch(input_path: str, output_path: str, **kwargs) -> Dict[str, Any]:
+    """Library entry point: BatchRunner(**kwargs).run(input_path, output_path)."""
+    return BatchRunner(**kwargs).run(input_path, output_path)
@@ -0,0 +1,193 @@
+import json
+import mmap
+import os
+import pickle
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+try:
+    from langchain_community.docstore.base import Docstore
+except Exception:
+    try:
+        from langchain.docstore.base import Docstore
+    except Exception:
+        Docstore = object
+
+from config.config import VECTOR_DB_DIR
+from utils.lazy_import import LazyImport
+
+Document = LazyImport("langchain_core.documents:Document", "langchain.docstore.document:Document")
+
+CHUNK_STORE_FILE = "chunk_store.json"
+_TEXT_FILE = "chunks_text.bin"
+_META_FILE = "chunks_meta.bin"
+_OFFSETS_FILE = "chunks_offsets.npy"
+_FORMAT_VERSION = 1
+
+# Written by FAISS.save_local; only read by the converter and for stores not yet converted
+PICKLE_DOCSTORE_FILE = "index.pkl"
+
+
+def write_chunk_store(rows: Iterable[Tuple[str, str, Dict[str, Any]]], store_dir: str = VECTOR_DB_DIR) -> int:
+    """
+    Write (docstore id, text, metadata) rows, given in FAISS row order, as a chunk store:
+    two append-only blobs (UTF-8 texts, JSON {"id", "metadata"} records) plus an
+    (n + 1, 2) uint64 offset table. Rows are streamed to disk, files are swapped in
+    atomically, and the result is read-only and memory-mappable. Returns the row count.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    text_tmp = os.path.join(store_dir, _TEXT_FILE + ".tmp")
+    meta_tmp = os.path.join(store_dir, _META_FILE + ".tmp")
+    offsets = [(0, 0)]
+    with open(text_tmp, "wb") as text_fh, open(meta_tmp, "wb") as meta_fh:
+        text_end = meta_end = 0
+        for doc_id, text, metadata in rows:
+            text_bytes = (text or "").encode("utf-8")
+            meta_bytes = json.dumps({"id": doc_id, "metadata": metadata or {}}, ensure_ascii=False,
+                                    default=str).encode("utf-8")
+            text_fh.write(text_bytes)
+            meta_fh.write(meta_bytes)
+            text_end += len(text_bytes)
+            meta_end += len(meta_bytes)
+            offsets.append((text_end, meta_end))
+
+    offsets_tmp = os.path.join(store_dir, _OFFSETS_FILE + ".tmp")
+    with open(offsets_tmp, "wb") as fh:
+        np.save(fh, np.asarray(offsets, dtype=np.uint64))
+    info_tmp = os.path.join(store_dir, CHUNK_STORE_FILE + ".tmp")
+    with open(info_tmp, "w", encoding="utf-8") as fh:
+        json.dump({"format": _FORMAT_VERSION, "n_chunks": len(offsets) - 1}, fh)
+
+    for name in (_TEXT_FILE, _META_FILE, _OFFSETS_FILE, CHUNK_STORE_FILE):
+        os.replace(os.path.join(store_dir, name + ".tmp"), os.path.join(store_dir, name))
+    return len(offsets) - 1
+
+
+def chunk_store_exists(store_dir: str = VECTOR_DB_DIR) -> bool:
+    return os.path.exists(os.path.join(store_dir, CHUNK_STORE_FILE))
+
+
+def _map_file(path: str):
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped view of a chunk store. Nothing is decoded until a row is
+    requested, so opening is O(1) in the corpus size and the mapped pages are shared
+    through the OS page cache by every process serving the same store.
+    """
+
+    def __init__(self, store_dir: str = VECTOR_DB_DIR):
+        with open(os.path.join(store_dir, CHUNK_STORE_FILE), "r", encoding="utf-8") as fh:
+            info = json.load(fh)
+        if info.get("format") != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported chunk store format {info.get('format')!r} in {store_dir}")
+        self.n_chunks = info["n_chunks"]
+        self._offsets = np.load(os.path.join(store_dir, _OFFSETS_FILE), mmap_mode="r")
+        self._text = _map_file(os.path.join(store_dir, _TEXT_FILE))
+        self._meta = _map_file(os.path.join(store_dir, _META_FILE))
+
+    def __len__(self) -> int:
+        return self.n_chunks
+
+    def text(self, row: int) -> str:
+        start, end = int(self._offsets[row][0]), int(self._offsets[row + 1][0])
+        return self._text[start:end].decode("utf-8")
+
+    def record(self, row: int) -> Dict[str, Any]:
+        start, end = int(self._offsets[row][1]), int(self._offsets[row + 1][1])
+        return json.loads(self._meta[start:end].decode("utf-8"))
+
+    def document(self, row: int):
+        return Document(page_content=self.text(row), metadata=self.record(row)["metadata"])
+
+    def iter_rows(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """Yield (docstore id, text, metadata) for every row, in row order."""
+        for row in range(self.n_chunks):
+            record = self.record(row)
+            yield record["id"], self.text(row), record["metadata"]
+
+
+class RowIds(Mapping):
+    """index_to_docstore_id for a ChunkStore-backed FAISS: the docstore key of a row is the row itself."""
+
+    def __init__(self, n_rows: int):
+        self._n_rows = n_rows
+
+    def __getitem__(self, position) -> int:
+        position = int(position)
+        if not 0 <= position < self._n_rows:
+            raise KeyError(position)
+        return position
+
+    def __iter__(self):
+        return iter(range(self._n_rows))
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+
+class MmapDocstore(Docstore):
+    """
+    LangChain Docstore over a ChunkStore: only the Documents a search returns are
+    materialized. It is read-only: add() and delete() raise RuntimeError. Code that
+    modifies the store (incremental builds) loads it with
+    load_vector_store(writable=True), which gives an in-memory docstore instead.
+    """
+
+    def __init__(self, chunks: ChunkStore):
+        self.chunks = chunks
+
+    def search(self, search):
+        try:
+            row = int(search)
+        except (TypeError, ValueError):
+            return f"ID {search} not found."
+        if not 0 <= row < self.chunks.n_chunks:
+            return f"ID {search} not found."
+        return self.chunks.document(row)
+
+    def add(self, texts) -> None:
+        raise RuntimeError("MmapDocstore is read-only; load the store with load_vector_store(writable=True) "
+                           "to change it.")
+
+    def delete(self, ids) -> None:
+        raise RuntimeError("MmapDocstore is read-only; load the store with load_vector_store(writable=True) "
+                           "to change it.")
+
+
+def load_pickle_docstore(store_dir: str = VECTOR_DB_DIR):
+    """(docstore, index_to_docstore_id) from a legacy index.pkl written by FAISS.save_local."""
+    with open(os.path.join(store_dir, PICKLE_DOCSTORE_FILE), "rb") as fh:
+        return pickle.load(fh)
+
+
+def iter_docstore_rows(docstore, index_to_docstore_id) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """Yield (docstore id, text, metadata) of an in-memory docstore in FAISS row order."""
+    for position in range(len(index_to_docstore_id)):
+        doc_id = index_to_docstore_id[position]
+        doc = docstore.search(doc_id)
+        yield doc_id, getattr(doc, "page_content", ""), getattr(doc, "metadata", {}) or {}
+
+
+def convert_pickle_docstore(store_dir: str = VECTOR_DB_DIR, remove_pickle: bool = True) -> Optional[int]:
+    """
+    Convert the index.pkl docstore of an existing store into a chunk store. Returns the
+    number of chunks written, or None if there is no pickle to convert.
+    """
+    if not os.path.exists(os.path.join(store_dir, PICKLE_DOCSTORE_FILE)):
+        return None
+    docstore, index_to_docstore_id = load_pickle_docstore(store_dir)
+    n_chunks = write_chunk_store(iter_docstore_rows(docstore, index_to_docstore_id), store_dir)
+    if remove_pickle:
+        os.remove(os.path.join(store_dir, PICKLE_DOCSTORE_FILE))
+    return n_chunks
@@ -0,0 +1,175 @@
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import CHUNK_OVERLAP, CONTEXT_DEDUP_THRESHOLD
+from utils.tokens import estimate_tokens
+
+PASSAGE_SEPARATOR = "\n\n"
+# Overlaps shorter than this are treated as coincidence, not splitter overlap
+_MIN_OVERLAP_CHARS = 20
+# Do not bother appending a truncated passage smaller than this
+_MIN_TAIL_TOKENS = 48
+_WORD_RE = re.compile(r"\w+")
+
+
+def _chunk_position(doc: Any) -> Tuple[str, Optional[int]]:
+    """(source, chunk index) from the "{file}::{sha}::{i}" chunk id; index is None when unknown."""
+    metadata = getattr(doc, "metadata", None) or {}
+    source = metadata.get("source") or ""
+    chunk_id = metadata.get("chunk_id") or ""
+    try:
+        return source, int(chunk_id.rsplit("::", 1)[1])
+    except (IndexError, ValueError):
+        return source, None
+
+
+def _overlap_length(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of left that is a prefix of right (splitter overlap)."""
+    limit = min(len(left), len(right), max_overlap)
+    for size in range(limit, _MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _join_adjacent(left: str, right: str) -> str:
+    overlap = _overlap_length(left, right, CHUNK_OVERLAP * 2)
+    if overlap:
+        return left + right[overlap:]
+    return left + "\n" + right
+
+
+def _shingles(text: str, size: int = 5) -> Set[Tuple[str, ...]]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, preferring a sentence end, then a word boundary."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # estimate_tokens counts ~4 characters per token; shrink until it fits
+    cut = text[:max_tokens * 4]
+    while cut and estimate_tokens(cut) > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    sentence_end = max(cut.rfind(". "), cut.rfind(".\n"))
+    if sentence_end > len(cut) // 2:
+        return cut[:sentence_end + 1]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > 0 else cut) + " ..."
+
+
+def merge_adjacent_chunks(docs: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Merge retrieved chunks that are consecutive pieces of the same judgment into one
+    passage, removing the text the splitter repeated between them (up to CHUNK_OVERLAP).
+    Returns passages {"text", "rank", "source", "chunks"} ordered by their best rank.
+    """
+    runs: Dict[str, List[Tuple[int, int, str]]] = {}
+    passages: List[Dict[str, Any]] = []
+    for rank, doc in enumerate(docs):
+        text = getattr(doc, "page_content", str(doc))
+        source, index = _chunk_position(doc)
+        if index is None:
+            passages.append({"text": text, "rank": rank, "source": source, "chunks": 1})
+        else:
+            runs.setdefault(source, []).append((index, rank, text))
+
+    for source, chunks in runs.items():
+        chunks.sort()
+        current = None
+        for index, rank, text in chunks:
+            if current is not None and index == current["last_index"]:
+                continue  # same chunk retrieved twice (e.g. dense and lexical)
+            if current is not None and index == current["last_index"] + 1:
+                current["text"] = _join_adjacent(current["text"], text)
+                current["rank"] = min(current["rank"], rank)
+                current["chunks"] += 1
+                current["last_index"] = index
+                continue
+            if current is not None:
+                passages.append(current)
+            current = {"text": text, "rank": rank, "source": source, "chunks": 1, "last_index": index}
+        passages.append(current)
+
+    for passage in passages:
+        passage.pop("last_index", None)
+    passages.sort(key=lambda p: p["rank"])
+    return passages
+
+
+def drop_near_duplicates(passages: List[Dict[str, Any]],
+                         threshold: float = CONTEXT_DEDUP_THRESHOLD) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Drop passages whose word 5-gram Jaccard similarity with a better-ranked passage is at
+    least threshold (the same headnote or paragraph quoted in several judgments).
+    """
+    kept: List[Dict[str, Any]] = []
+    kept_shingles: List[Set[Tuple[str, ...]]] = []
+    dropped = 0
+    for passage in passages:
+        shingles = _shingles(passage["text"])
+        duplicate = False
+        for other in kept_shingles:
+            union = len(shingles | other)
+            if union and len(shingles & other) / union >= threshold:
+                duplicate = True
+                break
+        if duplicate:
+            dropped += 1
+            continue
+        kept.append(passage)
+        kept_shingles.append(shingles)
+    return kept, dropped
+
+
+def pack_context(docs: List[Any], budget_tokens: int) -> Tuple[str, Dict[str, Any]]:
+    """
+    Assemble the prompt context from retrieved docs (best first): merge adjacent chunks,
+    drop near-duplicates, then add passages in rank order while they fit budget_tokens;
+    the first passage that does not fit is truncated into the remaining budget and
+    packing stops. Returns (context, stats) where stats reports the token savings
+    against the plain concatenation of all chunks.
+    """
+    raw_tokens = estimate_tokens(PASSAGE_SEPARATOR.join(getattr(d, "page_content", str(d)) for d in docs))
+    passages = merge_adjacent_chunks(docs)
+    merged = len(docs) - len(passages)
+    passages, deduplicated = drop_near_duplicates(passages)
+
+    selected: List[str] = []
+    used = 0
+    truncated = False
+    separator_tokens = estimate_tokens(PASSAGE_SEPARATOR)
+    for passage in passages:
+        cost = estimate_tokens(passage["text"]) + (separator_tokens if selected else 0)
+        if used + cost <= budget_tokens:
+            selected.append(passage["text"])
+            used += cost
+            continue
+        remaining = budget_tokens - used - (separator_tokens if selected else 0)
+        if remaining >= _MIN_TAIL_TOKENS:
+            selected.append(_truncate_to_tokens(passage["text"], remaining))
+            truncated = True
+        break
+
+    context = PASSAGE_SEPARATOR.join(selected)
+    packed_tokens = estimate_tokens(context)
+    stats = {
+        "budget_tokens": budget_tokens,
+        "raw_tokens": raw_tokens,
+        "packed_tokens": packed_tokens,
+        "saved_tokens": raw_tokens - packed_tokens,
+        "chunks": len(docs),
+        "passages": len(selected),
+        "merged_chunks": merged,
+        "duplicates_dropped": deduplicated,
+        "passages_dropped": len(passages) - len(selected),
+        "truncated": truncated,
+    }
+    return context, stats
@@ -0,0 +1,93 @@
+"""
+Local stand-in for the web search backend, for testing and benchmarking search_web()
+without network access.
+
+    python -m utils.fake_search_server --port 8766 --latency 0.5 --fail-every 10
+    WEB_SEARCH_BACKEND=http WEB_SEARCH_URL=http://127.0.0.1:8766/search streamlit run app.py
+
+GET /search?q=...&max_results=N answers {"results": [{"title", "snippet", "url"}]} with
+deterministic results that echo the query; GET /stats reports how many searches were served.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSearchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    latency = 0.0
+    fail_every = 0
+    _counter = itertools.count(1)
+    served = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path.rstrip("/") == "/stats":
+            self._send_json(200, {"requests": type(self).served})
+            return
+        if url.path.rstrip("/") != "/search":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+
+        params = urllib.parse.parse_qs(url.query)
+        query = (params.get("q") or [""])[0]
+        max_results = int((params.get("max_results") or [3])[0])
+        n = next(self._counter)
+        type(self).served = n
+        time.sleep(self.latency)
+        if self.fail_every and n % self.fail_every == 0:
+            self._send_json(503, {"error": "search unavailable (fake)"})
+            return
+
+        slug = urllib.parse.quote_plus(query)
+        self._send_json(200, {"results": [
+            {
+                "title": f"Result {i} for {query}",
+                "snippet": f"Fake snippet {i} about {query}.",
+                "url": f"https://search.invalid/{i}?q={slug}",
+            }
+            for i in range(1, max_results + 1)
+        ]})
+
+
+def start_fake_search_server(port: int = 0, latency: float = 0.0, fail_every: int = 0) -> ThreadingHTTPServer:
+    """Start the fake in a daemon thread; its search URL is http://127.0.0.1:<server_port>/search."""
+    handler = type("ConfiguredFakeSearchHandler", (FakeSearchHandler,), {
+        "latency": latency, "fail_every": fail_every, "_counter": itertools.count(1), "served": 0,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve deterministic fake web search results.")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering.")
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every Nth search with HTTP 503.")
+    args = parser.parse_args()
+
+    server = start_fake_search_server(args.port, args.latency, args.fail_every)
+    print(f"Fake search server listening on http://127.0.0.1:{server.server_port}/search")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,180 @@
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import (
+    TEXT_DIR, CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER,
+    INGEST_WORKERS, EMBED_BATCH_SIZE, INGEST_PROGRESS_SECONDS,
+)
+from utils.legal_splitter import LegalTextSplitter, split_file
+from utils.metadata_index import parse_filename_metadata
+
+
+# Per-process splitter, created once by the pool initializer (or lazily when running inline)
+_splitter = None
+
+
+def _init_split_worker(chunk_size: int, chunk_overlap: int, chunker: str = CHUNKER) -> None:
+    global _splitter
+    if chunker == "legal":
+        _splitter = LegalTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        return
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except Exception:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    _splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _split_file_worker(text_dir: str, text_file: str, sha256: str) -> Tuple[str, List[Tuple[str, Dict[str, Any]]], Optional[str]]:
+    """
+    Read and split one file. Runs inside a pool process, so it returns plain
+    (text, metadata) tuples instead of Documents to keep pickling cheap.
+    """
+    if _splitter is None:
+        _init_split_worker(CHUNK_SIZE, CHUNK_OVERLAP)
+    try:
+        file_metadata = parse_filename_metadata(text_file)
+        chunks = []
+        if isinstance(_splitter, LegalTextSplitter):
+            # byte_start / byte_end locate the chunk in the source file (utils.legal_splitter.read_source_span)
+            pieces = split_file(os.path.join(text_dir, text_file), _splitter)
+            for i, (piece, byte_start, byte_end) in enumerate(pieces):
+                chunks.append((piece, dict(file_metadata, source=text_file, chunk_id=f"{text_file}::{sha256[:16]}::{i}",
+                                           byte_start=byte_start, byte_end=byte_end)))
+            return text_file, chunks, None
+
+        with open(os.path.join(text_dir, text_file), "r", encoding="utf-8", errors="replace") as fh:
+            text = fh.read().strip()
+        if not text:
+            return text_file, [], None
+        for i, piece in enumerate(_splitter.split_text(text)):
+            chunks.append((piece, dict(file_metadata, source=text_file, chunk_id=f"{text_file}::{sha256[:16]}::{i}")))
+        return text_file, chunks, None
+    except Exception as e:
+        return text_file, [], f"{e}\n{traceback.format_exc()}"
+
+
+class IngestProgress:
+    """Prints files/chunks done, throughput and a byte-based ETA at most every `interval` seconds."""
+
+    def __init__(self, total_files: int, total_bytes: int, interval: float = INGEST_PROGRESS_SECONDS):
+        self.total_files = total_files
+        self.total_bytes = max(total_bytes, 1)
+        self.interval = interval
+        self.files_done = 0
+        self.bytes_done = 0
+        self.chunks_embedded = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def file_done(self, size: int) -> None:
+        self.files_done += 1
+        self.bytes_done += size
+
+    def chunks_done(self, n: int) -> None:
+        self.chunks_embedded += n
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            print(self.summary())
+
+    def summary(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        fraction = self.bytes_done / self.total_bytes
+        eta = f"{elapsed / fraction - elapsed:.0f}s" if fraction > 0 else "?"
+        return (
+            f"[ingest] {self.files_done}/{self.total_files} files ({fraction:.1%}), "
+            f"{self.chunks_embedded} chunks embedded, "
+            f"{self.files_done / elapsed:.1f} files/s, {self.chunks_embedded / elapsed:.1f} chunks/s, "
+            f"elapsed {elapsed:.0f}s, ETA {eta}"
+        )
+
+
+class IngestionPipeline:
+    """
+    Bounded streaming ingestion: files are read and split lazily in a process pool,
+    chunks are embedded in fixed-size batches, and each embedded batch is handed to
+    the caller to add to the index before the next one is produced.
+
+    At most `max_pending` files are being split at any time and at most one batch
+    (plus the chunks of the file that overflowed it) is buffered, so peak memory is
+    bounded by batch size rather than corpus size.
+
+    `files` is a list of (file name, sha256, size in bytes) tuples.
+    """
+
+    def __init__(
+        self,
+        files: List[Tuple[str, str, int]],
+        embeddings,
+        text_dir: str = TEXT_DIR,
+        batch_size: int = EMBED_BATCH_SIZE,
+        workers: int = INGEST_WORKERS,
+        max_pending: Optional[int] = None,
+    ):
+        self.files = files
+        self.embeddings = embeddings
+        self.text_dir = text_dir
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.max_pending = max_pending or self.workers * 4
+        self.failed_files: List[str] = []
+        self.progress = IngestProgress(len(files), sum(size for _, _, size in files))
+
+    def _split_results(self) -> Iterator[Tuple[str, List[Tuple[str, Dict[str, Any]]], Optional[str]]]:
+        if self.workers == 1:
+            for text_file, sha256, _ in self.files:
+                yield _split_file_worker(self.text_dir, text_file, sha256)
+            return
+
+        queue = deque(self.files)
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_split_worker,
+            initargs=(CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER),
+        ) as pool:
+            pending = set()
+            while queue or pending:
+                while queue and len(pending) < self.max_pending:
+                    text_file, sha256, _ = queue.popleft()
+                    pending.add(pool.submit(_split_file_worker, self.text_dir, text_file, sha256))
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def _embed(self, chunks: List[Tuple[str, Dict[str, Any]]]):
+        texts = [text for text, _ in chunks]
+        metadatas = [metadata for _, metadata in chunks]
+        ids = [metadata["chunk_id"] for metadata in metadatas]
+        vectors = self.embeddings.embed_documents(texts)
+        self.progress.chunks_done(len(texts))
+        return texts, vectors, metadatas, ids
+
+    def batches(self) -> Iterator[Tuple[List[str], List[List[float]], List[Dict[str, Any]], List[str]]]:
+        """Yield (texts, vectors, metadatas, ids) batches of at most batch_size chunks."""
+        sizes = {text_file: size for text_file, _, size in self.files}
+        buffer: List[Tuple[str, Dict[str, Any]]] = []
+        for text_file, chunks, error in self._split_results():
+            self.progress.file_done(sizes.get(text_file, 0))
+            if error:
+                print(f"Error reading {text_file}: {error}")
+                self.failed_files.append(text_file)
+                continue
+            if not chunks:
+                print(f"Skipping empty file: {text_file}")
+                continue
+            buffer.extend(chunks)
+            while len(buffer) >= self.batch_size:
+                batch, buffer = buffer[:self.batch_size], buffer[self.batch_size:]
+                yield self._embed(batch)
+        if buffer:
+            yield self._embed(buffer)
+        print(self.progress.summary())
@@ -0,0 +1,61 @@
+import importlib
+import threading
+from typing import Any
+
+
+class LazyImport:
+    """
+    Stand-in for a heavy module or class that is imported on first use instead of at
+    module import time. Candidates are "module" or "module:attribute" strings tried in
+    order (the same fallback chains as try/except imports); when none of them imports,
+    using the stand-in raises ImportError(error). Attribute access and calls go to the
+    imported object, so `FAISS.from_embeddings(...)` or `faiss.read_index(...)` work as
+    before; use resolve() where the real object is needed (base classes, isinstance).
+    """
+
+    def __init__(self, *candidates: str, error: str = ""):
+        self._candidates = candidates
+        self._error = error or f"Could not import any of: {', '.join(candidates)}"
+        self._target = None
+        self._failure = None
+        self._lock = threading.Lock()
+
+    def resolve(self) -> Any:
+        if self._target is not None:
+            return self._target
+        with self._lock:
+            if self._target is None and self._failure is None:
+                errors = []
+                for candidate in self._candidates:
+                    module_name, _, attribute = candidate.partition(":")
+                    try:
+                        module = importlib.import_module(module_name)
+                        self._target = getattr(module, attribute) if attribute else module
+                        break
+                    except Exception as e:
+                        errors.append(f"{candidate}: {e}")
+                else:
+                    self._failure = f"{self._error} ({'; '.join(errors)})"
+        if self._target is None:
+            raise ImportError(self._failure)
+        return self._target
+
+    def available(self) -> bool:
+        """Whether one of the candidates imports (importing it if that has not happened yet)."""
+        try:
+            self.resolve()
+            return True
+        except ImportError:
+            return False
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        state = "imported" if self._target is not None else "not imported"
+        return f"<LazyImport {self._candidates[0]} ({state})>"
@@ -0,0 +1,141 @@
+import os
+import re
+import sys
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import TEXT_DIR, CHUNK_SIZE, CHUNK_OVERLAP
+
+# One pattern, one pass: numbered paragraphs ("... costs. 12. The appellant ..."),
+# spaced or colon headings of Indian judgments ("J U D G M E N T", "O R D E R",
+# "HEADNOTE:", "JUDGMENT:") and blank lines in texts that keep their line breaks.
+_BOUNDARY_RE = re.compile(
+    r"(?:^|(?<=\s))(?P<num>\d{1,3})\.\s+(?=[A-Z(\"'“])"
+    r"|(?P<heading>\bJ ?U ?D ?G ?M ?E ?N ?T\b(?! ?\d)|\bO R D E R\b"
+    r"|\b(?:HEADNOTE|JUDGMENT|ORDER|ACT|CITATION|BENCH|PETITIONER|RESPONDENT|FACTS|HELD):)"
+    r"|(?P<blank>\n[ \t]*\n)"
+)
+# Sentence end, but not the dot of a paragraph number ("costs. 12. The ...")
+_SENTENCE_END_RE = re.compile(r"(?<!\s\d)(?<!\s\d\d)(?<!\s\d\d\d)[.?!][\"')\]]?\s")
+
+
+class LegalTextSplitter:
+    """
+    Splitter for Indian judgment text: cuts at numbered paragraphs and section headings
+    found in one regex pass, then packs whole paragraphs greedily into chunks of at most
+    chunk_size characters. Only paragraphs longer than chunk_size are cut inside, at a
+    sentence end where possible, and the next piece repeats the whole sentences that
+    end within chunk_overlap characters of the cut; chunks that start on a paragraph
+    boundary need no overlap. Paragraph numbers are accepted only in sequence (n after
+    n - 1 or n - 2, or a restart at 1), so "Rs. 5." or "Section 28." in running text is
+    not mistaken for a paragraph.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_overlap = max(0, min(chunk_overlap, chunk_size // 2))
+
+    @staticmethod
+    def boundaries(text: str) -> List[int]:
+        """Character positions where a paragraph or section starts."""
+        positions = []
+        last_number = 0
+        for match in _BOUNDARY_RE.finditer(text):
+            number = match.group("num")
+            if number is not None:
+                n = int(number)
+                if not (last_number < n <= last_number + 2 or n == 1):
+                    continue
+                last_number = n
+                positions.append(match.start("num"))
+            elif match.group("heading") is not None:
+                positions.append(match.start("heading"))
+            else:
+                positions.append(match.end("blank"))
+        return positions
+
+    def _split_long(self, text: str, start: int, end: int, spans: List[Tuple[int, int]]) -> int:
+        """
+        Cut pieces of at most chunk_size off [start, end), preferring sentence ends, and
+        return where the remainder (at most chunk_size long) starts, so the caller can
+        pack it together with the paragraphs that follow.
+        """
+        size = self.chunk_size
+        position = start
+        while end - position > size:
+            # Last sentence end in the final quarter of the window, else the last space
+            window_start = position + size * 3 // 4
+            window = text[window_start:position + size]
+            cut = None
+            for match in _SENTENCE_END_RE.finditer(window):
+                cut = window_start + match.end()
+            if cut is None:
+                space = window.rfind(" ")
+                cut = window_start + space + 1 if space >= 0 else position + size
+            spans.append((position, cut))
+            # Repeat the whole sentences that end within chunk_overlap of the cut, if any
+            match = _SENTENCE_END_RE.search(text, cut - self.chunk_overlap, cut - 1) if self.chunk_overlap else None
+            position = match.end() if match else cut
+        return position
+
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) character spans of the chunks, whitespace-trimmed, in text order."""
+        spans: List[Tuple[int, int]] = []
+        chunk_start = last_fit = 0
+        for boundary in self.boundaries(text) + [len(text)]:
+            if boundary <= chunk_start:
+                continue
+            if boundary - chunk_start <= self.chunk_size:
+                last_fit = boundary
+                continue
+            # Close the chunk at the last paragraph that fit, unless that leaves it less
+            # than half full; then the next paragraph is cut at a sentence instead
+            if last_fit - chunk_start >= self.chunk_size // 2:
+                spans.append((chunk_start, last_fit))
+                chunk_start = last_fit
+            if boundary - chunk_start <= self.chunk_size:
+                last_fit = boundary
+            else:
+                chunk_start = self._split_long(text, chunk_start, boundary, spans)
+                last_fit = boundary
+        if chunk_start < len(text):
+            spans.append((chunk_start, len(text)))
+
+        trimmed = []
+        for start, end in spans:
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if end > start:
+                trimmed.append((start, end))
+        return trimmed
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+
+def split_file(file_path: str, splitter: LegalTextSplitter) -> List[Tuple[str, int, int]]:
+    """
+    Split a UTF-8 text file into (chunk text, byte_start, byte_end). The byte offsets are
+    exact positions in the file (undecodable bytes included), so read_source_span() can
+    re-read a chunk with one seek.
+    """
+    with open(file_path, "rb") as fh:
+        text = fh.read().decode("utf-8", errors="surrogateescape")
+    chunks = []
+    char_position = byte_position = 0
+    for start, end in splitter.split_spans(text):
+        byte_position += len(text[char_position:start].encode("utf-8", errors="surrogateescape"))
+        char_position = start
+        raw = text[start:end].encode("utf-8", errors="surrogateescape")
+        chunks.append((raw.decode("utf-8", errors="replace"), byte_position, byte_position + len(raw)))
+    return chunks
+
+
+def read_source_span(source: str, byte_start: int, byte_end: int, text_dir: str = TEXT_DIR) -> str:
+    """Re-read the text of a chunk from its source file via its byte_start / byte_end metadata."""
+    with open(os.path.join(text_dir, source), "rb") as fh:
+        fh.seek(byte_start)
+        return fh.read(byte_end - byte_start).decode("utf-8", errors="replace")
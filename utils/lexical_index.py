@@ -0,0 +1,153 @@
+import json
+import os
+import re
+import sys
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import VECTOR_DB_DIR, BM25_K1, BM25_B
+
+
+LEXICAL_VOCAB_FILE = "bm25_vocab.json"
+_DOC_IDS_FILE = "bm25_doc_ids.npy"
+_TFS_FILE = "bm25_tfs.npy"
+_DOC_NORM_FILE = "bm25_doc_norm.npy"
+
+# Section numbers, article numbers and years are the point of lexical search, so digits are kept
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have he her his in is it its of on or that the their "
+    "this to was were which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def build_lexical_index(texts: Iterable[str], store_dir: str = VECTOR_DB_DIR) -> int:
+    """
+    Build a BM25 inverted index over `texts` and save it in store_dir.
+
+    Document ordinals are the positions in `texts`, which callers pass in FAISS row
+    order so lexical and dense hits refer to the same chunks. Postings are stored as
+    flat memory-mappable arrays (doc ids, term frequencies) plus a vocabulary of
+    term -> [offset, document frequency]. Returns the number of documents indexed.
+    """
+    postings: Dict[str, Tuple[array, array]] = {}
+    doc_lengths = array("I")
+    for ordinal, text in enumerate(texts):
+        tokens = tokenize(text)
+        doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array("I"), array("H"))
+            entry[0].append(ordinal)
+            entry[1].append(min(tf, 65535))
+
+    n_docs = len(doc_lengths)
+    lengths = np.frombuffer(doc_lengths, dtype=np.uint32).astype(np.float32) if n_docs else np.zeros(0, np.float32)
+    avg_len = float(lengths.mean()) if n_docs else 0.0
+    # Precomputed BM25 length normalisation: k1 * (1 - b + b * dl / avgdl)
+    doc_norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths / max(avg_len, 1e-9))
+
+    vocab: Dict[str, List[int]] = {}
+    doc_ids = array("I")
+    tfs = array("H")
+    for term in sorted(postings):
+        ids, freqs = postings[term]
+        vocab[term] = [len(doc_ids), len(ids)]
+        doc_ids.extend(ids)
+        tfs.extend(freqs)
+
+    os.makedirs(store_dir, exist_ok=True)
+    for name, data in (
+        (_DOC_IDS_FILE, np.frombuffer(doc_ids, dtype=np.uint32) if doc_ids else np.zeros(0, np.uint32)),
+        (_TFS_FILE, np.frombuffer(tfs, dtype=np.uint16) if tfs else np.zeros(0, np.uint16)),
+        (_DOC_NORM_FILE, doc_norm.astype(np.float32)),
+    ):
+        tmp_path = os.path.join(store_dir, name + ".tmp")
+        with open(tmp_path, "wb") as fh:
+            np.save(fh, data)
+        os.replace(tmp_path, os.path.join(store_dir, name))
+
+    tmp_path = os.path.join(store_dir, LEXICAL_VOCAB_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump({"n_docs": n_docs, "avg_len": avg_len, "k1": BM25_K1, "b": BM25_B, "terms": vocab}, fh)
+    os.replace(tmp_path, os.path.join(store_dir, LEXICAL_VOCAB_FILE))
+    return n_docs
+
+
+def lexical_index_exists(store_dir: str = VECTOR_DB_DIR) -> bool:
+    return os.path.exists(os.path.join(store_dir, LEXICAL_VOCAB_FILE))
+
+
+class LexicalIndex:
+    """Read-only BM25 index; postings are memory-mapped and only touched for query terms."""
+
+    def __init__(self, store_dir: str = VECTOR_DB_DIR):
+        with open(os.path.join(store_dir, LEXICAL_VOCAB_FILE), "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        self.n_docs = meta["n_docs"]
+        self.k1 = meta["k1"]
+        self._terms = meta["terms"]
+        self._doc_ids = np.load(os.path.join(store_dir, _DOC_IDS_FILE), mmap_mode="r")
+        self._tfs = np.load(os.path.join(store_dir, _TFS_FILE), mmap_mode="r")
+        self._doc_norm = np.load(os.path.join(store_dir, _DOC_NORM_FILE), mmap_mode="r")
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Return up to k (document ordinal, BM25 score) pairs, best first. With a boolean
+        row mask (metadata filters) postings of other documents are skipped before scoring.
+        """
+        all_ids = []
+        all_scores = []
+        for term in set(tokenize(query)):
+            entry = self._terms.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            idf = np.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5))
+            ids = self._doc_ids[offset:offset + df]
+            tf = self._tfs[offset:offset + df].astype(np.float32)
+            if mask is not None:
+                keep = mask[ids]
+                ids, tf = ids[keep], tf[keep]
+                if not len(ids):
+                    continue
+            all_ids.append(ids)
+            all_scores.append(idf * tf * (self.k1 + 1.0) / (tf + self._doc_norm[ids]))
+        if not all_ids:
+            return []
+
+        ids = np.concatenate(all_ids)
+        scores = np.concatenate(all_scores)
+        if len(all_ids) > 1:
+            ids, inverse = np.unique(ids, return_inverse=True)
+            scores = np.bincount(inverse, weights=scores)
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int, rrf_k: int = 60) -> List[str]:
+    """Fuse several best-first rankings of ids into one: score(id) = sum 1 / (rrf_k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=lambda item: -scores[item])[:k]
+
+
+def load_lexical_index(store_dir: str = VECTOR_DB_DIR) -> Optional[LexicalIndex]:
+    """Load the BM25 index of store_dir, or None if the store was built without one."""
+    if not lexical_index_exists(store_dir):
+        return None
+    return LexicalIndex(store_dir)
@@ -0,0 +1,180 @@
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import VECTOR_DB_DIR
+
+METADATA_INFO_FILE = "meta_index.json"
+_CASE_FILE = "meta_case.npy"
+_YEAR_FILE = "meta_year.npy"
+_DATE_FILE = "meta_date.npy"
+_COLLECTION_FILE = "meta_collection.npy"
+
+# Filter keys accepted by MetadataIndex.select / RetrievalEngine.search(filters=...)
+FILTER_KEYS = ("year_from", "year_to", "collections", "case_number")
+
+# "7737-2020___supremecourt__2020__7737__7737_2020_Judgement_30-Sep-2020.txt"
+# "76128-1990___jonew__judis__13988.txt"
+_FILENAME_RE = re.compile(r"^(?P<case>\d*)-(?P<year>\d+)___(?P<collection>[a-z_]+?)(?:__|\.txt$)")
+_DATE_RE = re.compile(r"_(?P<kind>Judgement|Order)_(?P<date>\d{2}-[A-Za-z]{3}-\d{4})")
+
+_MASK_CACHE_SIZE = 32
+
+
+def parse_filename_metadata(file_name: str) -> Dict[str, Any]:
+    """
+    Structured fields encoded in a judgment file name: case_number, year (case year),
+    collection ("supremecourt", "supremecourt_vernacular", "jonew", ...), doc_type
+    ("judgement" / "order") and judgment_date (ISO). Fields that are absent are None.
+    """
+    fields: Dict[str, Any] = {
+        "case_number": None, "year": None, "collection": None, "doc_type": None, "judgment_date": None,
+    }
+    match = _FILENAME_RE.match(os.path.basename(file_name))
+    if match:
+        if match.group("case"):
+            fields["case_number"] = int(match.group("case"))
+        year = int(match.group("year"))
+        fields["year"] = year if year > 0 else None
+        fields["collection"] = match.group("collection")
+    match = _DATE_RE.search(file_name)
+    if match:
+        try:
+            fields["judgment_date"] = datetime.strptime(match.group("date"), "%d-%b-%Y").date().isoformat()
+            fields["doc_type"] = match.group("kind").lower()
+        except ValueError:
+            pass
+    return fields
+
+
+def build_metadata_index(sources: Iterable[str], store_dir: str = VECTOR_DB_DIR) -> int:
+    """
+    Build the columnar metadata sidecar for chunks whose source files are `sources`,
+    given in FAISS row order (same ordinal space as the BM25 index). Columns: case
+    number, year (judgment date year, else case year), judgment date as YYYYMMDD and a
+    collection code; 0 / -1 mean unknown. Returns the number of rows written.
+    """
+    parsed: Dict[str, Dict[str, Any]] = {}
+    collections: List[str] = []
+    codes: Dict[str, int] = {}
+    case_col, year_col, date_col, collection_col = [], [], [], []
+    for source in sources:
+        fields = parsed.get(source)
+        if fields is None:
+            fields = parsed[source] = parse_filename_metadata(source)
+        collection = fields["collection"] or ""
+        if collection not in codes:
+            codes[collection] = len(collections)
+            collections.append(collection)
+        date = fields["judgment_date"]
+        date_int = int(date.replace("-", "")) if date else 0
+        case_col.append(fields["case_number"] if fields["case_number"] is not None else -1)
+        year_col.append(date_int // 10000 if date_int else (fields["year"] or 0))
+        date_col.append(date_int)
+        collection_col.append(codes[collection])
+
+    if len(collections) > 255:
+        raise ValueError(f"Too many source collections for the metadata index ({len(collections)})")
+
+    os.makedirs(store_dir, exist_ok=True)
+    for name, data in (
+        (_CASE_FILE, np.asarray(case_col, dtype=np.int32)),
+        (_YEAR_FILE, np.asarray(year_col, dtype=np.int16)),
+        (_DATE_FILE, np.asarray(date_col, dtype=np.int32)),
+        (_COLLECTION_FILE, np.asarray(collection_col, dtype=np.uint8)),
+    ):
+        tmp_path = os.path.join(store_dir, name + ".tmp")
+        with open(tmp_path, "wb") as fh:
+            np.save(fh, data)
+        os.replace(tmp_path, os.path.join(store_dir, name))
+
+    tmp_path = os.path.join(store_dir, METADATA_INFO_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump({"n_docs": len(year_col), "collections": collections}, fh)
+    os.replace(tmp_path, os.path.join(store_dir, METADATA_INFO_FILE))
+    return len(year_col)
+
+
+def metadata_index_exists(store_dir: str = VECTOR_DB_DIR) -> bool:
+    return os.path.exists(os.path.join(store_dir, METADATA_INFO_FILE))
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Drop empty filter values; returns None when nothing is left to filter on."""
+    if not filters:
+        return None
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown search filters: {', '.join(sorted(unknown))}")
+    cleaned = {key: value for key, value in filters.items() if value not in (None, "", [], ())}
+    if "collections" in cleaned:
+        value = cleaned["collections"]
+        cleaned["collections"] = sorted([value] if isinstance(value, str) else value)
+    return cleaned or None
+
+
+class MetadataIndex:
+    """Read-only columnar metadata aligned with FAISS rows; columns are memory-mapped."""
+
+    def __init__(self, store_dir: str = VECTOR_DB_DIR):
+        with open(os.path.join(store_dir, METADATA_INFO_FILE), "r", encoding="utf-8") as fh:
+            info = json.load(fh)
+        self.n_docs = info["n_docs"]
+        self.collections: List[str] = info["collections"]
+        self._case = np.load(os.path.join(store_dir, _CASE_FILE), mmap_mode="r")
+        self._year = np.load(os.path.join(store_dir, _YEAR_FILE), mmap_mode="r")
+        self._date = np.load(os.path.join(store_dir, _DATE_FILE), mmap_mode="r")
+        self._collection = np.load(os.path.join(store_dir, _COLLECTION_FILE), mmap_mode="r")
+        self._masks: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def year_range(self):
+        known = self._year[self._year > 0]
+        return (int(known.min()), int(known.max())) if len(known) else (None, None)
+
+    def select(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Boolean mask over rows matching every filter: year_from / year_to (inclusive,
+        rows of unknown year never match), collections (list of names), case_number.
+        Masks of recently used filters are cached.
+        """
+        filters = normalize_filters(filters) or {}
+        key = json.dumps(filters, sort_keys=True)
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                return mask
+
+        mask = np.ones(self.n_docs, dtype=bool)
+        if "year_from" in filters:
+            mask &= self._year >= int(filters["year_from"])
+        if "year_to" in filters:
+            mask &= (self._year <= int(filters["year_to"])) & (self._year > 0)
+        if "collections" in filters:
+            codes = [self.collections.index(c) for c in filters["collections"] if c in self.collections]
+            mask &= np.isin(self._collection, np.asarray(codes, dtype=np.uint8))
+        if "case_number" in filters:
+            mask &= self._case == int(filters["case_number"])
+
+        with self._lock:
+            self._masks[key] = mask
+            while len(self._masks) > _MASK_CACHE_SIZE:
+                self._masks.popitem(last=False)
+        return mask
+
+
+def load_metadata_index(store_dir: str = VECTOR_DB_DIR) -> Optional[MetadataIndex]:
+    """Load the metadata sidecar of store_dir, or None if the store was built without one."""
+    if not metadata_index_exists(store_dir):
+        return None
+    return MetadataIndex(store_dir)
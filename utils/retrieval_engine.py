@@ -0,0 +1,321 @@
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import (
+    VECTOR_DB_DIR, INDEX_RELOAD_CHECK_SECONDS, TOP_K_RESULTS,
+    RETRIEVAL_MODE, HYBRID_CANDIDATES, RRF_K,
+)
+from models.embeddings import get_embeddings
+from utils.ann_index import filtered_search_params, set_search_params
+from utils.lexical_index import load_lexical_index, reciprocal_rank_fusion
+from utils.metadata_index import load_metadata_index, normalize_filters
+from utils.tracing import span
+from utils.vector_store import embedding_reindex_reason, load_manifest, load_vector_store, read_index_version
+
+
+def _doc_key(doc: Any) -> str:
+    return doc.metadata.get("chunk_id") or doc.page_content
+
+
+def fuse_rankings(dense_docs: List[Any], lexical_docs: List[Any], k: int) -> List[Any]:
+    """Reciprocal rank fusion of a dense and a lexical ranking of Documents (best first)."""
+    by_id = {}
+    dense_ids = []
+    for doc in dense_docs:
+        by_id[_doc_key(doc)] = doc
+        dense_ids.append(_doc_key(doc))
+    lexical_ids = []
+    for doc in lexical_docs:
+        by_id.setdefault(_doc_key(doc), doc)
+        lexical_ids.append(_doc_key(doc))
+    fused = reciprocal_rank_fusion([lexical_ids, dense_ids], k=k, rrf_k=RRF_K)
+    return [by_id[doc_id] for doc_id in fused]
+
+
+class RetrievalEngine:
+    """
+    Process-wide holder for the embedding model, the loaded FAISS store and its BM25
+    and metadata sidecar indexes.
+
+    The store is loaded once and shared by every Streamlit session / thread. Every
+    `check_interval` seconds the on-disk version marker is re-read, and the store is
+    reloaded only when it has changed. Searches in flight keep using the old store
+    object until they finish, so a reload never blocks or breaks a running query.
+    """
+
+    def __init__(self, store_dir: str = VECTOR_DB_DIR, check_interval: float = INDEX_RELOAD_CHECK_SECONDS,
+                 embeddings=None):
+        self.store_dir = store_dir
+        self.check_interval = check_interval
+        # None = the shared embedding model; shard workers pass a vector-only placeholder
+        self._embeddings = embeddings
+        self._lock = threading.RLock()
+        self._vectorstore = None
+        self._lexical = None
+        self._metadata = None
+        self._version: Optional[str] = None
+        self._last_check = 0.0
+
+    @property
+    def version(self) -> Optional[str]:
+        """Version marker of the currently loaded index (None if nothing is loaded yet)."""
+        return self._version
+
+    def get_vectorstore(self):
+        """Return the resident store, (re)loading it if missing or stale on disk."""
+        vectorstore = self._vectorstore
+        if vectorstore is not None and time.monotonic() - self._last_check < self.check_interval:
+            return vectorstore
+
+        with self._lock:
+            if self._vectorstore is not None and time.monotonic() - self._last_check < self.check_interval:
+                return self._vectorstore
+
+            version = read_index_version(self.store_dir)
+            if self._vectorstore is None or version != self._version:
+                started = time.perf_counter()
+                with span("load_index"):
+                    vectorstore = load_vector_store(embeddings=self._embeddings or get_embeddings(), store_dir=self.store_dir)
+                    self._lexical = load_lexical_index(self.store_dir)
+                    self._metadata = load_metadata_index(self.store_dir)
+                if self._embeddings is None:
+                    reason = embedding_reindex_reason(load_manifest(self.store_dir))
+                    if reason:
+                        print(f"WARNING: {reason}. Query vectors may not match the index; "
+                              f"run build_vector_store.py --full.")
+                if self._vectorstore is not None:
+                    print(f"Index changed on disk ({self._version} -> {version}); reloaded vector store")
+                print(f"Loaded vector store from {self.store_dir} in {time.perf_counter() - started:.2f}s")
+                self._vectorstore = vectorstore
+                self._version = version
+            self._last_check = time.monotonic()
+            return self._vectorstore
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+        """Adjust IVF nprobe / HNSW efSearch of the resident index at runtime."""
+        set_search_params(self.get_vectorstore().index, nprobe=nprobe, ef_search=ef_search)
+
+    def get_lexical_index(self):
+        """BM25 index matching the resident store, or None if the store has none."""
+        self.get_vectorstore()
+        return self._lexical
+
+    def ensure_loaded(self) -> None:
+        """Load (or reload, if stale) the index; raises if it cannot be loaded."""
+        self.get_vectorstore()
+
+    def get_metadata_index(self):
+        """Metadata sidecar matching the resident store, or None if the store has none."""
+        self.get_vectorstore()
+        return self._metadata
+
+    def similarity_search(self, query: str, k: int = TOP_K_RESULTS) -> List[Any]:
+        return self.get_vectorstore().similarity_search(query, k=k)
+
+    def _snapshot(self):
+        # Store and sidecar indexes are swapped together under the lock on reload
+        with self._lock:
+            return self.get_vectorstore(), self._lexical, self._metadata
+
+    @staticmethod
+    def _filter_mask(metadata, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Row mask for filters (None = no filtering)."""
+        filters = normalize_filters(filters)
+        if filters is None:
+            return None
+        if metadata is None:
+            raise RuntimeError("This vector store has no metadata index; rebuild it to use search filters.")
+        with span("metadata_filter") as filter_span:
+            mask = metadata.select(filters)
+            filter_span.set(selected=int(mask.sum()))
+        return mask
+
+    @staticmethod
+    def _doc_at(vectorstore, position: int):
+        """Document stored at a FAISS row, or None."""
+        docstore_id = vectorstore.index_to_docstore_id.get(int(position))
+        doc = vectorstore.docstore.search(docstore_id) if docstore_id is not None else None
+        return None if doc is None or isinstance(doc, str) else doc
+
+    def _lexical_hits(self, query: str, vectorstore, lexical, fetch_k: int,
+                      mask: Optional[np.ndarray] = None) -> List[Tuple[Any, float]]:
+        with span("bm25_search", k=fetch_k):
+            hits = lexical.search(query, fetch_k, mask=mask)
+        results = []
+        for position, score in hits:
+            doc = self._doc_at(vectorstore, position)
+            if doc is not None:
+                results.append((doc, score))
+        return results
+
+    def _fuse(self, query: str, dense_docs: List[Any], vectorstore, lexical, k: int, fetch_k: int,
+              mask: Optional[np.ndarray] = None) -> List[Any]:
+        lexical_docs = [doc for doc, _ in self._lexical_hits(query, vectorstore, lexical, fetch_k, mask)]
+        return fuse_rankings(dense_docs, lexical_docs, k)
+
+    def search(self, query: str, k: int = TOP_K_RESULTS, mode: Optional[str] = None,
+               vector: Optional[List[float]] = None, filters: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """
+        Retrieve k Documents. mode "dense" is plain FAISS similarity search; "hybrid"
+        fuses the top HYBRID_CANDIDATES of BM25 and FAISS with reciprocal rank fusion,
+        which keeps exact statute / section / party-name matches near the top.
+        Hybrid quietly degrades to dense when the store has no BM25 index.
+        `vector` is the query embedding when the caller already computed it.
+
+        filters (e.g. {"year_from": 2016, "collections": ["supremecourt"]}, see
+        utils.metadata_index.FILTER_KEYS) restrict both FAISS and BM25 to matching rows
+        during the search, so filtered queries still return k results without over-fetching.
+        """
+        mode = mode or RETRIEVAL_MODE
+        vectorstore, lexical, metadata = self._snapshot()
+        hybrid = mode == "hybrid" and lexical is not None
+        fetch_k = max(k, HYBRID_CANDIDATES) if hybrid else k
+        mask = self._filter_mask(metadata, filters)
+        if mask is not None and not mask.any():
+            return []
+
+        # Same steps as vectorstore.similarity_search(), split so each stage can be traced
+        if vector is None:
+            with span("embed_query"):
+                vector = get_embeddings().embed_query(query)
+        if mask is None:
+            with span("faiss_search", k=fetch_k):
+                dense_docs = vectorstore.similarity_search_by_vector(vector, k=fetch_k)
+        else:
+            dense_docs = [doc for doc, _ in self._dense_batch(vectorstore, [vector], fetch_k, mask)[0]]
+        if not hybrid:
+            return dense_docs
+        return self._fuse(query, dense_docs, vectorstore, lexical, k, fetch_k, mask)
+
+    def _dense_batch(self, vectorstore, vectors, k: int,
+                     mask: Optional[np.ndarray] = None) -> List[List[Tuple[Any, float]]]:
+        """
+        One FAISS search call for a (n_queries, dim) matrix; maps row positions back to
+        Documents. With a row mask only matching rows are searched (IDSelector).
+        """
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        with span("faiss_search", k=k, queries=len(matrix), filtered=mask is not None):
+            if mask is None:
+                distances, positions = vectorstore.index.search(matrix, k)
+            else:
+                params, keepalive = filtered_search_params(vectorstore.index, mask)
+                distances, positions = vectorstore.index.search(matrix, k, params=params)
+                del keepalive
+        results = []
+        for row_distances, row_positions in zip(distances, positions):
+            hits = []
+            for distance, position in zip(row_distances, row_positions):
+                if position < 0:
+                    continue  # fewer than k vectors in the index (or in the probed lists)
+                doc = self._doc_at(vectorstore, position)
+                if doc is not None:
+                    hits.append((doc, float(distance)))
+            results.append(hits)
+        return results
+
+    def search_batch(self, queries: List[str], k: int = TOP_K_RESULTS,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[Any, float]]]:
+        """
+        Dense retrieval for many queries at once: the queries are embedded in one matrix
+        pass and searched with one batched FAISS call. Returns, per query, up to k
+        (Document, L2 distance) pairs, nearest first (same scores as similarity_search_with_score).
+        """
+        if not queries:
+            return []
+        vectorstore, _, metadata = self._snapshot()
+        mask = self._filter_mask(metadata, filters)
+        if mask is not None and not mask.any():
+            return [[] for _ in queries]
+        with span("embed_query", queries=len(queries)):
+            vectors = get_embeddings().embed_documents(list(queries))
+        return self._dense_batch(vectorstore, vectors, k, mask)
+
+    def search_many(self, queries: List[str], k: int = TOP_K_RESULTS, mode: Optional[str] = None,
+                    filters: Optional[Dict[str, Any]] = None) -> List[List[Any]]:
+        """search() for several queries, with one embedding pass and one FAISS search for all of them."""
+        if not queries:
+            return []
+        mode = mode or RETRIEVAL_MODE
+        vectorstore, lexical, metadata = self._snapshot()
+        hybrid = mode == "hybrid" and lexical is not None
+        fetch_k = max(k, HYBRID_CANDIDATES) if hybrid else k
+        mask = self._filter_mask(metadata, filters)
+        if mask is not None and not mask.any():
+            return [[] for _ in queries]
+
+        with span("embed_query", queries=len(queries)):
+            vectors = get_embeddings().embed_documents(list(queries))
+        results = []
+        for query, hits in zip(queries, self._dense_batch(vectorstore, vectors, fetch_k, mask)):
+            dense_docs = [doc for doc, _ in hits]
+            results.append(self._fuse(query, dense_docs, vectorstore, lexical, k, fetch_k, mask) if hybrid else dense_docs)
+        return results
+
+    def candidates(self, queries: List[str], vectors, fetch_k: int, lexical: bool = True,
+                   filters: Optional[Dict[str, Any]] = None) -> List[Tuple[List[Tuple[Any, float]], List[Tuple[Any, float]]]]:
+        """
+        Unfused retrieval candidates for already-embedded queries, used to merge results
+        across shards: per query (dense [(Document, L2 distance)], lexical [(Document,
+        BM25 score)]), each up to fetch_k long. lexical=False skips BM25.
+        """
+        vectorstore, lexical_index, metadata = self._snapshot()
+        mask = self._filter_mask(metadata, filters)
+        if mask is not None and not mask.any():
+            return [([], []) for _ in queries]
+        results = []
+        for query, dense in zip(queries, self._dense_batch(vectorstore, vectors, fetch_k, mask)):
+            lexical_hits = []
+            if lexical and lexical_index is not None:
+                lexical_hits = self._lexical_hits(query, vectorstore, lexical_index, fetch_k, mask)
+            results.append((dense, lexical_hits))
+        return results
+
+    def warm_up(self) -> None:
+        """Load the index and run one query embedding so the first real question pays no load cost."""
+        self.get_vectorstore()
+        get_embeddings().embed_query("warm up")
+
+    def invalidate(self) -> None:
+        """Drop the loaded store; the next search reloads it from disk."""
+        with self._lock:
+            self._vectorstore = None
+            self._lexical = None
+            self._metadata = None
+            self._version = None
+            self._last_check = 0.0
+
+
+_engine: Optional[RetrievalEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_retrieval_engine() -> RetrievalEngine:
+    """
+    Return the shared retrieval engine for this process: a ShardedRetrievalEngine when
+    VECTOR_DB_DIR holds a sharded layout or SHARD_ENDPOINTS is set, else a RetrievalEngine.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from utils.sharding import is_sharded, ShardedRetrievalEngine
+
+                _engine = ShardedRetrievalEngine() if is_sharded() else RetrievalEngine()
+    return _engine
+
+
+def warm_up_retrieval_engine() -> None:
+    get_retrieval_engine().warm_up()
+
+
+def invalidate_retrieval_engine() -> None:
+    if _engine is not None:
+        _engine.invalidate()
@@ -0,0 +1,153 @@
+"""
+Serve one index shard over HTTP so the shards of a sharded store can be searched by
+separate processes (one per core now, one per machine later).
+
+    python -m utils.shard_worker --store-dir D:\\...\\vector_store\\shards\\hash00 --port 8801
+    python -m utils.shard_worker --all --base-port 8801     # one process per shard of VECTOR_DB_DIR
+    SHARD_ENDPOINTS=http://127.0.0.1:8801,http://127.0.0.1:8802 streamlit run app.py
+
+Workers never embed text: the app embeds the query once and sends the vector, so a
+worker only needs its shard on disk (no embedding model in memory).
+GET /health returns the shard name and index version; POST /candidates takes
+{"queries", "vectors", "fetch_k", "lexical", "filters"} and returns the unfused dense
+and BM25 candidates of every query (see RetrievalEngine.candidates).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+try:
+    from langchain_core.embeddings import Embeddings
+except Exception:
+    Embeddings = object
+
+from config.config import VECTOR_DB_DIR
+from utils.retrieval_engine import RetrievalEngine
+
+
+class _VectorOnlyEmbeddings(Embeddings):
+    """Placeholder for FAISS.load_local in a worker: queries arrive already embedded."""
+
+    def embed_query(self, text):
+        raise RuntimeError("Shard workers search by vector; embed queries in the calling process.")
+
+    def embed_documents(self, texts):
+        raise RuntimeError("Shard workers search by vector; embed queries in the calling process.")
+
+
+def _encode_hits(hits):
+    return [[doc.page_content, doc.metadata, score] for doc, score in hits]
+
+
+class ShardWorkerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    engine: RetrievalEngine = None
+    name = ""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/health":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            self.engine.ensure_loaded()
+        except Exception as e:
+            self._send_json(503, {"error": str(e)})
+            return
+        self._send_json(200, {"name": self.name, "version": self.engine.version})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/candidates":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        try:
+            results = self.engine.candidates(
+                request["queries"], request["vectors"], int(request["fetch_k"]),
+                lexical=bool(request.get("lexical", True)), filters=request.get("filters"),
+            )
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, {
+            "version": self.engine.version,
+            "results": [{"dense": _encode_hits(dense), "lexical": _encode_hits(lexical)} for dense, lexical in results],
+        })
+
+
+def start_shard_worker(store_dir: str, port: int = 0, name: str = None) -> ThreadingHTTPServer:
+    """Serve the shard in store_dir from a daemon thread; returns the server."""
+    handler = type("ConfiguredShardWorkerHandler", (ShardWorkerHandler,), {
+        "engine": RetrievalEngine(store_dir=store_dir, embeddings=_VectorOnlyEmbeddings()),
+        "name": name or os.path.basename(os.path.normpath(store_dir)),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _spawn_all(base_port: int, store_dir: str) -> None:
+    """Start one worker process per shard of store_dir and wait for them."""
+    from utils.sharding import read_shard_layout, shard_dir
+
+    layout = read_shard_layout(store_dir)
+    if layout is None:
+        raise SystemExit(f"No sharded vector store in {store_dir}. Run build_vector_store.py --shards N.")
+    processes, endpoints = [], []
+    for offset, name in enumerate(layout["shards"]):
+        port = base_port + offset
+        processes.append(subprocess.Popen([
+            sys.executable, "-m", "utils.shard_worker", "--store-dir", shard_dir(name, store_dir), "--port", str(port),
+        ], cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))))
+        endpoints.append(f"http://127.0.0.1:{port}")
+    print(f"Started {len(processes)} shard workers")
+    print(f"SHARD_ENDPOINTS={','.join(endpoints)}")
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve one vector store shard for scatter-gather search.")
+    parser.add_argument("--store-dir", help="Shard directory (VECTOR_DB_DIR/shards/<name>).")
+    parser.add_argument("--port", type=int, default=8801)
+    parser.add_argument("--all", action="store_true", help="Start one worker process per shard of VECTOR_DB_DIR.")
+    parser.add_argument("--base-port", type=int, default=8801, help="Port of the first worker with --all.")
+    args = parser.parse_args()
+
+    if args.all:
+        _spawn_all(args.base_port, VECTOR_DB_DIR)
+        sys.exit(0)
+    if not args.store_dir:
+        parser.error("--store-dir is required (or use --all)")
+
+    server = start_shard_worker(args.store_dir, args.port)
+    server.RequestHandlerClass.engine.ensure_loaded()
+    print(f"Shard worker for {args.store_dir} listening on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
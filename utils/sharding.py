@@ -0,0 +1,374 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import (
+    TEXT_DIR, VECTOR_DB_DIR, TOP_K_RESULTS, RETRIEVAL_MODE, HYBRID_CANDIDATES, INDEX_RELOAD_CHECK_SECONDS,
+    SHARD_BY, VECTOR_SHARDS, SHARD_SEARCH_THREADS, SHARD_ENDPOINTS, SHARD_TIMEOUT_SECONDS,
+)
+from models.embeddings import get_embeddings
+from utils.metadata_index import normalize_filters, parse_filename_metadata
+from utils.retrieval_engine import RetrievalEngine, fuse_rankings
+from utils.tracing import span
+from utils.vector_store import Document, create_vector_store, plan_vector_store_update
+
+SHARD_LAYOUT_FILE = "shards.json"
+SHARDS_SUBDIR = "shards"
+SHARD_KEYS = ("hash", "year")
+
+
+def shard_name(file_name: str, shard_by: str = SHARD_BY, n_shards: int = VECTOR_SHARDS) -> str:
+    """Shard a text file belongs to: "hash03" (stable hash of the name) or "year1990s" (decade)."""
+    if shard_by == "hash":
+        digest = int(hashlib.sha1(file_name.encode("utf-8")).hexdigest()[:8], 16)
+        return f"hash{digest % max(1, n_shards):02d}"
+    if shard_by == "year":
+        fields = parse_filename_metadata(file_name)
+        year = int(fields["judgment_date"][:4]) if fields["judgment_date"] else fields["year"]
+        return f"year{year // 10 * 10}s" if year else "year_unknown"
+    raise ValueError(f"Unknown SHARD_BY {shard_by!r}; expected one of {', '.join(SHARD_KEYS)}")
+
+
+def shard_year_range(name: str) -> Optional[Tuple[int, int]]:
+    """(first, last) year held by a per-decade shard, None for hash shards and unknown years."""
+    if name.startswith("year") and name.endswith("s") and name[4:-1].isdigit():
+        decade = int(name[4:-1])
+        return decade, decade + 9
+    return None
+
+
+def shard_dir(name: str, store_dir: str = VECTOR_DB_DIR) -> str:
+    return os.path.join(store_dir, SHARDS_SUBDIR, name)
+
+
+def read_shard_layout(store_dir: str = VECTOR_DB_DIR) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(store_dir, SHARD_LAYOUT_FILE), "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_shard_layout(layout: Dict[str, Any], store_dir: str) -> None:
+    path = os.path.join(store_dir, SHARD_LAYOUT_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as fh:
+        json.dump(layout, fh, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def is_sharded(store_dir: str = VECTOR_DB_DIR) -> bool:
+    return bool(SHARD_ENDPOINTS) or read_shard_layout(store_dir) is not None
+
+
+def assign_shards(shard_by: str = SHARD_BY, n_shards: int = VECTOR_SHARDS) -> Dict[str, List[str]]:
+    """Shard name -> text files of TEXT_DIR it holds."""
+    if not os.path.exists(TEXT_DIR):
+        raise FileNotFoundError(f"TEXT_DIR does not exist: {TEXT_DIR}")
+    assignment: Dict[str, List[str]] = {}
+    for text_file in sorted(f for f in os.listdir(TEXT_DIR) if f.lower().endswith(".txt")):
+        assignment.setdefault(shard_name(text_file, shard_by, n_shards), []).append(text_file)
+    return assignment
+
+
+def _shard_selector(name: str, shard_by: str, n_shards: int):
+    return lambda text_file: shard_name(text_file, shard_by, n_shards) == name
+
+
+def plan_sharded_update(full: bool = False, shard_by: str = SHARD_BY, n_shards: int = VECTOR_SHARDS,
+                        store_dir: str = VECTOR_DB_DIR) -> Dict[str, Dict[str, Any]]:
+    """plan_vector_store_update() for every shard: {shard name: plan}."""
+    return {
+        name: plan_vector_store_update(full=full, store_dir=shard_dir(name, store_dir),
+                                       select=_shard_selector(name, shard_by, n_shards))
+        for name in sorted(assign_shards(shard_by, n_shards))
+    }
+
+
+def build_sharded_vector_store(full: bool = False, shard_by: str = SHARD_BY, n_shards: int = VECTOR_SHARDS,
+                               only: Optional[List[str]] = None, store_dir: str = VECTOR_DB_DIR) -> Dict[str, int]:
+    """
+    Build or incrementally update the index as shards, each a complete store (FAISS,
+    chunk store, BM25, metadata, manifest) in VECTOR_DB_DIR/shards/<name>. `only`
+    limits the build to the named shards; the others are left untouched, so shards can
+    be rebuilt independently (and on different machines). Changing the sharding scheme
+    rebuilds every shard. Returns {shard name: vectors}.
+    """
+    layout = read_shard_layout(store_dir)
+    if layout and (layout.get("shard_by"), layout.get("n_shards")) != (shard_by, n_shards):
+        if only:
+            raise ValueError(f"Sharding changed from {layout.get('shard_by')}/{layout.get('n_shards')} to "
+                             f"{shard_by}/{n_shards}; rebuild all shards (omit --only).")
+        print(f"Sharding changed to {shard_by}/{n_shards}; rebuilding every shard")
+        shutil.rmtree(os.path.join(store_dir, SHARDS_SUBDIR), ignore_errors=True)
+        layout = None
+        full = True
+
+    assignment = assign_shards(shard_by, n_shards)
+    if not assignment:
+        raise ValueError("No documents found to process. Please add .txt files to TEXT_DIR.")
+    for name in only or []:
+        if name not in assignment:
+            print(f"Unknown or empty shard {name!r}; shards are: {', '.join(sorted(assignment))}")
+
+    counts: Dict[str, int] = {}
+    for name in sorted(assignment):
+        if only and name not in only:
+            continue
+        print(f"=== Shard {name}: {len(assignment[name])} files ===")
+        vectorstore = create_vector_store(full=full, store_dir=shard_dir(name, store_dir),
+                                          select=_shard_selector(name, shard_by, n_shards))
+        counts[name] = vectorstore.index.ntotal
+
+    # Shards whose files were all removed
+    for name in set((layout or {}).get("shards", [])) - set(assignment):
+        print(f"Removing empty shard {name}")
+        shutil.rmtree(shard_dir(name, store_dir), ignore_errors=True)
+
+    _write_shard_layout({"shard_by": shard_by, "n_shards": n_shards, "shards": sorted(assignment)}, store_dir)
+    return counts
+
+
+class LocalShard:
+    """A shard searched in this process by its own RetrievalEngine."""
+
+    def __init__(self, name: str, store_dir: str):
+        self.name = name
+        self.engine = RetrievalEngine(store_dir=store_dir)
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.engine.version
+
+    def ensure_loaded(self) -> None:
+        self.engine.ensure_loaded()
+
+    def metadata_index(self):
+        return self.engine.get_metadata_index()
+
+    def candidates(self, queries, vectors, fetch_k, lexical, filters):
+        return self.engine.candidates(queries, vectors, fetch_k, lexical=lexical, filters=filters)
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+        self.engine.set_search_params(nprobe=nprobe, ef_search=ef_search)
+
+    def invalidate(self) -> None:
+        self.engine.invalidate()
+
+
+class RemoteShard:
+    """A shard served by a shard worker process (python -m utils.shard_worker)."""
+
+    def __init__(self, url: str, timeout: float = SHARD_TIMEOUT_SECONDS):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.name = self.url
+        self._version: Optional[str] = None
+        self._last_check = 0.0
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
+
+    def _request(self, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def ensure_loaded(self) -> None:
+        if self._version is not None and time.monotonic() - self._last_check < INDEX_RELOAD_CHECK_SECONDS:
+            return
+        health = self._request("/health")
+        self.name = health.get("name") or self.url
+        self._version = health.get("version")
+        self._last_check = time.monotonic()
+
+    def metadata_index(self):
+        return None
+
+    def candidates(self, queries, vectors, fetch_k, lexical, filters):
+        self.ensure_loaded()
+        response = self._request("/candidates", {
+            "queries": list(queries),
+            "vectors": np.asarray(vectors, dtype=np.float32).tolist(),
+            "fetch_k": fetch_k,
+            "lexical": lexical,
+            "filters": filters,
+        })
+        self._version = response.get("version", self._version)
+
+        def decode(hits):
+            return [(Document(page_content=text, metadata=metadata), score) for text, metadata, score in hits]
+
+        return [(decode(result["dense"]), decode(result["lexical"])) for result in response["results"]]
+
+    def invalidate(self) -> None:
+        self._version = None
+
+
+class _ShardedMetadataView:
+    """Filter choices (year range, collections) over the metadata indexes of all local shards."""
+
+    def __init__(self, indexes):
+        self._indexes = indexes
+        self.collections = sorted({c for index in indexes for c in index.collections})
+
+    def year_range(self):
+        ranges = [index.year_range() for index in self._indexes]
+        ranges = [r for r in ranges if r[0] is not None]
+        if not ranges:
+            return None, None
+        return min(r[0] for r in ranges), max(r[1] for r in ranges)
+
+
+class ShardedRetrievalEngine:
+    """
+    Scatter-gather retrieval over index shards, with the search API of RetrievalEngine
+    (search, search_many, search_batch, similarity_search, set_search_params). There is
+    no single vector store or BM25 index, so get_vectorstore / get_lexical_index are not
+    offered.
+
+    The query is embedded once, every shard is searched in parallel on a thread pool
+    (FAISS releases the GIL) or over HTTP when SHARD_ENDPOINTS points at shard worker
+    processes, and the per-shard candidates are merged into one global top-k: dense
+    hits by L2 distance, BM25 hits by score, then fused with reciprocal rank fusion in
+    hybrid mode. Dense results match a single index exactly; BM25 statistics are per
+    shard, so hybrid rankings can differ slightly from an unsharded store. Per-decade
+    shards that cannot match a year filter are skipped. A shard that fails is logged
+    and left out, so one bad shard degrades recall, not availability.
+    """
+
+    def __init__(self, store_dir: str = VECTOR_DB_DIR, endpoints: Optional[List[str]] = None,
+                 threads: int = SHARD_SEARCH_THREADS):
+        endpoints = SHARD_ENDPOINTS if endpoints is None else endpoints
+        if endpoints:
+            self.shards = [RemoteShard(url) for url in endpoints]
+        else:
+            layout = read_shard_layout(store_dir)
+            if layout is None:
+                raise FileNotFoundError(f"No sharded vector store in {store_dir}. Run build_vector_store.py --shards N.")
+            self.shards = [LocalShard(name, shard_dir(name, store_dir)) for name in layout["shards"]]
+        self._pool = ThreadPoolExecutor(max_workers=threads or max(1, len(self.shards)), thread_name_prefix="shard")
+
+    @property
+    def version(self) -> Optional[str]:
+        """Combined version of all shards (changes when any shard is rebuilt)."""
+        versions = [shard.version for shard in self.shards]
+        if any(v is None for v in versions):
+            return None
+        return hashlib.sha1("|".join(versions).encode("utf-8")).hexdigest()[:16]
+
+    def ensure_loaded(self) -> None:
+        for future in [self._pool.submit(shard.ensure_loaded) for shard in self.shards]:
+            future.result()
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+        """
+        Adjust IVF nprobe / HNSW efSearch of every local shard at runtime. Shard workers
+        keep the FAISS_NPROBE / FAISS_EF_SEARCH of their own environment.
+        """
+        for shard in self.shards:
+            if isinstance(shard, RemoteShard):
+                print(f"Shard {shard.name} runs in a shard worker; its search parameters come from "
+                      f"FAISS_NPROBE / FAISS_EF_SEARCH in the worker's environment")
+                continue
+            shard.set_search_params(nprobe=nprobe, ef_search=ef_search)
+
+    def get_metadata_index(self):
+        self.ensure_loaded()
+        indexes = [index for index in (shard.metadata_index() for shard in self.shards) if index is not None]
+        return _ShardedMetadataView(indexes) if indexes else None
+
+    def _select_shards(self, filters: Optional[Dict[str, Any]]) -> List[Any]:
+        """Shards that can hold rows matching the filters (shard names are known once loaded)."""
+        filters = normalize_filters(filters) or {}
+        if "year_from" not in filters and "year_to" not in filters:
+            return self.shards
+        selected = []
+        for shard in self.shards:
+            years = shard_year_range(shard.name)
+            if years is None:
+                if not shard.name.startswith("year_unknown"):
+                    selected.append(shard)  # hash shards hold every year
+                continue
+            if years[1] >= int(filters.get("year_from", years[1])) and years[0] <= int(filters.get("year_to", years[0])):
+                selected.append(shard)
+        return selected
+
+    def _gather(self, queries: List[str], vectors, fetch_k: int, lexical: bool, filters: Optional[Dict[str, Any]]):
+        shards = self._select_shards(filters)
+        with span("shard_search", shards=len(shards), queries=len(queries)):
+            futures = [(shard, self._pool.submit(shard.candidates, queries, vectors, fetch_k, lexical, filters))
+                       for shard in shards]
+            per_shard = []
+            errors = []
+            for shard, future in futures:
+                try:
+                    per_shard.append(future.result())
+                except Exception as e:
+                    print(f"Shard {shard.name} failed, leaving it out of the results: {e}")
+                    errors.append(e)
+        if errors and not per_shard:
+            raise errors[0]
+        return per_shard
+
+    def _merge(self, per_shard, query_index: int, k: int, fetch_k: int, hybrid: bool) -> List[Any]:
+        dense = sorted((hit for result in per_shard for hit in result[query_index][0]), key=lambda h: h[1])
+        if not hybrid:
+            return dense[:k]
+        lexical = sorted((hit for result in per_shard for hit in result[query_index][1]), key=lambda h: -h[1])
+        return fuse_rankings([doc for doc, _ in dense[:fetch_k]], [doc for doc, _ in lexical[:fetch_k]], k)
+
+    def search_many(self, queries: List[str], k: int = TOP_K_RESULTS, mode: Optional[str] = None,
+                    filters: Optional[Dict[str, Any]] = None, vectors=None) -> List[List[Any]]:
+        if not queries:
+            return []
+        hybrid = (mode or RETRIEVAL_MODE) == "hybrid"
+        fetch_k = max(k, HYBRID_CANDIDATES) if hybrid else k
+        if vectors is None:
+            with span("embed_query", queries=len(queries)):
+                vectors = get_embeddings().embed_documents(list(queries))
+        per_shard = self._gather(queries, vectors, fetch_k, hybrid, filters)
+        results = []
+        for i in range(len(queries)):
+            merged = self._merge(per_shard, i, k, fetch_k, hybrid)
+            results.append(merged if hybrid else [doc for doc, _ in merged])
+        return results
+
+    def search(self, query: str, k: int = TOP_K_RESULTS, mode: Optional[str] = None,
+               vector: Optional[List[float]] = None, filters: Optional[Dict[str, Any]] = None) -> List[Any]:
+        if vector is None:
+            with span("embed_query"):
+                vector = get_embeddings().embed_query(query)
+        return self.search_many([query], k=k, mode=mode, filters=filters, vectors=[vector])[0]
+
+    def similarity_search(self, query: str, k: int = TOP_K_RESULTS) -> List[Any]:
+        return self.search(query, k=k, mode="dense")
+
+    def search_batch(self, queries: List[str], k: int = TOP_K_RESULTS,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[Any, float]]]:
+        """Dense (Document, L2 distance) pairs per query, merged across shards."""
+        if not queries:
+            return []
+        with span("embed_query", queries=len(queries)):
+            vectors = get_embeddings().embed_documents(list(queries))
+        per_shard = self._gather(queries, vectors, k, False, filters)
+        return [self._merge(per_shard, i, k, k, False) for i in range(len(queries))]
+
+    def warm_up(self) -> None:
+        self.ensure_loaded()
+        get_embeddings().embed_query("warm up")
+
+    def invalidate(self) -> None:
+        for shard in self.shards:
+            shard.invalidate()
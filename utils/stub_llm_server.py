@@ -0,0 +1,122 @@
+"""
+Local stand-in for the Groq chat completions API, for batch runs and benchmarks
+without network access or API cost.
+
+    python -m utils.stub_llm_server --port 8765 --latency 0.2 --rate-limit-every 20
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=stub python batch_query.py questions.jsonl answers.jsonl
+
+Answers are deterministic: they echo the question and the size of the prompt.
+Supports both blocking and stream=True (server-sent events) requests.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    latency = 0.0
+    prompt_delay = 0.0
+    token_delay = 0.0
+    rate_limit_every = 0
+    _counter = itertools.count(1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        n = next(self._counter)
+        if self.rate_limit_every and n % self.rate_limit_every == 0:
+            self._send_json(429, {"error": {"message": "rate limited (stub)", "type": "rate_limit"}}, {"retry-after": "1"})
+            return
+
+        messages = request.get("messages") or [{}]
+        prompt = messages[-1].get("content", "")
+        prompt_tokens = max(1, len(prompt) // 4)
+        # fixed latency plus prompt processing time, so shorter prompts answer sooner
+        time.sleep(self.latency + self.prompt_delay * prompt_tokens / 1000.0)
+        question = prompt.rsplit("Question:", 1)[-1].split("\n\nAnswer:", 1)[0].strip()
+        answer = f"Stub answer to: {question} (prompt had {len(prompt)} characters)"
+        model = request.get("model", "stub")
+        completion_tokens = max(1, len(answer) // 4)
+
+        if request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for word in answer.split(" "):
+                chunk = {
+                    "id": f"stub-{n}", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(self.token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+            return
+
+        self._send_json(200, {
+            "id": f"stub-{n}", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+def start_stub_server(port: int = 0, latency: float = 0.0, token_delay: float = 0.0,
+                      rate_limit_every: int = 0, prompt_delay: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Start the stub in a daemon thread; returns the server (its base URL is http://127.0.0.1:<server_port>).
+    prompt_delay is added per 1000 prompt tokens (estimated as characters / 4).
+    """
+    handler = type("ConfiguredStubLLMHandler", (StubLLMHandler,), {
+        "latency": latency, "prompt_delay": prompt_delay, "token_delay": token_delay,
+        "rate_limit_every": rate_limit_every,
+        "_counter": itertools.count(1),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a deterministic stub of the Groq chat completions API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering.")
+    parser.add_argument("--prompt-delay", type=float, default=0.0, help="Extra seconds per 1000 prompt tokens.")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens.")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with HTTP 429.")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port, args.latency, args.token_delay, args.rate_limit_every, args.prompt_delay)
+    print(f"Stub LLM server listening on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
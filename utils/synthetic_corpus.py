@@ -0,0 +1,137 @@
+"""
+Synthetic judgment-like corpora for benchmarks: deterministic text with the structure
+of the files in text_files/ (header fields, HEADNOTE / JUDGMENT sections, numbered
+paragraphs citing sections and Acts) and file names in the same scheme, so metadata
+filters and year sharding work on them too.
+
+    python -m utils.synthetic_corpus /tmp/corpus_10k --docs 10000
+"""
+import argparse
+import os
+import random
+from typing import List
+
+ACTS = [
+    ("Indian Penal Code", [302, 304, 307, 376, 420, 498]),
+    ("Code of Criminal Procedure", [125, 161, 164, 313, 378, 439]),
+    ("Constitution of India", [14, 19, 21, 32, 136, 226]),
+    ("Land Acquisition Act", [4, 6, 18, 23, 28]),
+    ("Income Tax Act", [10, 37, 80, 143, 147, 263]),
+    ("Industrial Disputes Act", [2, 10, 11, 25, 33]),
+    ("Hindu Succession Act", [6, 8, 14, 15]),
+    ("Transfer of Property Act", [52, 53, 54, 106]),
+    ("Negotiable Instruments Act", [138, 139, 141]),
+    ("Arbitration and Conciliation Act", [7, 11, 34, 37]),
+]
+TOPICS = [
+    "anticipatory bail", "dying declaration", "compensation for acquired land", "seniority and promotion",
+    "eviction of the tenant", "dishonour of cheque", "maintenance of the wife", "reassessment of income",
+    "retrenchment of workmen", "partition of joint family property", "specific performance of the agreement",
+    "circumstantial evidence", "delay in filing the appeal", "arbitral award", "writ of mandamus",
+    "fundamental right to privacy", "custodial death", "reservation in public employment",
+]
+PARTIES = [
+    "State of Maharashtra", "Union of India", "State of Uttar Pradesh", "Ram Kumar", "Sunita Devi",
+    "M/s Hindustan Traders", "Commissioner of Income Tax", "Bharat Heavy Electricals Ltd.", "Mohd. Iqbal",
+    "State of Punjab", "Lakshmi Narayan", "Delhi Development Authority", "K. Subramanian", "Gurdev Singh",
+]
+JUDGES = ["A. K. Sikri", "R. Banumathi", "S. A. Bobde", "N. V. Ramana", "D. Y. Chandrachud", "U. U. Lalit",
+          "Indu Malhotra", "K. M. Joseph", "Hemant Gupta", "Sanjiv Khanna", "B. R. Gavai", "A. S. Bopanna"]
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+SENTENCES = [
+    "The {party} contended that the provisions of Section {section} of the {act} were not attracted.",
+    "Learned counsel for the appellant submitted that the High Court erred in its finding on {topic}.",
+    "We have carefully considered the submissions made on behalf of the parties and perused the record.",
+    "The question that arises for consideration is whether Section {section} of the {act} applies to {topic}.",
+    "In our considered opinion, the view taken by the trial court on {topic} cannot be sustained.",
+    "The evidence on record clearly establishes that the {party} acted within the statutory period.",
+    "It is well settled that the power under Section {section} of the {act} must be exercised judiciously.",
+    "The High Court rightly held that the claim regarding {topic} was barred by limitation.",
+    "There is no merit in the contention that the {party} was denied a reasonable opportunity of hearing.",
+    "The respondent relied upon the decision of this Court dealing with {topic} under the {act}.",
+    "The impugned order suffers from non-application of mind and is liable to be set aside.",
+    "Accordingly, the amount awarded shall carry interest at the rate of {rate} per cent per annum.",
+]
+QUERY_TEMPLATES = [
+    "What did the court hold on {topic}?",
+    "Whether Section {section} of the {act} applies to {topic}",
+    "Supreme Court judgment on {topic} under the {act}",
+    "When can the High Court interfere with a finding on {topic}?",
+    "Section {section} {act} {topic}",
+]
+
+
+def _fill(rng: random.Random, template: str) -> str:
+    act, sections = rng.choice(ACTS)
+    return template.format(
+        act=act, section=rng.choice(sections), topic=rng.choice(TOPICS), party=rng.choice(PARTIES),
+        rate=rng.choice([6, 8, 9, 12]),
+    )
+
+
+def synthetic_file_name(index: int, rng: random.Random) -> str:
+    """A name in one of the text_files/ schemes (supremecourt judgments and jonew judis files)."""
+    year = rng.randint(1950, 2023)
+    case = 1000 + index
+    if rng.random() < 0.5:
+        day, month = rng.randint(1, 28), rng.choice(MONTHS)
+        judgment_year = min(2024, year + rng.randint(0, 6))
+        return f"{case}-{year}___supremecourt__{year}__{case}__{case}_{year}_Judgement_{day:02d}-{month}-{judgment_year}.txt"
+    return f"{case}-{year}___jonew__judis__{10000 + index}.txt"
+
+
+def synthetic_judgment(rng: random.Random, paragraphs: int) -> str:
+    appellant, respondent = rng.sample(PARTIES, 2)
+    judges = rng.sample(JUDGES, 2)
+    lines = [
+        f"PETITIONER: {appellant}",
+        f"RESPONDENT: {respondent}",
+        f"DATE OF JUDGMENT: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1950, 2023)}",
+        f"BENCH: {judges[0]}, {judges[1]}",
+        "",
+        "HEADNOTE: " + " ".join(_fill(rng, rng.choice(SENTENCES)) for _ in range(3)),
+        "",
+        "J U D G M E N T",
+    ]
+    for number in range(1, paragraphs + 1):
+        body = " ".join(_fill(rng, rng.choice(SENTENCES)) for _ in range(rng.randint(3, 8)))
+        lines.append(f"{number}. {body}")
+    lines.append(f"{paragraphs + 1}. The appeal is accordingly {rng.choice(['allowed', 'dismissed'])}. No order as to costs.")
+    return "\n".join(lines) + "\n"
+
+
+def generate_corpus(out_dir: str, n_docs: int, seed: int = 0, paragraphs: int = 12) -> List[str]:
+    """
+    Write n_docs synthetic judgments to out_dir (reusing files already written by an
+    earlier run with the same arguments) and return their names. Paragraph counts
+    vary around `paragraphs` (about 550 characters each).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    names = []
+    for index in range(n_docs):
+        rng = random.Random(f"{seed}:{index}")
+        name = synthetic_file_name(index, rng)
+        names.append(name)
+        path = os.path.join(out_dir, name)
+        if os.path.exists(path):
+            continue
+        text = synthetic_judgment(rng, max(1, int(rng.gauss(paragraphs, paragraphs / 4))))
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    return names
+
+
+def synthetic_queries(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [_fill(rng, rng.choice(QUERY_TEMPLATES)) for _ in range(n)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic judgment corpus.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--paragraphs", type=int, default=12, help="Mean numbered paragraphs per judgment.")
+    args = parser.parse_args()
+    generate_corpus(args.out_dir, args.docs, args.seed, args.paragraphs)
+    print(f"Wrote {args.docs} synthetic judgments to {args.out_dir}")
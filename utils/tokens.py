@@ -0,0 +1,14 @@
+import math
+import re
+
+# Llama-3 style BPE tokenizers average roughly 4 characters per token on English legal text;
+# punctuation, numbers and citations ("(2019) 5 SCC 1") tokenize denser, so they are counted separately.
+_DENSE_RE = re.compile(r"[0-9]+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for budgeting and tracing; no tokenizer download needed."""
+    if not text:
+        return 0
+    dense = len(_DENSE_RE.findall(text))
+    return int(math.ceil((len(text) - dense) / 4.0)) + dense
@@ -0,0 +1,191 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import TRACING_ENABLED, TRACE_LOG_PATH, TRACE_STATS_WINDOW
+
+
+class Trace:
+    """Timing spans and attributes (token counts, context size, ...) of one request."""
+
+    def __init__(self, name: str, **attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.total_ms: Optional[float] = None
+        self.attrs: Dict[str, Any] = dict(attrs)
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, start: float, end: float, **attrs) -> None:
+        """Record a span from perf_counter() timestamps."""
+        span = {"name": name, "start_ms": (start - self._t0) * 1000.0, "duration_ms": (end - start) * 1000.0}
+        if attrs:
+            span.update(attrs)
+        with self._lock:
+            self.spans.append(span)
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def finish(self) -> None:
+        self.total_ms = (time.perf_counter() - self._t0) * 1000.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_ms": self.total_ms,
+            "attrs": self.attrs,
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_log_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stage_durations: Dict[str, deque] = defaultdict(lambda: deque(maxlen=TRACE_STATS_WINDOW))
+_recent: deque = deque(maxlen=50)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("trace", "name", "attrs", "start")
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.add_span(self.name, self.start, time.perf_counter(), **self.attrs)
+        return False
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+def span(name: str, trace: Optional[Trace] = None, **attrs):
+    """
+    Time a stage of the current request: `with span("faiss_search", k=5): ...`.
+    Outside an active trace this returns a shared no-op object, so instrumented code
+    costs one context-variable lookup when tracing is off.
+    """
+    trace = trace or _current.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name, attrs)
+
+
+def annotate(**attrs) -> None:
+    """Attach attributes (token counts, context size, ...) to the current trace, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.set(**attrs)
+
+
+class trace_request:
+    """
+    Context manager opening a trace for one request. Does nothing unless tracing is
+    enabled (TRACING_ENABLED, or enabled=True for this request). On exit the trace is
+    appended to TRACE_LOG_PATH as one JSON line and folded into the rolling per-stage stats.
+    """
+
+    def __init__(self, name: str, enabled: Optional[bool] = None, **attrs):
+        self.enabled = TRACING_ENABLED if enabled is None else enabled
+        self.name = name
+        self.attrs = attrs
+        self.trace: Optional[Trace] = None
+        self._token = None
+
+    def __enter__(self) -> Optional[Trace]:
+        if not self.enabled:
+            return None
+        self.trace = Trace(self.name, **self.attrs)
+        self._token = _current.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is None:
+            return False
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.trace.set(error=f"{exc_type.__name__}: {exc}")
+        self.trace.finish()
+        record_trace(self.trace)
+        return False
+
+
+def record_trace(trace: Trace) -> None:
+    data = trace.to_dict()
+    with _stats_lock:
+        for s in data["spans"]:
+            _stage_durations[s["name"]].append(s["duration_ms"])
+        _stage_durations["total"].append(data["total_ms"])
+        _recent.append(data)
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(TRACE_LOG_PATH)), exist_ok=True)
+        line = json.dumps(data, ensure_ascii=False, default=str)
+        with _log_lock, open(TRACE_LOG_PATH, "a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+    except Exception as e:
+        print(f"Could not write trace log: {e}")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def stage_percentiles() -> Dict[str, Dict[str, float]]:
+    """Rolling p50/p95 (ms) per stage over the last TRACE_STATS_WINDOW traces of this process."""
+    with _stats_lock:
+        snapshot = {name: list(values) for name, values in _stage_durations.items()}
+    return {
+        name: {"count": len(values), "p50_ms": _percentile(values, 50), "p95_ms": _percentile(values, 95)}
+        for name, values in snapshot.items() if values
+    }
+
+
+def recent_traces(n: int = 10) -> List[Dict[str, Any]]:
+    with _stats_lock:
+        return list(_recent)[-n:]
@@ -1,121 +1,478 @@
+import hashlib
+import json
 import os
 import sys
+import time
 import traceback
-from typing import List
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 
-try:
-    from langchain_community.vectorstores import FAISS
-except Exception:
-    try:
-        from langchain.vectorstores import FAISS
-    except Exception:
-        FAISS = None  
+from utils.lazy_import import LazyImport
 
+# LangChain and FAISS are imported on first use, so importing this module (and the app) stays cheap
+FAISS = LazyImport(
+    "langchain_community.vectorstores:FAISS", "langchain.vectorstores:FAISS",
+    error="FAISS import failed. Install 'langchain-community' or a compatible 'langchain' package. "
+          "On some platforms you may need a different FAISS build or to prebuild the vectorstore locally.",
+)
+InMemoryDocstore = LazyImport(
+    "langchain_community.docstore.in_memory:InMemoryDocstore", "langchain.docstore.in_memory:InMemoryDocstore",
+)
+faiss = LazyImport("faiss", error="faiss is not installed. Install 'faiss-cpu'.")
+Document = LazyImport(
+    "langchain_core.documents:Document", "langchain.docstore.document:Document",
+    error="Document class import failed. Install a compatible LangChain package (langchain-core or langchain).",
+)
 
-try:
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
-except Exception:
-    try:
-        from langchain.text_splitter import RecursiveCharacterTextSplitter
-    except Exception:
-        RecursiveCharacterTextSplitter = None  
+from config.config import (
+    TEXT_DIR, VECTOR_DB_DIR, CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER, TOP_K_RESULTS, EMBEDDING_MODEL, FAISS_INDEX_TYPE,
+    EMBEDDING_MIN_AGREEMENT, VECTOR_STORAGE,
+)
+from models.embeddings import get_embeddings, embedding_backend_id, embedding_probe, probe_agreement
+from utils.ingestion import IngestionPipeline
+from utils.lexical_index import build_lexical_index, lexical_index_exists
+from utils.metadata_index import build_metadata_index, metadata_index_exists, parse_filename_metadata
+from utils.ann_index import (
+    ann_params, save_ann_index, load_ann_index, read_ann_info, save_compact_index, load_compact_index,
+    read_compact_info,
+)
+from utils.chunk_store import (
+    PICKLE_DOCSTORE_FILE, ChunkStore, MmapDocstore, RowIds, chunk_store_exists, iter_docstore_rows,
+    load_pickle_docstore, write_chunk_store,
+)
 
+# Written last on every save; readers reload only when its contents change
+INDEX_VERSION_FILE = "index_version.json"
+# Per-file content hashes and chunk ids of what is in the index, used for incremental builds
+MANIFEST_FILE = "manifest.json"
+# Exact (flat) FAISS index, same file name FAISS.save_local uses
+EXACT_INDEX_FILE = "index.faiss"
 
-try:
-    
-    from langchain_core.documents import Document
-except Exception:
-    try:
-        from langchain.docstore.document import Document
-    except Exception:
-        Document = None  
 
-from config.config import TEXT_DIR, VECTOR_DB_DIR, CHUNK_SIZE, CHUNK_OVERLAP, TOP_K_RESULTS
-from models.embeddings import get_embeddings  
+def _read_text_file(file_path: str) -> str:
+    with open(file_path, "r", encoding="utf-8", errors="replace") as fh:
+        return fh.read().strip()
 
-if FAISS is None:
-    raise ImportError(
-        "FAISS import failed. Install 'langchain-community' or a compatible 'langchain' package. "
-        "On some platforms you may need a different FAISS build or to prebuild the vectorstore locally."
-    )
 
-if RecursiveCharacterTextSplitter is None:
-    raise ImportError(
-        "RecursiveCharacterTextSplitter import failed. Install 'langchain-text-splitters' or a compatible langchain package."
-    )
+def iter_text_files() -> Iterator[Document]:
+    """Lazily yield one LangChain Document per non-empty .txt file in TEXT_DIR."""
+    if not os.path.exists(TEXT_DIR):
+        raise FileNotFoundError(f"TEXT_DIR does not exist: {TEXT_DIR}")
 
-if Document is None:
-    raise ImportError(
-        "Document class import failed. Install a compatible LangChain package (langchain-core or langchain)."
-    )
+    text_files = [f for f in os.listdir(TEXT_DIR) if f.lower().endswith(".txt")]
+    print(f"Found {len(text_files)} text files in {TEXT_DIR}")
+
+    for text_file in text_files:
+        file_path = os.path.join(TEXT_DIR, text_file)
+        try:
+            text = _read_text_file(file_path)
+            if not text:
+                print(f"Skipping empty file: {text_file}")
+                continue
+        except Exception as e:
+            print(f"Error reading {text_file}: {e}")
+            traceback.print_exc()
+            continue
+        yield Document(page_content=text, metadata=dict(parse_filename_metadata(text_file), source=text_file))
 
 
 def load_text_files() -> List[Document]:
     """Load all .txt files from TEXT_DIR and return a list of LangChain Documents."""
-    docs: List[Document] = []
+    return list(iter_text_files())
+
+
+def _file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _manifest_settings() -> Dict[str, Any]:
+    """Settings that, when changed, invalidate every stored vector."""
+    return {
+        "embedding_model": EMBEDDING_MODEL,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "chunker": CHUNKER,
+    }
+
+
+def _recorded_settings(manifest: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Manifest settings; stores built before CHUNKER existed were split by the recursive splitter."""
+    settings = manifest.get("settings")
+    if settings is None:
+        return None
+    return dict({"chunker": "recursive"}, **settings)
 
+
+def embedding_reindex_reason(manifest: Optional[Dict[str, Any]]) -> str:
+    """
+    Why the vectors of the configured embedding backend cannot be mixed with the ones
+    recorded in the manifest ("" if they can). A different backend is accepted when it
+    embeds the stored probe texts with cosine >= EMBEDDING_MIN_AGREEMENT; stores built
+    before probes were recorded were built with the fp32 torch backend.
+    """
+    recorded = (manifest or {}).get("embedding") or {"backend": "torch"}
+    current = embedding_backend_id()
+    if recorded.get("backend") == current:
+        return ""
+    if not recorded.get("probe"):
+        return f"index was built with the {recorded['backend']} embedding backend and has no probe vectors to compare with {current}"
+    agreement = probe_agreement(recorded["probe"])
+    if agreement < EMBEDDING_MIN_AGREEMENT:
+        return (f"embedding backend changed ({recorded['backend']} -> {current}, "
+                f"cosine agreement {agreement:.4f} < {EMBEDDING_MIN_AGREEMENT})")
+    return ""
+
+
+def load_manifest(store_dir: str = VECTOR_DB_DIR) -> Optional[Dict[str, Any]]:
+    """Return the build manifest stored next to the index, or None if there is none."""
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable manifest {path}: {e}")
+        return None
+
+
+def _save_manifest(manifest: Dict[str, Any], store_dir: str = VECTOR_DB_DIR) -> None:
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def plan_vector_store_update(full: bool = False, store_dir: str = VECTOR_DB_DIR,
+                             select: Optional[Callable[[str], bool]] = None) -> Dict[str, Any]:
+    """
+    Compare TEXT_DIR with the manifest of store_dir and decide what a build has to do.
+    `select` restricts the plan to the file names it accepts (one shard of the corpus).
+
+    Files whose size and mtime match the manifest reuse the recorded hash; everything
+    else is re-hashed, so a touched-but-identical file is still treated as unchanged.
+    Returns {"full": bool, "reason": str, "added": [...], "changed": [...],
+    "removed": [...], "unchanged": [...], "files": {name: {"sha256", "size", "mtime_ns"}}}.
+    """
     if not os.path.exists(TEXT_DIR):
         raise FileNotFoundError(f"TEXT_DIR does not exist: {TEXT_DIR}")
 
-    text_files = [f for f in os.listdir(TEXT_DIR) if f.lower().endswith(".txt")]
-    print(f"Found {len(text_files)} text files in {TEXT_DIR}")
+    manifest = load_manifest(store_dir)
+    reason = ""
+    if full:
+        reason = "full rebuild requested"
+    elif manifest is None:
+        reason = "no manifest found"
+    elif _recorded_settings(manifest) != _manifest_settings():
+        reason = "embedding model or chunking settings changed"
+    elif not os.path.exists(os.path.join(store_dir, EXACT_INDEX_FILE)):
+        reason = "index files missing"
+    else:
+        reason = embedding_reindex_reason(manifest)
+    full = bool(reason)
+    previous = {} if full else manifest.get("files", {})
 
+    plan: Dict[str, Any] = {
+        "full": full, "reason": reason,
+        "added": [], "changed": [], "removed": [], "unchanged": [], "files": {},
+    }
+    text_files = sorted(
+        f for f in os.listdir(TEXT_DIR) if f.lower().endswith(".txt") and (select is None or select(f))
+    )
     for text_file in text_files:
         file_path = os.path.join(TEXT_DIR, text_file)
         try:
-            with open(file_path, "r", encoding="utf-8", errors="replace") as fh:
-                text = fh.read().strip()
-                if not text:
-                    print(f"Skipping empty file: {text_file}")
-                    continue
-                docs.append(Document(page_content=text, metadata={"source": text_file}))
-        except Exception as e:
+            st = os.stat(file_path)
+            old = previous.get(text_file)
+            if old and old.get("size") == st.st_size and old.get("mtime_ns") == st.st_mtime_ns:
+                sha = old["sha256"]
+            else:
+                sha = _file_sha256(file_path)
+        except OSError as e:
             print(f"Error reading {text_file}: {e}")
-            traceback.print_exc()
+            continue
 
-    return docs
+        plan["files"][text_file] = {"sha256": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        if text_file not in previous:
+            plan["added"].append(text_file)
+        elif previous[text_file].get("sha256") != sha:
+            plan["changed"].append(text_file)
+        else:
+            plan["unchanged"].append(text_file)
 
+    plan["removed"] = sorted(set(previous) - set(plan["files"]))
+    return plan
 
-def create_vector_store() -> FAISS:
+
+def format_update_plan(plan: Dict[str, Any]) -> str:
+    """Human-readable summary of a plan returned by plan_vector_store_update()."""
+    lines = []
+    if plan["full"]:
+        lines.append(f"Full rebuild ({plan['reason']}): {len(plan['files'])} files will be embedded")
+    else:
+        lines.append(
+            f"Incremental update: {len(plan['added'])} added, {len(plan['changed'])} changed, "
+            f"{len(plan['removed'])} removed, {len(plan['unchanged'])} unchanged"
+        )
+        for label in ("added", "changed", "removed"):
+            for name in plan[label]:
+                lines.append(f"  {label:<8} {name}")
+    return "\n".join(lines)
+
+
+def create_vector_store(full: bool = False, store_dir: str = VECTOR_DB_DIR,
+                        select: Optional[Callable[[str], bool]] = None) -> FAISS:
     """
-    Create a FAISS vector store from all text files in TEXT_DIR.
-    Saves the vector store locally at VECTOR_DB_DIR.
+    Create or incrementally update the FAISS vector store for the text files in TEXT_DIR.
+
+    A manifest of per-file content hashes and chunk ids is kept next to the index in
+    VECTOR_DB_DIR. Only new or changed files are split and embedded; vectors of removed
+    or changed files are deleted and everything else is kept. Pass full=True (or change
+    the embedding model / chunking settings) to rebuild from scratch.
+
+    Files are streamed through IngestionPipeline: split in a process pool, embedded in
+    EMBED_BATCH_SIZE batches and added to the index batch by batch.
+
+    store_dir and select build one shard: the subset of TEXT_DIR accepted by select,
+    stored as a complete, independently loadable store in store_dir.
     """
-    documents = load_text_files()
+    plan = plan_vector_store_update(full=full, store_dir=store_dir, select=select)
+    print(format_update_plan(plan))
 
-    if not documents:
+    if not plan["files"]:
         raise ValueError("No documents found to process. Please add .txt files to TEXT_DIR.")
 
-    print(f"Splitting {len(documents)} documents into chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    chunks = text_splitter.split_documents(documents)
-    print(f"Created {len(chunks)} chunks from documents")
+    embeddings = get_embeddings()
+    if not plan["full"] and not (plan["added"] or plan["changed"] or plan["removed"]):
+        print("Vector store is up to date; nothing to embed.")
+        vectorstore = load_vector_store(embeddings=embeddings, exact=True, store_dir=store_dir)
+        if _save_missing_sidecars(vectorstore, store_dir):
+            write_index_version(store_dir)
+        return vectorstore
+
+    manifest = {"settings": _manifest_settings(), "files": {}} if plan["full"] else load_manifest(store_dir)
+    if not (manifest.get("embedding") or {}).get("probe"):
+        # Backend whose vectors the index holds, checked by embedding_reindex_reason()
+        manifest["embedding"] = {"backend": embedding_backend_id(), "probe": embedding_probe(embeddings)}
+    to_embed = plan["files"].keys() if plan["full"] else plan["added"] + plan["changed"]
 
-    print("Creating embeddings...")
-    embeddings = get_embeddings()  
-    vectorstore = FAISS.from_documents(chunks, embeddings)
+    vectorstore = None
+    if not plan["full"]:
+        vectorstore = load_vector_store(embeddings=embeddings, exact=True, writable=True, store_dir=store_dir)
+        stale_ids = []
+        for text_file in plan["changed"] + plan["removed"]:
+            stale_ids.extend(manifest["files"].pop(text_file, {}).get("chunk_ids", []))
+        if stale_ids:
+            print(f"Deleting {len(stale_ids)} stale chunks...")
+            vectorstore.delete(stale_ids)
+
+    files = [(name, plan["files"][name]["sha256"], plan["files"][name]["size"]) for name in to_embed]
+    for name, _, _ in files:
+        manifest["files"][name] = dict(plan["files"][name], chunk_ids=[])
+    pipeline = IngestionPipeline(files, embeddings)
+    if files:
+        print(f"Splitting and embedding {len(files)} documents...")
+    for texts, vectors, metadatas, ids in (pipeline.batches() if files else []):
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas, ids=ids)
+        else:
+            vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+        for metadata in metadatas:
+            manifest["files"][metadata["source"]]["chunk_ids"].append(metadata["chunk_id"])
+    # Failed files stay out of the manifest so the next build retries them
+    for name in pipeline.failed_files:
+        manifest["files"].pop(name, None)
+
+    if vectorstore is None:
+        raise ValueError("No documents found to process. Please add .txt files to TEXT_DIR.")
 
-    os.makedirs(VECTOR_DB_DIR, exist_ok=True)
-    vectorstore.save_local(VECTOR_DB_DIR)
-    print(f"Vector store saved to: {VECTOR_DB_DIR}")
+    save_vector_store(vectorstore, store_dir)
+    _save_lexical_index(vectorstore, store_dir)
+    _save_metadata_index(vectorstore, store_dir)
+    save_ann_index(vectorstore.index, store_dir, FAISS_INDEX_TYPE)
+    save_compact_index(vectorstore.index, store_dir, VECTOR_STORAGE)
+    _save_manifest(manifest, store_dir)
+    write_index_version(store_dir)
+    print(f"Vector store saved to: {store_dir} ({vectorstore.index.ntotal} vectors)")
     return vectorstore
 
 
-def load_vector_store() -> FAISS:
-    """Load an existing FAISS vector store from VECTOR_DB_DIR."""
-    if not os.path.exists(VECTOR_DB_DIR):
-        raise FileNotFoundError(f"Vector store not found at {VECTOR_DB_DIR}. Run create_vector_store() first.")
+def save_vector_store(vectorstore: FAISS, store_dir: str = VECTOR_DB_DIR) -> None:
+    """
+    Write the exact FAISS index and the memory-mapped chunk store. This replaces
+    FAISS.save_local, whose index.pkl must be unpickled in full by every process on load;
+    a leftover index.pkl from an older build is removed.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    index_path = os.path.join(store_dir, EXACT_INDEX_FILE)
+    faiss.write_index(vectorstore.index, index_path + ".tmp")
+    os.replace(index_path + ".tmp", index_path)
+    write_chunk_store(iter_docstore_rows(vectorstore.docstore, vectorstore.index_to_docstore_id), store_dir)
+    pickle_path = os.path.join(store_dir, PICKLE_DOCSTORE_FILE)
+    if os.path.exists(pickle_path):
+        os.remove(pickle_path)
+
+
+def iter_texts_in_row_order(vectorstore: FAISS) -> Iterator[str]:
+    """Yield chunk texts in FAISS row order, the ordinal space shared by the sidecar indexes."""
+    for position in range(vectorstore.index.ntotal):
+        doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+        yield getattr(doc, "page_content", "")
+
+
+def iter_sources_in_row_order(vectorstore: FAISS) -> Iterator[str]:
+    """Yield each chunk's source file name in FAISS row order."""
+    for position in range(vectorstore.index.ntotal):
+        doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+        yield (getattr(doc, "metadata", None) or {}).get("source", "")
+
+
+def _save_lexical_index(vectorstore: FAISS, store_dir: str = VECTOR_DB_DIR) -> None:
+    # Rebuilt from the docstore on every save: tokenizing is cheap next to embedding
+    n_docs = build_lexical_index(iter_texts_in_row_order(vectorstore), store_dir)
+    print(f"BM25 index saved ({n_docs} chunks)")
+
+
+def _save_metadata_index(vectorstore: FAISS, store_dir: str = VECTOR_DB_DIR) -> None:
+    # Fields are parsed from file names, so this is rebuilt on every save as well
+    n_docs = build_metadata_index(iter_sources_in_row_order(vectorstore), store_dir)
+    print(f"Metadata index saved ({n_docs} chunks)")
+
+
+def _save_missing_sidecars(vectorstore: FAISS, store_dir: str = VECTOR_DB_DIR) -> bool:
+    """
+    Create sidecar indexes an up-to-date store lacks, or rebuild them when their settings
+    changed (FAISS_INDEX_TYPE or its build parameters, VECTOR_STORAGE).
+    """
+    changed = False
+    if not chunk_store_exists(store_dir):
+        save_vector_store(vectorstore, store_dir)
+        print(f"Converted the pickled docstore to a chunk store ({vectorstore.index.ntotal} chunks)")
+        changed = True
+    if not lexical_index_exists(store_dir):
+        _save_lexical_index(vectorstore, store_dir)
+        changed = True
+    if not metadata_index_exists(store_dir):
+        _save_metadata_index(vectorstore, store_dir)
+        changed = True
+    ann_info = read_ann_info(store_dir)
+    # IVF_NLIST, PQ_M, HNSW_M, ... count as well as the index type
+    if (ann_info["params"] if ann_info else {"type": "flat"}) != ann_params(FAISS_INDEX_TYPE, vectorstore.index.ntotal):
+        save_ann_index(vectorstore.index, store_dir, FAISS_INDEX_TYPE)
+        changed = True
+    compact_info = read_compact_info(store_dir)
+    if (compact_info or {}).get("storage", "float32") != VECTOR_STORAGE:
+        save_compact_index(vectorstore.index, store_dir, VECTOR_STORAGE)
+        changed = True
+    return changed
+
+
+def write_index_version(store_dir: str = VECTOR_DB_DIR) -> str:
+    """Stamp store_dir with a fresh version marker and return the new version."""
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    marker = os.path.join(store_dir, INDEX_VERSION_FILE)
+    tmp_path = marker + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump({"version": version, "created_at": time.time()}, fh)
+    os.replace(tmp_path, marker)
+    return version
+
+
+def read_index_version(store_dir: str = VECTOR_DB_DIR) -> str:
+    """
+    Return the version of the index in store_dir without loading it.
+    Stores saved before the marker existed fall back to the mtimes/sizes of the FAISS files.
+    """
+    marker = os.path.join(store_dir, INDEX_VERSION_FILE)
+    try:
+        with open(marker, "r", encoding="utf-8") as fh:
+            version = json.load(fh).get("version")
+        if version:
+            return str(version)
+    except (OSError, ValueError):
+        pass
+
+    parts = []
+    for name in (EXACT_INDEX_FILE, PICKLE_DOCSTORE_FILE):
+        try:
+            st = os.stat(os.path.join(store_dir, name))
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append("missing")
+    return "mtime-" + "-".join(parts)
+
+
+def _load_docstore(store_dir: str, writable: bool):
+    """
+    (docstore, index_to_docstore_id) for store_dir. Serving uses the memory-mapped chunk
+    store; writable=True (incremental builds, which delete and add chunks) materializes it
+    into an InMemoryDocstore. Stores that still have only index.pkl are read from the pickle.
+    """
+    if chunk_store_exists(store_dir):
+        chunks = ChunkStore(store_dir)
+        if not writable:
+            return MmapDocstore(chunks), RowIds(len(chunks))
+        docs = {}
+        index_to_docstore_id = {}
+        for row, (doc_id, text, metadata) in enumerate(chunks.iter_rows()):
+            docs[doc_id] = Document(page_content=text, metadata=metadata)
+            index_to_docstore_id[row] = doc_id
+        return InMemoryDocstore(docs), index_to_docstore_id
+
+    if not os.path.exists(os.path.join(store_dir, PICKLE_DOCSTORE_FILE)):
+        raise FileNotFoundError(f"No chunk store or index.pkl in {store_dir}. Run create_vector_store() first.")
+    print(f"{store_dir} still uses a pickled docstore; run convert_chunk_store.py to convert it.")
+    return load_pickle_docstore(store_dir)
+
+
+def load_vector_store(embeddings=None, exact: bool = False, writable: bool = False,
+                      store_dir: str = VECTOR_DB_DIR) -> FAISS:
+    """
+    Load an existing FAISS vector store from store_dir (default VECTOR_DB_DIR).
+    Uses the approximate index selected by FAISS_INDEX_TYPE when one was built,
+    unless exact=True (index builds and recall measurements need the flat index).
+    Chunk texts stay on disk (memory-mapped) and are read only for returned results,
+    unless writable=True asks for an in-memory docstore that can be modified.
+    With VECTOR_STORAGE float16 / int8 (and a flat FAISS_INDEX_TYPE) the vectors stay on
+    disk too: a RescoringIndex scans the compact codes and re-ranks at float32.
+    """
+    if not os.path.exists(store_dir):
+        raise FileNotFoundError(f"Vector store not found at {store_dir}. Run create_vector_store() first.")
+
+    if embeddings is None:
+        embeddings = get_embeddings()
+    index = None if exact else load_ann_index(store_dir, FAISS_INDEX_TYPE)
+    if index is None and not exact:
+        index = load_compact_index(store_dir, os.path.join(store_dir, EXACT_INDEX_FILE), VECTOR_STORAGE)
+    if index is None:
+        index = faiss.read_index(os.path.join(store_dir, EXACT_INDEX_FILE))
+    docstore, index_to_docstore_id = _load_docstore(store_dir, writable)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def query_vector_store(query: str, top_k: int = TOP_K_RESULTS, mode: Optional[str] = None,
+                       filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+    """
+    Query the resident vector store and return top_k relevant Documents ("dense" or "hybrid" mode),
+    optionally restricted by metadata filters such as {"year_from": 2016, "collections": ["supremecourt"]}.
+    """
+    from utils.retrieval_engine import get_retrieval_engine
+
+    return get_retrieval_engine().search(query, k=top_k, mode=mode, filters=filters)
 
-    embeddings = get_embeddings()
-    return FAISS.load_local(VECTOR_DB_DIR, embeddings, allow_dangerous_deserialization=True)
 
+def query_vector_store_batch(queries: List[str], top_k: int = TOP_K_RESULTS,
+                             filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[Document, float]]]:
+    """Dense retrieval for a list of queries in one embedding pass and one FAISS search: per query, (Document, distance) pairs."""
+    from utils.retrieval_engine import get_retrieval_engine
 
-def query_vector_store(query: str, top_k: int = TOP_K_RESULTS) -> List[Document]:
-    """Query the vector store and return top_k relevant Documents."""
-    vectorstore = load_vector_store()
-    results = vectorstore.similarity_search(query, k=top_k)
-    return results
+    return get_retrieval_engine().search_batch(queries, k=top_k, filters=filters)
@@ -1,17 +1,197 @@
-from duckduckgo_search import DDGS
-
-def search_web(query, max_results=3):
-    try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(f"{query} Indian Supreme Court recent", max_results=max_results))
-        formatted = []
-        for r in results:
-            formatted.append({
-                "title": r.get("title") or "",
-                "snippet": r.get("body") or r.get("snippet") or "",
-                "url": r.get("href") or r.get("url") or ""
-            })
-        return formatted
-    except Exception as e:
-        print(f"Web search error: {e}")
-        return [{"error": str(e)}]
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import (
+    WEB_SEARCH_MAX_RESULTS, WEB_SEARCH_TIMEOUT_SECONDS, WEB_SEARCH_WORKERS, WEB_SEARCH_BACKEND, WEB_SEARCH_URL,
+    WEB_SEARCH_CACHE_TTL_SECONDS, WEB_SEARCH_CACHE_MAX_ENTRIES, WEB_SEARCH_NEGATIVE_TTL_SECONDS,
+)
+from utils.answer_cache import normalize_query
+from utils.tracing import span
+
+# Web searches run here so they overlap retrieval and generation of the same question
+_pool = ThreadPoolExecutor(max_workers=WEB_SEARCH_WORKERS, thread_name_prefix="web_search")
+
+
+def _duckduckgo_backend(query: str, max_results: int) -> List[Dict[str, str]]:
+    from duckduckgo_search import DDGS
+
+    with DDGS() as ddgs:
+        results = list(ddgs.text(f"{query} Indian Supreme Court recent", max_results=max_results))
+    formatted = []
+    for r in results:
+        formatted.append({
+            "title": r.get("title") or "",
+            "snippet": r.get("body") or r.get("snippet") or "",
+            "url": r.get("href") or r.get("url") or ""
+        })
+    return formatted
+
+
+def _http_backend(query: str, max_results: int) -> List[Dict[str, str]]:
+    """GET WEB_SEARCH_URL?q=...&max_results=N returning {"results": [{"title", "snippet", "url"}]}."""
+    if not WEB_SEARCH_URL:
+        raise ValueError("WEB_SEARCH_BACKEND=http needs WEB_SEARCH_URL")
+    url = f"{WEB_SEARCH_URL}?{urllib.parse.urlencode({'q': query, 'max_results': max_results})}"
+    with urllib.request.urlopen(url, timeout=WEB_SEARCH_TIMEOUT_SECONDS) as response:
+        payload = json.loads(response.read())
+    return [
+        {"title": r.get("title") or "", "snippet": r.get("snippet") or r.get("body") or "", "url": r.get("url") or ""}
+        for r in payload.get("results", [])[:max_results]
+    ]
+
+
+# name -> callable(query, max_results) returning [{"title", "snippet", "url"}] or raising
+SEARCH_BACKENDS: Dict[str, Callable[[str, int], List[Dict[str, str]]]] = {
+    "duckduckgo": _duckduckgo_backend,
+    "http": _http_backend,
+}
+
+
+def register_search_backend(name: str, backend: Callable[[str, int], List[Dict[str, str]]]) -> None:
+    """Make a search backend selectable by name (WEB_SEARCH_BACKEND or search_web(backend=...))."""
+    SEARCH_BACKENDS[name] = backend
+
+
+class _Flight:
+    __slots__ = ("event", "results", "status")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.results: List[Dict[str, Any]] = []
+        self.status = "miss"
+
+
+class WebSearchCache:
+    """
+    In-process results cache for search_web: entries live `ttl` seconds, failures are
+    remembered for `negative_ttl` seconds (so a rate-limited backend is not hammered),
+    and the least recently used entries are evicted beyond `max_entries`. Concurrent
+    lookups of a key that is being fetched wait for that one request (single flight), for
+    at most `timeout` seconds; a follower that times out reports a failed search.
+    """
+
+    def __init__(self, ttl: float = WEB_SEARCH_CACHE_TTL_SECONDS, negative_ttl: float = WEB_SEARCH_NEGATIVE_TTL_SECONDS,
+                 max_entries: int = WEB_SEARCH_CACHE_MAX_ENTRIES, timeout: float = WEB_SEARCH_TIMEOUT_SECONDS):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # key -> (expires_at, results, failed)
+        self._entries: "OrderedDict[Tuple, Tuple[float, List[Dict[str, Any]], bool]]" = OrderedDict()
+        self._inflight: Dict[Tuple, _Flight] = {}
+
+    def get_or_fetch(self, key: Tuple, fetch: Callable[[], List[Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], str]:
+        """(results, status); status is "hit", "negative" (cached failure), "shared" (joined a flight), "miss" or "error"."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return list(entry[1]), "negative" if entry[2] else "hit"
+                del self._entries[key]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            if not flight.event.wait(self.timeout):
+                return [{"error": f"Web search timed out after {self.timeout:g}s"}], "error"
+            return list(flight.results), "shared"
+
+        try:
+            try:
+                results, failed = fetch(), False
+            except Exception as e:
+                print(f"Web search error: {e}")
+                results, failed = [{"error": str(e)}], True
+            flight.results, flight.status = results, "error" if failed else "miss"
+            ttl = self.negative_ttl if failed else self.ttl
+            with self._lock:
+                if ttl > 0:
+                    self._entries[key] = (time.monotonic() + ttl, results, failed)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return list(results), flight.status
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache = WebSearchCache()
+
+
+def search_web(query, max_results=3, backend: Optional[str] = None):
+    """
+    [{"title", "snippet", "url"}] for query, or [{"error": ...}] when the search failed.
+    Results come from the shared WebSearchCache when the same (normalized) query was
+    searched recently; identical searches running at the same time share one request.
+    """
+    backend = backend or WEB_SEARCH_BACKEND
+    search = SEARCH_BACKENDS.get(backend)
+    if search is None:
+        return [{"error": f"Unknown web search backend {backend!r}"}]
+    key = (backend, normalize_query(query), max_results)
+    with span("web_search", max_results=max_results, backend=backend) as search_span:
+        results, status = _cache.get_or_fetch(key, lambda: search(query, max_results))
+        search_span.set(cache=status)
+    return results
+
+
+def clear_web_search_cache() -> None:
+    _cache.clear()
+
+
+class WebSearchTask:
+    """
+    A search_web() call running in the background. results() waits at most until
+    `timeout` seconds after the search started; a search still running then is
+    reported as [{"error": ...}] (same shape as a failed search) and left to finish.
+    """
+
+    def __init__(self, query: str, max_results: int = WEB_SEARCH_MAX_RESULTS,
+                 timeout: float = WEB_SEARCH_TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self.started = time.perf_counter()
+        # Copy the context so the web_search span lands in the caller's trace
+        self._future = _pool.submit(contextvars.copy_context().run, search_web, query, max_results)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def results(self, wait: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Results if they are ready within `wait` seconds (and within the timeout)."""
+        remaining = self.timeout - self.elapsed()
+        wait = remaining if wait is None else min(wait, remaining)
+        try:
+            return self._future.result(timeout=max(0.0, wait))
+        except FutureTimeoutError:
+            return [{"error": f"no results after {self.elapsed():.1f}s"}]
+
+
+def start_web_search(query: str, max_results: int = WEB_SEARCH_MAX_RESULTS) -> WebSearchTask:
+    return WebSearchTask(query, max_results)
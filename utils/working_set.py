@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import WORKING_SET_MAX_CHUNKS, WORKING_SET_MIN_SCORE
+from utils.metadata_index import normalize_filters
+
+
+def _chunk_key(doc: Any) -> str:
+    return getattr(doc, "metadata", {}).get("chunk_id") or getattr(doc, "page_content", str(doc))
+
+
+def _filters_key(filters: Optional[Dict[str, Any]]) -> str:
+    return json.dumps(normalize_filters(filters) or {}, sort_keys=True)
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector, axis=-1, keepdims=True) + 1e-12)
+
+
+class RetrievalWorkingSet:
+    """
+    Chunks retrieved for the earlier questions of one chat session, with their embeddings.
+
+    A follow-up question ("what did the court say about bail in that case?") is first
+    re-ranked against this set by cosine similarity; when its best chunk scores at least
+    `min_score` the matching chunks answer it without a global search. Chunks are kept
+    with the metadata filters they were retrieved under, so a question is only served
+    from chunks that matched its own filters. At most `max_chunks` are kept, the least
+    recently used going first. The set belongs to one index version and empties itself
+    when the index changes.
+    """
+
+    def __init__(self, max_chunks: int = WORKING_SET_MAX_CHUNKS, min_score: float = WORKING_SET_MIN_SCORE):
+        self.max_chunks = max_chunks
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        # chunk key -> (Document, unit-norm embedding, filters keys), least recently used first
+        self._chunks: "OrderedDict[str, Tuple[Any, np.ndarray, Set[str]]]" = OrderedDict()
+        self._index_version: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def _check_version(self, index_version: Optional[str]) -> None:
+        if index_version != self._index_version:
+            self._chunks.clear()
+            self._index_version = index_version
+
+    def rank(self, vector, filters: Optional[Dict[str, Any]] = None,
+             index_version: Optional[str] = None) -> List[Tuple[Any, float]]:
+        """All chunks retrieved under the same filters as (Document, cosine similarity), best first."""
+        key = _filters_key(filters)
+        with self._lock:
+            self._check_version(index_version)
+            entries = [(doc, embedding) for doc, embedding, keys in self._chunks.values() if key in keys]
+        if not entries:
+            return []
+        scores = np.vstack([embedding for _, embedding in entries]) @ _unit(vector)
+        order = np.argsort(-scores)
+        return [(entries[i][0], float(scores[i])) for i in order]
+
+    def lookup(self, vector, k: int, filters: Optional[Dict[str, Any]] = None,
+               index_version: Optional[str] = None) -> Optional[List[Any]]:
+        """
+        Up to k chunks scoring at least min_score, best first, or None when the best chunk
+        scores lower (or the set is empty) and the question needs a global search.
+        """
+        if self.min_score <= 0:
+            return None
+        ranked = self.rank(vector, filters, index_version)
+        if not ranked or ranked[0][1] < self.min_score:
+            return None
+        docs = [doc for doc, score in ranked[:k] if score >= self.min_score]
+        with self._lock:
+            for doc in docs:
+                if _chunk_key(doc) in self._chunks:
+                    self._chunks.move_to_end(_chunk_key(doc))
+        return docs
+
+    def add(self, docs: List[Any], embed_documents: Callable[[List[str]], List[List[float]]],
+            filters: Optional[Dict[str, Any]] = None, index_version: Optional[str] = None) -> None:
+        """
+        Remember retrieved docs for later follow-ups. embed_documents is only called for
+        chunks not in the set yet (with the embedding cache these are cache hits anyway).
+        """
+        key = _filters_key(filters)
+        with self._lock:
+            self._check_version(index_version)
+            new = [doc for doc in docs if _chunk_key(doc) not in self._chunks]
+        embeddings = embed_documents([getattr(doc, "page_content", str(doc)) for doc in new]) if new else []
+        with self._lock:
+            if index_version != self._index_version:
+                return  # the index changed while embedding; these chunks are already stale
+            for doc, embedding in zip(new, embeddings):
+                self._chunks.setdefault(_chunk_key(doc), (doc, _unit(embedding), set()))
+            for doc in docs:
+                chunk_key = _chunk_key(doc)
+                if chunk_key in self._chunks:
+                    self._chunks[chunk_key][2].add(key)
+                    self._chunks.move_to_end(chunk_key)
+            while len(self._chunks) > self.max_chunks:
+                self._chunks.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._chunks.clear()
+            self._index_version = None